@@ -5,8 +5,12 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import stdf, cache, experimental
-from .database import init_db
+from .routers import stdf, cache, experimental, parts
+from .database import SessionLocal, init_db
+from .services.access_tracker import access_tracker
+from .services.blocking import shutdown_executor
+from .services.cache_gc import cache_gc
+from .services.cache_service import CacheService
 
 
 def _get_allowed_origins() -> list[str]:
@@ -41,9 +45,31 @@ init_db()
 # 注册路由
 app.include_router(stdf.router, prefix="/api/stdf", tags=["STDF"])
 app.include_router(cache.router, prefix="/api/cache", tags=["Cache"])
+app.include_router(parts.router, prefix="/api/parts", tags=["Parts"])
 app.include_router(experimental.router, prefix="/experimental", tags=["Experimental"])
 
 
+@app.on_event("startup")
+def startup():
+    """补写缺少的文件元数据；配置了数据库缓存预算时启动后台回收，开启监视时启动数据目录预解析"""
+    db = SessionLocal()
+    try:
+        CacheService.backfill_file_meta(db)
+    finally:
+        db.close()
+    cache_gc.start()
+    stdf.data_watcher.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """等待请求线程池中的任务完成，并写回缓冲的最后访问时间"""
+    stdf.data_watcher.shutdown()
+    shutdown_executor()
+    cache_gc.shutdown()
+    access_tracker.shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "STDF Reader API is running"}
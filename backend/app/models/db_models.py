@@ -21,6 +21,13 @@ class STDFFile(Base):
 
     # 关联关系
     data = relationship("STDFData", back_populates="file", cascade="all, delete-orphan")
+    meta = relationship(
+        "STDFFileMeta", back_populates="file", uselist=False, cascade="all, delete-orphan"
+    )
+    # part 行可能有几十万条，由 CacheService 按 file_id 批量删除，不逐行加载
+    parts = relationship(
+        "STDFPart", back_populates="file", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<STDFFile(id={self.id}, filename={self.filename}, hash={self.file_hash[:8]}...)>"
@@ -46,3 +53,56 @@ class STDFData(Base):
 
     def __repr__(self):
         return f"<STDFData(id={self.id}, file_id={self.file_id}, type={self.data_type})>"
+
+
+class STDFFileMeta(Base):
+    """STDF 文件元数据表（摘要中用于文件列表筛选和排序的字段，随摘要一起写入）"""
+    __tablename__ = "stdf_file_meta"
+
+    file_id = Column(Integer, ForeignKey("stdf_files.id", ondelete="CASCADE"), primary_key=True)
+    lot_id = Column(String(255), nullable=False, default="", index=True)
+    part_type = Column(String(255), nullable=False, default="", index=True)
+    tester_type = Column(String(255), nullable=False, default="", index=True)
+    node_name = Column(String(255), nullable=False, default="", index=True)
+    start_time = Column(Integer, nullable=True, index=True)  # MIR 开始时间（Unix 秒）
+    yield_rate = Column(Float, nullable=True)
+    total_parts = Column(Integer, nullable=False, default=0)
+    sites = Column(String(1024), nullable=False, default="")  # 逗号分隔的 site 编号
+
+    # 关联关系
+    file = relationship("STDFFile", back_populates="meta")
+
+    def __repr__(self):
+        return f"<STDFFileMeta(file_id={self.file_id}, lot_id={self.lot_id})>"
+
+
+class STDFPart(Base):
+    """STDF part 表（每条 PRR 一行，用于跨文件按坐标或 bin 查询）"""
+    __tablename__ = "stdf_parts"
+
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey("stdf_files.id", ondelete="CASCADE"), nullable=False)
+    part_index = Column(Integer, nullable=False)  # 文件内的 part 序号
+    part_id = Column(String(255), nullable=False, default="")
+    head_num = Column(Integer, nullable=False, default=0)
+    site_num = Column(Integer, nullable=False, default=0)
+    x_coord = Column(Integer, nullable=True)  # 缺失为 NULL
+    y_coord = Column(Integer, nullable=True)
+    hard_bin = Column(Integer, nullable=False)
+    soft_bin = Column(Integer, nullable=False)
+    part_flg = Column(Integer, nullable=False, default=0)
+    test_time = Column(Integer, nullable=False, default=0)  # 测试耗时（毫秒）
+
+    # 关联关系
+    file = relationship("STDFFile", back_populates="parts")
+
+    # 复合索引
+    __table_args__ = (
+        Index('ix_part_file', 'file_id', 'part_index'),
+        Index('ix_part_xy', 'x_coord', 'y_coord'),
+        Index('ix_part_hard_bin', 'hard_bin'),
+        Index('ix_part_soft_bin', 'soft_bin'),
+    )
+
+    def __repr__(self):
+        return f"<STDFPart(file_id={self.file_id}, part_index={self.part_index})>"
@@ -15,10 +15,17 @@ class FileInfo(BaseModel):
     part_type: Optional[str] = None
     yield_rate: Optional[float] = None
     sites: Optional[List[int]] = None
+    tester_type: Optional[str] = None
+    node_name: Optional[str] = None
+    start_time: Optional[int] = None  # MIR 开始时间（Unix 秒）
+    total_parts: Optional[int] = None
 
 
 class FileListResponse(BaseModel):
     files: List[FileInfo]
+    total: int = 0
+    page: int = 1
+    page_size: int = 0  # 0 表示不分页
 
 
 # ========== MIR / MRR 信息 ==========
@@ -26,6 +33,7 @@ class FileListResponse(BaseModel):
 class MirInfo(BaseModel):
     setup_time: str = ""
     start_time: str = ""
+    start_timestamp: Optional[int] = None  # START_T 原值（Unix 秒）
     station_number: int = 0
     mode_code: str = ""
     lot_id: str = ""
@@ -112,6 +120,61 @@ class TestInfo(BaseModel):
     fail_rate: float = 0.0
 
 
+# ========== 测试项统计 ==========
+
+class Histogram(BaseModel):
+    bin_edges: List[float] = []
+    counts: List[int] = []
+
+
+class TestStats(BaseModel):
+    test_num: int
+    test_txt: str = ""
+    units: str = ""
+    site_num: Optional[int] = None  # None 表示所有站点
+    lo_limit: Optional[float] = None
+    hi_limit: Optional[float] = None
+    count: int = 0
+    pass_count: int = 0
+    fail_count: int = 0
+    mean: Optional[float] = None
+    stdev: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    median: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    cp: Optional[float] = None
+    cpu: Optional[float] = None
+    cpl: Optional[float] = None
+    cpk: Optional[float] = None
+    histogram: Optional[Histogram] = None
+
+
+class TestStatsResponse(BaseModel):
+    tests: List[TestStats]
+
+
+# ========== 多文件合并 ==========
+
+class MergedTestResultItem(TestResultItem):
+    file_name: str = ""
+
+
+class MergedFileStats(TestStats):
+    file_name: str = ""
+
+
+class MergedTestResponse(BaseModel):
+    test_num: int
+    test_txt: Optional[str] = None  # 指定时只合并同名测试项
+    total: int = 0
+    page: int = 1
+    page_size: int = 0
+    results: List[MergedTestResultItem] = []  # mode=rows
+    stats: Optional[TestStats] = None  # mode=stats：所有文件合并后的统计
+    file_stats: List[MergedFileStats] = []  # mode=stats：每个文件的统计
+
+
 # ========== Wafer Map ==========
 
 class DieResult(BaseModel):
@@ -132,6 +195,116 @@ class WaferMapResponse(BaseModel):
     sbin_names: Dict[int, str] = {}
 
 
+class WaferGridResponse(BaseModel):
+    """稠密 bin 网格：按行展开后游程编码，run_values[i] 连续出现 run_lengths[i] 次"""
+    wafer_id: str = ""
+    total_dies: int = 0
+    retest_count: int = 0
+    bin_type: str = "hard"
+    origin_x: int = 0
+    origin_y: int = 0
+    width: int = 0
+    height: int = 0
+    empty_value: int = 0xFFFF
+    run_values: List[int] = []
+    run_lengths: List[int] = []
+    bin_counts: Dict[int, int] = {}
+    hbin_names: Dict[int, str] = {}
+    sbin_names: Dict[int, str] = {}
+    tile_size: int = 256
+    max_zoom: int = 0
+
+
+class LotWaferInfo(BaseModel):
+    filename: str
+    wafer_id: str = ""
+    total_dies: int = 0  # 重测的 die 只计一次
+    pass_count: int = 0
+    yield_rate: float = 0.0
+
+
+class LotMapResponse(BaseModel):
+    """批次叠加 Wafer Map：以下各列表按坐标一一对应，只包含至少一片有 die 的坐标"""
+    lot_id: str = ""
+    wafer_count: int = 0
+    wafers: List[LotWaferInfo] = []
+    composite_yield: float = 0.0
+    origin_x: int = 0
+    origin_y: int = 0
+    width: int = 0
+    height: int = 0
+    x_coords: List[int] = []
+    y_coords: List[int] = []
+    tested: List[int] = []  # 该坐标有 die 的 wafer 数
+    passed: List[int] = []  # 其中 hard bin 为 1 的 wafer 数
+    pass_rate: List[float] = []
+    dominant_bin: List[int] = []
+    dominant_count: List[int] = []
+    hbin_names: Dict[int, str] = {}
+
+
+# ========== 按索引读取 ==========
+
+class HeaderResponse(BaseModel):
+    mir: Optional[MirInfo] = None
+    mrr: Optional[MrrInfo] = None
+
+
+class DieDetailResponse(BaseModel):
+    x_coord: int
+    y_coord: int
+    head_num: int = 0
+    site_num: int = 0
+    hard_bin: int = 0
+    soft_bin: int = 0
+    part_flag: int = 0
+    part_id: str = ""
+    test_time: int = 0
+    results: List[TestResultItem] = []
+
+
+# ========== 跨文件 part 查询 ==========
+
+class PartRecord(BaseModel):
+    filename: str
+    lot_id: str = ""
+    start_time: Optional[int] = None  # 文件的 MIR 开始时间（Unix 秒）
+    part_index: int
+    part_id: str = ""
+    head_num: int = 0
+    site_num: int = 0
+    x_coord: Optional[int] = None
+    y_coord: Optional[int] = None
+    hard_bin: int = 0
+    soft_bin: int = 0
+    part_flag: int = 0
+    test_time: int = 0
+
+
+class PartQueryResponse(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    parts: List[PartRecord]
+
+
+class DieHistoryResponse(BaseModel):
+    x_coord: int
+    y_coord: int
+    parts: List[PartRecord]
+
+
+class PartIngestResponse(BaseModel):
+    filename: str
+    parts: int
+
+
+class PartStoreStatsResponse(BaseModel):
+    enabled: bool
+    total_parts: int
+    ingested_files: int
+
+
 # ========== 解析进度 ==========
 
 class ParseJobStartResponse(BaseModel):
@@ -147,3 +320,24 @@ class ParseProgressResponse(BaseModel):
     percent: int
     filename: str
     error: Optional[str] = None
+
+
+class ParseProgressEvent(ParseProgressResponse):
+    """进度推送事件：stage 为 queued/parsing/scanning/decoding/merging 或结束状态"""
+    stage: str = ""
+    total_bytes: int = 0
+    bytes_done: int = 0
+    elapsed_seconds: float = 0.0
+    bytes_per_sec: Optional[int] = None
+    eta_seconds: Optional[float] = None
+
+
+class WatcherStatusResponse(BaseModel):
+    """数据目录监视状态"""
+    enabled: bool
+    interval_seconds: float
+    max_jobs: int
+    queued: int
+    running: int
+    processed: int
+    failed: int
@@ -1,12 +1,15 @@
 """缓存管理路由"""
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from ..database import get_db
+from ..services.blocking import run_blocking
+from ..services.cache_gc import cache_gc
 from ..services.cache_service import CacheService
+from .stdf import parser_service
 
 
 router = APIRouter()
@@ -31,6 +34,13 @@ class CacheStatsResponse(BaseModel):
     total_cached_files: int
     total_data_records: int
     total_file_size: int
+    # 内存缓存（解析结果与记录索引）
+    memory_entries: int = 0
+    memory_bytes: int = 0
+    memory_max_bytes: int = 0
+    memory_hits: int = 0
+    memory_misses: int = 0
+    memory_evictions: int = 0
 
 
 class CachedFileListResponse(BaseModel):
@@ -38,12 +48,43 @@ class CachedFileListResponse(BaseModel):
     total: int
 
 
+class CacheBudgetResponse(BaseModel):
+    data_entries: int
+    data_bytes: int  # stdf_data 中压缩后的数据总字节数
+    max_entries: int  # 0 表示不限制
+    max_bytes: int  # 0 表示不限制
+    policy: str
+    interval_seconds: float
+    enabled: bool
+    last_run: Optional[str] = None
+    total_evicted: int = 0
+
+
+class EvictionInfo(BaseModel):
+    file_id: int
+    file_hash: str
+    filename: str
+    entries: int
+    bytes: int
+    parse_time: Optional[float] = None
+    last_accessed: str
+    evicted_at: str
+    policy: str
+    reason: str
+
+
+class EvictionListResponse(BaseModel):
+    evictions: List[EvictionInfo]
+
+
 # ========== 路由 ==========
 
 @router.get("/stats", response_model=CacheStatsResponse)
 async def get_cache_stats(db: Session = Depends(get_db)):
     """获取缓存统计信息"""
-    stats = CacheService.get_cache_stats(db)
+    stats = await run_blocking(CacheService.get_cache_stats, db)
+    for key, value in parser_service.cache_stats().items():
+        stats[f"memory_{key}"] = value
     return CacheStatsResponse(**stats)
 
 
@@ -56,8 +97,8 @@ async def list_cached_files(
     """列出所有缓存的文件"""
     from ..models.db_models import STDFFile
     
-    files = CacheService.list_cached_files(db, limit=limit, offset=offset)
-    total = db.query(STDFFile).count()
+    files = await run_blocking(CacheService.list_cached_files, db, limit=limit, offset=offset)
+    total = await run_blocking(db.query(STDFFile).count)
     
     file_list = []
     for f in files:
@@ -77,7 +118,7 @@ async def list_cached_files(
 @router.delete("/files/{file_id}")
 async def delete_cached_file(file_id: int, db: Session = Depends(get_db)):
     """删除指定文件的缓存"""
-    success = CacheService.delete_file_cache(db, file_id)
+    success = await run_blocking(CacheService.delete_file_cache, db, file_id)
     if not success:
         raise HTTPException(status_code=404, detail="缓存文件不存在")
     return {"message": "缓存已删除", "file_id": file_id}
@@ -86,5 +127,24 @@ async def delete_cached_file(file_id: int, db: Session = Depends(get_db)):
 @router.delete("/clear")
 async def clear_all_cache(db: Session = Depends(get_db)):
     """清空所有缓存"""
-    count = CacheService.clear_all_cache(db)
+    count = await run_blocking(CacheService.clear_all_cache, db)
     return {"message": f"已清空 {count} 个缓存文件"}
+
+
+@router.get("/budget", response_model=CacheBudgetResponse)
+async def get_cache_budget(db: Session = Depends(get_db)):
+    """获取数据库缓存的占用、预算和回收策略"""
+    return CacheBudgetResponse(**await run_blocking(cache_gc.usage, db))
+
+
+@router.get("/evictions", response_model=EvictionListResponse)
+async def list_evictions(limit: int = Query(100, ge=1, le=500, description="返回条数")):
+    """列出最近被回收的缓存文件（新的在前）"""
+    return EvictionListResponse(evictions=cache_gc.evictions(limit))
+
+
+@router.post("/gc", response_model=EvictionListResponse)
+async def run_cache_gc(db: Session = Depends(get_db)):
+    """立即按预算回收一次，返回本次淘汰的文件"""
+    evictions = await run_blocking(cache_gc.collect, db, reason="manual")
+    return EvictionListResponse(evictions=evictions)
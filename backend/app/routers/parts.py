@@ -0,0 +1,81 @@
+"""跨文件 part 查询路由（数据来自 stdf_parts 表）"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.stdf_models import (
+    DieHistoryResponse,
+    PartIngestResponse,
+    PartQueryResponse,
+    PartStoreStatsResponse,
+)
+from ..services.blocking import run_blocking
+from ..services.part_ingest import part_ingest
+from .stdf import _get_data_dir, parser_service
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=PartStoreStatsResponse)
+async def get_part_stats(db: Session = Depends(get_db)):
+    """已入库的 part 行数和文件数"""
+    return PartStoreStatsResponse(**await run_blocking(part_ingest.stats, db))
+
+
+@router.post("/ingest/{filename}", response_model=PartIngestResponse)
+async def ingest_file_parts(filename: str, db: Session = Depends(get_db)):
+    """把文件的全部 PRR 写入 part 表（已入库时替换）"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        count = await run_blocking(parser_service.ingest_parts, str(file_path), db)
+        return PartIngestResponse(filename=filename, parts=count)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+@router.get("/die", response_model=DieHistoryResponse)
+async def get_die_history(
+    x: int = Query(..., description="X 坐标"),
+    y: int = Query(..., description="Y 坐标"),
+    lot_id: Optional[str] = Query(None, description="只查该批次"),
+    filenames: Optional[List[str]] = Query(None, description="只查这些文件"),
+    db: Session = Depends(get_db),
+):
+    """某坐标在所有已入库文件中的每次测试（含重测）"""
+    parts = await run_blocking(
+        part_ingest.find_die, db, x, y, lot_id=lot_id, filenames=filenames
+    )
+    return DieHistoryResponse(x_coord=x, y_coord=y, parts=parts)
+
+
+@router.get("", response_model=PartQueryResponse)
+@router.get("/", response_model=PartQueryResponse)
+async def query_parts(
+    hard_bin: Optional[int] = Query(None, ge=0),
+    soft_bin: Optional[int] = Query(None, ge=0),
+    lot_id: Optional[str] = Query(None),
+    start_from: Optional[int] = Query(None, description="文件开始时间下限（Unix 秒，含）"),
+    start_to: Optional[int] = Query(None, description="文件开始时间上限（Unix 秒，不含）"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    """按 bin、批次和时间范围跨文件筛选 part，按文件开始时间从新到旧"""
+    total, parts = await run_blocking(
+        part_ingest.find_parts,
+        db,
+        hard_bin=hard_bin,
+        soft_bin=soft_bin,
+        lot_id=lot_id,
+        start_from=start_from,
+        start_to=start_to,
+        page=page,
+        page_size=page_size,
+    )
+    return PartQueryResponse(total=total, page=page, page_size=page_size, parts=parts)
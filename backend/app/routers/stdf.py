@@ -1,27 +1,59 @@
 """STDF 文件相关路由"""
 
+import asyncio
+import hashlib
+import json
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, Query, Depends
+import aiofiles
+from fastapi import APIRouter, File, Header, HTTPException, Request, UploadFile, Path as PathParam, Query, Depends
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 
 from ..services.stdf_parser import StdfParserService
-from ..services.cache_service import CacheService
+from ..services.parse_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from ..services.blocking import run_blocking
+from ..services.cache_service import CacheService, calculate_file_hash, remember_file_hash
+from ..services.columnar import COLUMNAR_MEDIA_TYPE, accepts_columnar
+from ..services.dir_watcher import DataDirWatcher
+from ..services.wafer_grid import MAX_ZOOM
 from ..database import get_db
-from ..models.db_models import STDFFile
+from ..models.db_models import STDFFile, STDFFileMeta
 from ..models.stdf_models import (
+    DieDetailResponse,
     FileListResponse,
+    HeaderResponse,
+    LotMapResponse,
+    MergedTestResponse,
     StdfSummaryResponse,
     TestResultsResponse,
+    TestStatsResponse,
+    WaferGridResponse,
     WaferMapResponse,
+    WatcherStatusResponse,
     ParseJobStartResponse,
+    ParseProgressEvent,
     ParseProgressResponse,
 )
 
 router = APIRouter()
 
+# 上传时每次读取/写入的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 进度推送无变化时发送心跳注释的间隔（秒）
+PROGRESS_HEARTBEAT_SECONDS = 15
+
+
+def _get_progress_interval() -> float:
+    """进度推送的最小间隔（秒），默认 0.5"""
+    try:
+        return max(0.05, float(os.getenv("STDF_PROGRESS_INTERVAL", "0.5")))
+    except ValueError:
+        return 0.5
+
 
 def _get_data_dir() -> Path:
     data_dir = os.getenv("DATA_DIR")
@@ -31,65 +63,193 @@ def _get_data_dir() -> Path:
 
 parser_service = StdfParserService()
 
+# STDF_WATCH_DATA_DIR=1 时由 main.py 启动，后台预解析数据目录中的新文件
+data_watcher = DataDirWatcher(parser_service, _get_data_dir)
+
+
+# 文件列表可用的排序字段
+FILE_SORT_FIELDS = (
+    "modified", "name", "size", "lot_id", "part_type", "tester_type",
+    "node_name", "start_time", "yield_rate", "total_parts",
+)
+
 
 @router.get("/files", response_model=FileListResponse)
-async def list_stdf_files(db: Session = Depends(get_db)):
-    """列出 data 目录下所有的 STDF 文件"""
+async def list_stdf_files(
+    lot_id: Optional[str] = Query(None, description="按批次号筛选"),
+    part_type: Optional[str] = Query(None, description="按产品型号筛选"),
+    tester_type: Optional[str] = Query(None, description="按测试机类型筛选"),
+    node_name: Optional[str] = Query(None, description="按测试机节点筛选"),
+    search: Optional[str] = Query(None, description="文件名包含的文字（不区分大小写）"),
+    sort_by: str = Query("modified", description="排序字段"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(0, ge=0, le=1000, description="每页数量，0 表示返回全部"),
+    db: Session = Depends(get_db),
+):
+    """列出 data 目录下所有的 STDF 文件
+
+    元数据来自解析摘要时写入的 stdf_file_meta 表，一次查询取回，不触发解析。
+    按元数据筛选时，尚未解析的文件不在结果中。
+    """
+    if sort_by not in FILE_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort_by}")
+    filters = {
+        "lot_id": lot_id,
+        "part_type": part_type,
+        "tester_type": tester_type,
+        "node_name": node_name,
+    }
+    return await run_blocking(
+        _list_stdf_files, db, filters, search, sort_by, order == "desc", page, page_size
+    )
+
+
+def _list_stdf_files(
+    db: Session,
+    filters: Optional[dict] = None,
+    search: Optional[str] = None,
+    sort_by: str = "modified",
+    descending: bool = True,
+    page: int = 1,
+    page_size: int = 0,
+) -> FileListResponse:
     data_dir = _get_data_dir()
     if not data_dir.exists():
         data_dir.mkdir(parents=True, exist_ok=True)
 
+    on_disk = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith((".stdf", ".std")) or not entry.is_file():
+                continue
+            if search and search.lower() not in entry.name.lower():
+                continue
+            stat = entry.stat()
+            on_disk[entry.name] = (stat.st_size, stat.st_mtime)
+
+    # 所有文件的元数据一次取回；同名的多条记录优先取大小与磁盘文件一致、较新的一条
+    filters = {key: value for key, value in (filters or {}).items() if value}
+    query = db.query(STDFFile.filename, STDFFile.file_size, STDFFileMeta).join(
+        STDFFileMeta, STDFFileMeta.file_id == STDFFile.id
+    )
+    for key, value in filters.items():
+        query = query.filter(getattr(STDFFileMeta, key) == value)
+    metas = {}
+    for filename, file_size, meta in query.order_by(STDFFile.id).all():
+        if filename not in on_disk:
+            continue
+        disk_size = on_disk[filename][0]
+        if filename in metas and metas[filename][0] == disk_size and file_size != disk_size:
+            continue
+        metas[filename] = (file_size, meta)
+
     files = []
-    for f in data_dir.iterdir():
-        if f.suffix.lower() in (".stdf", ".std"):
-            file_info = {
-                "name": f.name,
-                "size": f.stat().st_size,
-                "modified": f.stat().st_mtime,
-            }
-            # 从缓存中读取摘要信息（不触发解析）
-            cached_file = db.query(STDFFile).filter(STDFFile.filename == f.name).first()
-            if cached_file:
-                summary_data = CacheService.get_cached_data(db, cached_file.id, "summary")
-                if summary_data:
-                    mir = summary_data.get("mir") or {}
-                    file_info["lot_id"] = mir.get("lot_id") or ""
-                    file_info["part_type"] = mir.get("part_type") or ""
-                    file_info["yield_rate"] = summary_data.get("yield_rate")
-                    file_info["sites"] = summary_data.get("sites", [])
-            files.append(file_info)
-
-    # Sort files by modification time (most recent first)
-    files.sort(key=lambda x: x["modified"], reverse=True)
-
-    return FileListResponse(files=files)
+    for name, (size, modified) in on_disk.items():
+        file_info = {"name": name, "size": size, "modified": modified}
+        if name in metas:
+            meta = metas[name][1]
+            file_info.update(
+                lot_id=meta.lot_id,
+                part_type=meta.part_type,
+                tester_type=meta.tester_type,
+                node_name=meta.node_name,
+                start_time=meta.start_time,
+                yield_rate=meta.yield_rate,
+                total_parts=meta.total_parts,
+                sites=[int(site) for site in meta.sites.split(",") if site],
+            )
+        elif filters:
+            continue
+        files.append(file_info)
+
+    # 没有该字段的文件（未解析）总是排在最后
+    present = [f for f in files if f.get(sort_by) is not None]
+    missing = [f for f in files if f.get(sort_by) is None]
+    present.sort(key=lambda f: f[sort_by], reverse=descending)
+    files = present + missing
+
+    total = len(files)
+    if page_size:
+        files = files[(page - 1) * page_size:page * page_size]
+    return FileListResponse(files=files, total=total, page=page, page_size=page_size)
 
 
 @router.post("/upload")
-async def upload_stdf_file(file: UploadFile = File(...)):
-    """上传 STDF 文件到 data 目录"""
+async def upload_stdf_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """上传 STDF 文件到 data 目录
+
+    分块流式写入临时文件并同时计算 SHA-256，完成后原子替换为目标文件。
+    内容已解析过（哈希已在缓存中）时跳过解析，否则立即提交后台预解析任务。
+    """
     if not file.filename.lower().endswith((".stdf", ".std")):
         raise HTTPException(status_code=400, detail="仅支持 .stdf 或 .std 文件")
 
     data_dir = _get_data_dir()
     data_dir.mkdir(parents=True, exist_ok=True)
     file_path = data_dir / file.filename
+    tmp_path = data_dir / f".{file.filename}.uploading"
 
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    sha256_hash = hashlib.sha256()
+    file_size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256_hash.update(chunk)
+                file_size += len(chunk)
+                await f.write(chunk)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+    # 上传时计算一次哈希并登记，之后的缓存命中无需重新读取整个文件
+    remember_file_hash(str(file_path), sha256_hash.hexdigest())
+    file_hash, already_parsed, job_id = await run_blocking(
+        _register_upload, file_path, file.filename, file_size, db
+    )
+
+    return {
+        "message": f"文件 {file.filename} 上传成功",
+        "filename": file.filename,
+        "file_hash": file_hash,
+        "cached": already_parsed,
+        "job_id": job_id,
+    }
+
+
+def _register_upload(file_path: Path, filename: str, file_size: int, db: Session):
+    """登记上传的文件，内容未解析过时提交后台预解析，返回 (哈希, 是否已解析, 任务 ID)"""
+    file_hash = calculate_file_hash(str(file_path))
+    existing = CacheService.get_cached_file_by_hash(db, file_hash)
+    already_parsed = existing is not None and existing.parse_time is not None
+    CacheService.save_file_record(
+        db, file_hash, filename, file_size, parser_service.take_parse_time(str(file_path))
+    )
 
-    return {"message": f"文件 {file.filename} 上传成功", "filename": file.filename}
+    job_id = None
+    if not already_parsed:
+        job = parser_service.start_parse(str(file_path), priority=PRIORITY_BACKGROUND)
+        job_id = job["job_id"]
+    return file_hash, already_parsed, job_id
 
 
 @router.post("/parse/{filename}", response_model=ParseJobStartResponse)
-async def start_parse_job(filename: str):
+async def start_parse_job(
+    filename: str,
+    background: bool = Query(False, description="后台预解析（低优先级）"),
+):
     """启动 STDF 文件解析任务"""
     file_path = _get_data_dir() / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
 
-    job = parser_service.start_parse(str(file_path))
+    priority = PRIORITY_BACKGROUND if background else PRIORITY_INTERACTIVE
+    job = await run_blocking(parser_service.start_parse, str(file_path), priority=priority)
     return ParseJobStartResponse(
         job_id=job["job_id"],
         status=job["status"],
@@ -98,6 +258,12 @@ async def start_parse_job(filename: str):
     )
 
 
+@router.get("/watcher", response_model=WatcherStatusResponse)
+async def get_watcher_status():
+    """数据目录后台预解析的状态"""
+    return WatcherStatusResponse(**data_watcher.status())
+
+
 @router.get("/progress/{job_id}", response_model=ParseProgressResponse)
 async def get_parse_progress(job_id: str):
     """获取解析进度"""
@@ -114,6 +280,64 @@ async def get_parse_progress(job_id: str):
     )
 
 
+@router.get("/progress/{job_id}/stream")
+async def stream_parse_progress(job_id: str, request: Request):
+    """以 Server-Sent Events 推送解析进度（阶段、速率、预计剩余时间），任务结束后关闭
+
+    每个间隔最多推送一次，进度没有变化时不推送。
+    """
+    if not parser_service.get_progress(job_id):
+        raise HTTPException(status_code=404, detail="解析任务不存在")
+
+    interval = _get_progress_interval()
+
+    async def events():
+        last_key = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            detail = parser_service.get_progress_detail(job_id)
+            if detail is None:
+                error = json.dumps({"error": "解析任务不存在"}, ensure_ascii=False)
+                yield f"event: error\ndata: {error}\n\n"
+                return
+            payload = ParseProgressEvent(**detail).dict()
+            # 耗时和速率每次都会变化，只在状态、阶段或百分比变化时推送
+            key = (payload["status"], payload["stage"], payload["percent"])
+            if key != last_key:
+                last_key = key
+                idle = 0.0
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            elif idle >= PROGRESS_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            if payload["status"] not in ("pending", "running"):
+                return
+            await asyncio.sleep(interval)
+            idle += interval
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/cancel/{job_id}", response_model=ParseProgressResponse)
+async def cancel_parse_job(job_id: str):
+    """取消解析任务"""
+    job = parser_service.cancel_parse(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="解析任务不存在")
+
+    return ParseProgressResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        percent=job["percent"],
+        filename=job["filename"],
+        error=job.get("error"),
+    )
+
+
 @router.get("/summary/{filename}", response_model=StdfSummaryResponse)
 async def get_stdf_summary(filename: str, db: Session = Depends(get_db)):
     """获取 STDF 文件的摘要信息 (MIR/MRR 等)"""
@@ -122,7 +346,7 @@ async def get_stdf_summary(filename: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
 
     try:
-        summary = parser_service.get_summary(str(file_path), db=db)
+        summary = await run_blocking(parser_service.get_summary, str(file_path), db=db)
         return summary
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
@@ -135,15 +359,28 @@ async def get_test_results(
     site_num: Optional[int] = Query(None, description="筛选特定站点"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(100, ge=1, le=5000, description="每页数量"),
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ):
-    """获取 STDF 文件的测试结果数据"""
+    """获取 STDF 文件的测试结果数据（Accept 为列式格式时返回二进制列）"""
     file_path = _get_data_dir() / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
 
     try:
-        results = parser_service.get_test_results(
+        if accepts_columnar(accept):
+            content = await run_blocking(
+                parser_service.get_test_results_columnar,
+                str(file_path),
+                test_num=test_num,
+                site_num=site_num,
+                page=page,
+                page_size=page_size,
+                db=db,
+            )
+            return Response(content=content, media_type=COLUMNAR_MEDIA_TYPE)
+        results = await run_blocking(
+            parser_service.get_test_results,
             str(file_path),
             test_num=test_num,
             site_num=site_num,
@@ -156,20 +393,188 @@ async def get_test_results(
         raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
 
 
+@router.get("/stats/{filename}", response_model=TestStatsResponse)
+async def get_test_stats(
+    filename: str,
+    test_num: Optional[int] = Query(None, description="测试编号，不指定时返回所有测试项"),
+    site_num: Optional[int] = Query(None, description="只统计特定站点"),
+    by_site: bool = Query(False, description="同时返回每个站点的统计"),
+    bins: Optional[int] = Query(None, ge=1, le=500, description="直方图分箱数，默认 min(30, √n)"),
+    db: Session = Depends(get_db),
+):
+    """获取测试项统计（分布、百分位、Cp/Cpk、直方图）"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        return await run_blocking(
+            parser_service.get_test_stats,
+            str(file_path),
+            test_num=test_num,
+            site_num=site_num,
+            by_site=by_site,
+            bins=bins,
+            db=db,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+@router.get("/merge", response_model=MergedTestResponse)
+async def get_merged_results(
+    filenames: List[str] = Query(..., description="要合并的文件名（可重复）"),
+    test_num: int = Query(..., description="测试编号"),
+    test_txt: Optional[str] = Query(None, description="只合并同名测试项"),
+    site_num: Optional[int] = Query(None, description="筛选特定站点"),
+    mode: str = Query("rows", pattern="^(rows|stats)$", description="rows 返回结果行，stats 返回统计"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(1000, ge=1, le=5000, description="每页数量"),
+    bins: Optional[int] = Query(None, ge=1, le=500, description="直方图分箱数"),
+    db: Session = Depends(get_db),
+):
+    """跨多个文件合并同一测试项的结果或统计，未解析的文件并行解析"""
+    file_paths = []
+    for filename in dict.fromkeys(filenames):
+        file_path = _get_data_dir() / filename
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+        file_paths.append(str(file_path))
+
+    try:
+        return await run_blocking(
+            parser_service.get_merged_results,
+            file_paths,
+            test_num=test_num,
+            test_txt=test_txt,
+            site_num=site_num,
+            mode=mode,
+            page=page,
+            page_size=page_size,
+            bins=bins,
+            db=db,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
 @router.get("/wafermap/{filename}", response_model=WaferMapResponse)
-async def get_wafer_map(filename: str, db: Session = Depends(get_db)):
-    """获取 Wafer Map 数据"""
+async def get_wafer_map(
+    filename: str,
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """获取 Wafer Map 数据（Accept 为列式格式时返回二进制列）"""
     file_path = _get_data_dir() / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
 
     try:
-        wafer_data = parser_service.get_wafer_map(str(file_path), db=db)
+        if accepts_columnar(accept):
+            content = await run_blocking(parser_service.get_wafer_map_columnar, str(file_path), db=db)
+            return Response(content=content, media_type=COLUMNAR_MEDIA_TYPE)
+        wafer_data = await run_blocking(parser_service.get_wafer_map, str(file_path), db=db)
         return wafer_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
 
 
+@router.get("/wafermap/{filename}/grid", response_model=WaferGridResponse)
+async def get_wafer_grid(
+    filename: str,
+    bin_type: str = Query("hard", pattern="^(hard|soft)$", description="按 hard 或 soft bin 生成网格"),
+    db: Session = Depends(get_db),
+):
+    """获取游程编码的稠密 Wafer bin 网格"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        return await run_blocking(
+            parser_service.get_wafer_grid, str(file_path), bin_type=bin_type, db=db
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+@router.get("/wafermap/{filename}/tiles/{zoom}/{tile_x}/{tile_y}.png")
+async def get_wafer_tile(
+    filename: str,
+    zoom: int = PathParam(..., ge=0, le=MAX_ZOOM, description="缩放级别，每个 die 占 2^zoom 像素"),
+    tile_x: int = PathParam(..., ge=0),
+    tile_y: int = PathParam(..., ge=0),
+    bin_type: str = Query("hard", pattern="^(hard|soft)$", description="按 hard 或 soft bin 着色"),
+    db: Session = Depends(get_db),
+):
+    """获取服务端渲染的 Wafer Map PNG 瓦片"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        tile = await run_blocking(
+            parser_service.get_wafer_tile,
+            str(file_path), zoom, tile_x, tile_y, bin_type=bin_type, db=db
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+    if tile is None:
+        raise HTTPException(status_code=404, detail=f"瓦片 {zoom}/{tile_x}/{tile_y} 超出范围")
+    return Response(content=tile, media_type="image/png")
+
+
+@router.get("/lot-map", response_model=LotMapResponse)
+async def get_lot_map(
+    filenames: Optional[List[str]] = Query(None, description="要叠加的文件名（可重复）"),
+    lot_id: Optional[str] = Query(None, description="叠加 MIR lot_id 相同的所有文件"),
+    db: Session = Depends(get_db),
+):
+    """叠加同一批次的多片 wafer，返回每个坐标的通过率和主导 hard bin"""
+    if not filenames and not lot_id:
+        raise HTTPException(status_code=400, detail="需要指定 filenames 或 lot_id")
+
+    data_dir = _get_data_dir()
+    file_paths = []
+    for filename in dict.fromkeys(filenames or []):
+        file_path = data_dir / filename
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+        file_paths.append(str(file_path))
+
+    try:
+        if lot_id and not file_paths and data_dir.exists():
+            file_paths = await run_blocking(_find_lot_files, data_dir, lot_id, db)
+        if not file_paths:
+            raise HTTPException(
+                status_code=404,
+                detail=f"批次 {lot_id} 没有已解析的文件，未解析的文件请通过 filenames 指定",
+            )
+        return await run_blocking(parser_service.get_lot_map, file_paths, db=db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+def _find_lot_files(data_dir: Path, lot_id: str, db: Session) -> List[str]:
+    """按 stdf_file_meta 查找批次的文件，没有元数据（未解析）的文件不参与，避免解析整个目录
+
+    同名文件可能有旧内容的元数据，候选文件再按当前内容核对一次 lot_id。
+    """
+    candidates = {
+        filename for (filename,) in db.query(STDFFile.filename)
+        .join(STDFFileMeta, STDFFileMeta.file_id == STDFFile.id)
+        .filter(STDFFileMeta.lot_id == lot_id)
+        .all()
+    }
+    return [
+        str(data_dir / filename) for filename in sorted(candidates)
+        if (data_dir / filename).is_file()
+        and parser_service.get_lot_id(str(data_dir / filename), db=db) == lot_id
+    ]
+
+
 @router.get("/test-list/{filename}")
 async def get_test_list(filename: str, db: Session = Depends(get_db)):
     """获取文件中所有测试项列表"""
@@ -178,7 +583,41 @@ async def get_test_list(filename: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
 
     try:
-        tests = parser_service.get_test_list(str(file_path), db=db)
+        tests = await run_blocking(parser_service.get_test_list, str(file_path), db=db)
         return {"tests": tests}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+@router.get("/header/{filename}", response_model=HeaderResponse)
+async def get_stdf_header(filename: str, db: Session = Depends(get_db)):
+    """获取 MIR/MRR 表头（有记录索引时无需完整解析）"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        return await run_blocking(parser_service.get_header, str(file_path), db=db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+
+
+@router.get("/die/{filename}", response_model=DieDetailResponse)
+async def get_die_detail(
+    filename: str,
+    x: int = Query(..., description="X 坐标"),
+    y: int = Query(..., description="Y 坐标"),
+    db: Session = Depends(get_db),
+):
+    """获取单个 die 的 bin 信息和测试结果"""
+    file_path = _get_data_dir() / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"文件 {filename} 不存在")
+
+    try:
+        die = await run_blocking(parser_service.get_die, str(file_path), x, y, db=db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"解析文件失败: {str(e)}")
+    if die is None:
+        raise HTTPException(status_code=404, detail=f"坐标 ({x}, {y}) 没有 die")
+    return die
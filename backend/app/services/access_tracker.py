@@ -0,0 +1,119 @@
+"""文件最后访问时间的延迟批量写入
+
+缓存读取只在内存中记录访问时间，由后台线程按间隔（或积压过多时）
+用一条 executemany UPDATE 批量写回 stdf_files.last_accessed，
+读缓存因此不再需要写事务。应用关闭时写回剩余的记录。
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+from ..models.db_models import STDFFile
+
+logger = logging.getLogger(__name__)
+
+# 积压的文件数达到该值时提前写回
+FLUSH_BATCH_SIZE = 1000
+
+
+def _get_flush_interval() -> float:
+    """写回间隔（秒），默认 30"""
+    try:
+        return max(1.0, float(os.getenv("STDF_ACCESS_FLUSH_SECONDS", "30")))
+    except ValueError:
+        return 30.0
+
+
+class AccessTracker:
+    """按文件 ID 缓冲最后访问时间，后台线程批量写回数据库"""
+
+    def __init__(self, session_factory: Optional[Callable] = None, interval: Optional[float] = None):
+        self._session_factory = session_factory
+        self.interval = _get_flush_interval() if interval is None else interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: Dict[int, datetime] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def touch(self, file_id: int) -> None:
+        """记录一次访问（只写内存）"""
+        with self._wakeup:
+            self._pending[file_id] = datetime.utcnow()
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(
+                    target=self._flush_loop, name="access-flush", daemon=True
+                )
+                self._thread.start()
+            if len(self._pending) >= FLUSH_BATCH_SIZE:
+                self._wakeup.notify()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """把缓冲的访问时间写回数据库，返回写回的文件数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [{"file_id": file_id, "accessed": accessed} for file_id, accessed in pending.items()]
+        table = STDFFile.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("file_id"))
+            .values(last_accessed=bindparam("accessed"))
+        )
+        db = self._get_session_factory()()
+        try:
+            db.execute(statement, rows)
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            logger.warning("写回最后访问时间失败，将在下次重试: %s", exc)
+            # 放回缓冲区，期间更新过的记录保留较新的时间
+            with self._lock:
+                for file_id, accessed in pending.items():
+                    current = self._pending.get(file_id)
+                    if current is None or current < accessed:
+                        self._pending[file_id] = accessed
+            return 0
+        finally:
+            db.close()
+        return len(rows)
+
+    def shutdown(self) -> None:
+        """停止后台线程并写回剩余记录"""
+        with self._wakeup:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._wakeup.notify()
+        if thread is not None:
+            thread.join(timeout=self.interval)
+        self.flush()
+
+    def _get_session_factory(self) -> Callable:
+        if self._session_factory is None:
+            from ..database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._wakeup:
+                if not self._stopped and len(self._pending) < FLUSH_BATCH_SIZE:
+                    self._wakeup.wait(self.interval)
+                if self._stopped:
+                    return
+            self.flush()
+
+
+access_tracker = AccessTracker()
@@ -0,0 +1,50 @@
+"""请求线程池：在线程中执行解析、哈希和数据库缓存等阻塞操作
+
+路由都是 async def，直接调用同步的服务方法会阻塞事件循环，
+一次冷解析就会让同一进程的其它请求（包括 /health）一起等待。
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+
+def _get_request_workers() -> int:
+    """请求线程池大小（STDF_REQUEST_WORKERS），默认 min(32, CPU 数 + 4)"""
+    default = min(32, (os.cpu_count() or 1) + 4)
+    try:
+        return max(1, int(os.getenv("STDF_REQUEST_WORKERS", str(default))))
+    except ValueError:
+        return default
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_get_request_workers(), thread_name_prefix="stdf-request"
+            )
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """在请求线程池中执行 func(*args, **kwargs) 并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    """应用关闭时等待进行中的请求完成并释放线程"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
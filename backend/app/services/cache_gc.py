@@ -0,0 +1,232 @@
+"""数据库缓存的容量预算与后台回收
+
+stdf_data 中压缩后的数据总字节数或条目数超过预算时，按策略整文件淘汰
+（删除 stdf_files 记录及其全部 stdf_data 和记录偏移索引文件），直到回到预算以内：
+
+- lru：按 last_accessed 从旧到新淘汰
+- cost：按“解析耗时 / 数据大小 / (1 + 闲置小时数)”从低到高淘汰，
+  即优先淘汰重建便宜、占用空间大且久未访问的文件
+
+被淘汰的文件记录在内存中的淘汰日志里，可通过 /api/cache 路由查看。
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.db_models import STDFData, STDFFile, STDFFileMeta, STDFPart
+from .access_tracker import access_tracker
+from .record_index import remove_index_files
+
+logger = logging.getLogger(__name__)
+
+GC_POLICIES = ("lru", "cost")
+
+# 淘汰日志保留的条数
+EVICTION_LOG_SIZE = 500
+
+
+def _get_float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _get_max_bytes() -> int:
+    """压缩数据总字节预算（STDF_DB_CACHE_MB），0 表示不限制"""
+    return int(_get_float_env("STDF_DB_CACHE_MB", 0) * 1024 * 1024)
+
+
+def _get_max_entries() -> int:
+    """stdf_data 条目数预算（STDF_DB_CACHE_MAX_ENTRIES），0 表示不限制"""
+    return int(_get_float_env("STDF_DB_CACHE_MAX_ENTRIES", 0))
+
+
+def _get_interval() -> float:
+    """后台回收间隔（秒），默认 300"""
+    return max(1.0, _get_float_env("STDF_DB_GC_SECONDS", 300))
+
+
+def _get_policy() -> str:
+    policy = os.getenv("STDF_DB_GC_POLICY", "lru").strip().lower()
+    return policy if policy in GC_POLICIES else "lru"
+
+
+class CacheGarbageCollector:
+    """按预算淘汰数据库缓存，后台线程定期执行"""
+
+    def __init__(self, session_factory: Optional[Callable] = None):
+        self._session_factory = session_factory
+        self.max_bytes = _get_max_bytes()
+        self.max_entries = _get_max_entries()
+        self.interval = _get_interval()
+        self.policy = _get_policy()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._log: deque = deque(maxlen=EVICTION_LOG_SIZE)
+        self.last_run: Optional[datetime] = None
+        self.total_evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.max_entries > 0
+
+    # ========== 统计 ==========
+
+    @staticmethod
+    def _file_sizes(db: Session) -> List:
+        """每个有缓存数据的文件：(id, 哈希, 文件名, 解析耗时, 最后访问时间, 条目数, 压缩字节数)"""
+        sizes = (
+            db.query(
+                STDFData.file_id.label("file_id"),
+                func.count(STDFData.id).label("entries"),
+                func.coalesce(func.sum(func.length(STDFData.data_json)), 0).label("bytes"),
+            )
+            .group_by(STDFData.file_id)
+            .subquery()
+        )
+        return (
+            db.query(
+                STDFFile.id,
+                STDFFile.file_hash,
+                STDFFile.filename,
+                STDFFile.parse_time,
+                STDFFile.last_accessed,
+                sizes.c.entries,
+                sizes.c.bytes,
+            )
+            .join(sizes, sizes.c.file_id == STDFFile.id)
+            .all()
+        )
+
+    def usage(self, db: Session) -> Dict:
+        """当前占用与预算"""
+        totals = db.query(
+            func.count(STDFData.id),
+            func.coalesce(func.sum(func.length(STDFData.data_json)), 0),
+        ).one()
+        return {
+            "data_entries": int(totals[0]),
+            "data_bytes": int(totals[1]),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "interval_seconds": self.interval,
+            "enabled": self.enabled,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "total_evicted": self.total_evicted,
+        }
+
+    def evictions(self, limit: int = 100) -> List[Dict]:
+        """最近的淘汰记录（新的在前）"""
+        with self._lock:
+            return list(self._log)[::-1][:limit]
+
+    # ========== 回收 ==========
+
+    def _score(self, row, now: datetime) -> float:
+        if self.policy == "cost":
+            idle_hours = max((now - row.last_accessed).total_seconds(), 0) / 3600
+            size_mb = max(int(row.bytes), 1) / (1024 * 1024)
+            return (row.parse_time or 0.0) / size_mb / (1 + idle_hours)
+        return row.last_accessed.timestamp()
+
+    def collect(self, db: Session, reason: str = "budget") -> List[Dict]:
+        """淘汰文件直到回到预算以内，返回本次淘汰的记录"""
+        if not self.enabled:
+            return []
+        with self._run_lock:
+            # 先写回缓冲的访问时间，按最新的 last_accessed 排序
+            access_tracker.flush()
+            rows = self._file_sizes(db)
+            total_bytes = sum(int(r.bytes) for r in rows)
+            total_entries = sum(int(r.entries) for r in rows)
+            now = datetime.utcnow()
+
+            victims = []
+            for row in sorted(rows, key=lambda r: self._score(r, now)):
+                over_bytes = self.max_bytes > 0 and total_bytes > self.max_bytes
+                over_entries = self.max_entries > 0 and total_entries > self.max_entries
+                if not (over_bytes or over_entries):
+                    break
+                victims.append(row)
+                total_bytes -= int(row.bytes)
+                total_entries -= int(row.entries)
+
+            if victims:
+                ids = [row.id for row in victims]
+                db.query(STDFData).filter(STDFData.file_id.in_(ids)).delete(synchronize_session=False)
+                db.query(STDFFileMeta).filter(STDFFileMeta.file_id.in_(ids)).delete(synchronize_session=False)
+                db.query(STDFPart).filter(STDFPart.file_id.in_(ids)).delete(synchronize_session=False)
+                db.query(STDFFile).filter(STDFFile.id.in_(ids)).delete(synchronize_session=False)
+                db.commit()
+                remove_index_files(row.file_hash for row in victims)
+
+            records = [
+                {
+                    "file_id": row.id,
+                    "file_hash": row.file_hash,
+                    "filename": row.filename,
+                    "entries": int(row.entries),
+                    "bytes": int(row.bytes),
+                    "parse_time": row.parse_time,
+                    "last_accessed": row.last_accessed.isoformat(),
+                    "evicted_at": now.isoformat(),
+                    "policy": self.policy,
+                    "reason": reason,
+                }
+                for row in victims
+            ]
+            with self._lock:
+                self._log.extend(records)
+                self.total_evicted += len(records)
+                self.last_run = now
+        if records:
+            logger.info("数据库缓存回收：淘汰 %d 个文件", len(records))
+        return records
+
+    # ========== 后台线程 ==========
+
+    def start(self) -> None:
+        """配置了预算时启动后台回收线程"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="db-cache-gc", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _get_session_factory(self) -> Callable:
+        if self._session_factory is None:
+            from ..database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = self._get_session_factory()()
+            try:
+                self.collect(db)
+            except Exception as exc:
+                db.rollback()
+                logger.warning("数据库缓存回收失败: %s", exc)
+            finally:
+                db.close()
+
+
+cache_gc = CacheGarbageCollector()
@@ -3,25 +3,117 @@
 import json
 import hashlib
 import gzip
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
 from sqlalchemy.orm import Session
 
-from ..models.db_models import STDFFile, STDFData
+from ..models.db_models import STDFFile, STDFData, STDFFileMeta, STDFPart
+from .access_tracker import access_tracker
 
 
-def calculate_file_hash(file_path: str) -> str:
-    """计算文件的 SHA256 哈希值"""
+# 计算哈希时每次读取的块大小
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# fast 模式下抽样的块数与每块大小
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+# 哈希记忆表：(st_dev, st_ino, st_size, st_mtime_ns, 模式) -> 哈希
+_HASH_CACHE_SIZE = 4096
+_hash_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
+
+def _get_hash_mode() -> str:
+    """sha256：全文件 SHA-256（默认）；fast：按大小和抽样块计算的内容指纹"""
+    mode = os.getenv("STDF_HASH_MODE", "sha256").strip().lower()
+    return mode if mode in ("sha256", "fast") else "sha256"
+
+
+def _stat_key(file_path: str) -> tuple:
+    stat = os.stat(file_path)
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, _get_hash_mode())
+
+
+def _sha256_file(file_path: str) -> str:
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
         # 分块读取，避免大文件占用过多内存
-        for byte_block in iter(lambda: f.read(4096), b""):
+        for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
 
+def _fingerprint_file(file_path: str) -> str:
+    """文件大小 + 首尾及等距抽样块的 BLAKE2b 指纹，只读取约 1 MB
+
+    只在文件中部被原地修改且大小不变时才可能误判，适合只追加/整体替换的测试数据。
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    size = os.path.getsize(file_path)
+    digest.update(size.to_bytes(8, "little"))
+    with open(file_path, "rb") as f:
+        if size <= FINGERPRINT_SAMPLES * FINGERPRINT_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_BLOCK_SIZE) // (FINGERPRINT_SAMPLES - 1)
+            for i in range(FINGERPRINT_SAMPLES):
+                f.seek(i * step)
+                digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def _remember_hash(key: tuple, file_hash: str) -> None:
+    with _hash_cache_lock:
+        _hash_cache[key] = file_hash
+        _hash_cache.move_to_end(key)
+        while len(_hash_cache) > _HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+
+def calculate_file_hash(file_path: str) -> str:
+    """计算文件的哈希值（按 STDF_HASH_MODE），文件未变化时直接返回记忆的结果"""
+    key = _stat_key(file_path)
+    with _hash_cache_lock:
+        file_hash = _hash_cache.get(key)
+        if file_hash is not None:
+            _hash_cache.move_to_end(key)
+            return file_hash
+    if key[-1] == "fast":
+        file_hash = _fingerprint_file(file_path)
+    else:
+        file_hash = _sha256_file(file_path)
+    _remember_hash(key, file_hash)
+    return file_hash
+
+
+def remember_file_hash(file_path: str, file_hash: str) -> None:
+    """登记已在别处算好的 SHA-256（如上传时边接收边计算），fast 模式下忽略"""
+    key = _stat_key(file_path)
+    if key[-1] == "sha256":
+        _remember_hash(key, file_hash)
+
+
+def file_meta_from_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """从摘要中提取文件列表使用的元数据字段"""
+    mir = summary.get("mir") or {}
+    return {
+        "lot_id": mir.get("lot_id") or "",
+        "part_type": mir.get("part_type") or "",
+        "tester_type": mir.get("tester_type") or "",
+        "node_name": mir.get("node_name") or "",
+        "start_time": mir.get("start_timestamp"),
+        "yield_rate": summary.get("yield_rate"),
+        "total_parts": summary.get("total_parts") or 0,
+        "sites": ",".join(str(site) for site in summary.get("sites") or []),
+    }
+
+
 class CacheService:
     """缓存管理服务"""
 
@@ -39,11 +131,8 @@ class CacheService:
             .first()
         )
         if data_record:
-            # 更新最后访问时间
-            file_record = db.query(STDFFile).filter(STDFFile.id == file_id).first()
-            if file_record:
-                file_record.last_accessed = datetime.utcnow()
-                db.commit()
+            # 最后访问时间由后台线程批量写回，读缓存不产生写事务
+            access_tracker.touch(file_id)
             
             # 尝试解压数据
             try:
@@ -122,6 +211,36 @@ class CacheService:
         db.refresh(data_record)
         return data_record
 
+    @staticmethod
+    def save_file_meta(db: Session, file_id: int, summary: Dict[str, Any]) -> STDFFileMeta:
+        """由摘要写入或更新文件元数据"""
+        meta = db.query(STDFFileMeta).filter(STDFFileMeta.file_id == file_id).first()
+        if meta is None:
+            meta = STDFFileMeta(file_id=file_id)
+            db.add(meta)
+        for key, value in file_meta_from_summary(summary).items():
+            setattr(meta, key, value)
+        db.commit()
+        return meta
+
+    @staticmethod
+    def backfill_file_meta(db: Session) -> int:
+        """为已有摘要缓存但还没有元数据的文件补写元数据（升级后首次启动时执行），返回补写的文件数"""
+        file_ids = [
+            file_id for (file_id,) in db.query(STDFData.file_id)
+            .outerjoin(STDFFileMeta, STDFFileMeta.file_id == STDFData.file_id)
+            .filter(STDFData.data_type == "summary", STDFFileMeta.file_id.is_(None))
+            .all()
+        ]
+        count = 0
+        for file_id in file_ids:
+            summary = CacheService.get_cached_data(db, file_id, "summary")
+            if summary:
+                db.add(STDFFileMeta(file_id=file_id, **file_meta_from_summary(summary)))
+                count += 1
+        db.commit()
+        return count
+
     @staticmethod
     def list_cached_files(db: Session, limit: int = 100, offset: int = 0) -> List[STDFFile]:
         """列出所有缓存的文件"""
@@ -136,19 +255,29 @@ class CacheService:
     @staticmethod
     def delete_file_cache(db: Session, file_id: int) -> bool:
         """删除指定文件的缓存"""
+        from .record_index import remove_index_files
+
         file_record = db.query(STDFFile).filter(STDFFile.id == file_id).first()
         if file_record:
+            file_hash = file_record.file_hash
+            db.query(STDFPart).filter(STDFPart.file_id == file_id).delete(synchronize_session=False)
             db.delete(file_record)
             db.commit()
+            remove_index_files([file_hash])
             return True
         return False
 
     @staticmethod
     def clear_all_cache(db: Session) -> int:
-        """清空所有缓存"""
+        """清空所有缓存（包括记录偏移索引文件）"""
+        from .record_index import remove_index_files
+
         count = db.query(STDFFile).count()
+        db.query(STDFFileMeta).delete()
+        db.query(STDFPart).delete()
         db.query(STDFFile).delete()
         db.commit()
+        remove_index_files()
         return count
 
     @staticmethod
@@ -0,0 +1,89 @@
+"""二进制列式响应格式
+
+批量结果（测试结果、Wafer Map）在请求头 Accept 包含 COLUMNAR_MEDIA_TYPE 时
+直接由内部 NumPy 列生成，不构造逐行对象。布局（所有整数均为小端）：
+
+    偏移 0   8 字节魔数 b"STDFCOL1"
+    偏移 8   uint32 头部长度 N
+    偏移 12  N 字节 UTF-8 JSON 头部
+             {"meta": {...}, "rows": 行数,
+              "columns": [{"name", "dtype", "offset", "length"}, ...]}
+    之后     按 8 字节对齐的列数据区
+
+每列是 rows 个小端定长值，dtype 取 NumPy 名称（uint8/uint16/uint32/int16/
+int32/float32/float64），offset/length 为相对列数据区起点的字节偏移与长度，
+每列起点按 8 字节对齐，浏览器端可直接用对应的 TypedArray 视图读取。
+字符串等非定长字段放在 meta 中，以字典编码的形式由整数列引用。
+"""
+
+import json
+import math
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.stdf.columnar"
+
+MAGIC = b"STDFCOL1"
+
+_ALIGN = 8
+
+_DTYPES = frozenset({"uint8", "uint16", "uint32", "int16", "int32", "float32", "float64"})
+
+
+def accepts_columnar(accept: Optional[str]) -> bool:
+    """请求头 Accept 是否要求列式格式（JSON 仍为默认）"""
+    if not accept:
+        return False
+    return any(
+        part.split(";", 1)[0].strip().lower() == COLUMNAR_MEDIA_TYPE
+        for part in accept.split(",")
+    )
+
+
+def _padding(size: int) -> int:
+    return -size % _ALIGN
+
+
+def _finite(value: Any) -> Any:
+    """把 meta 中的 NaN/Inf 换成 None（浏览器的 JSON.parse 不接受 NaN 字面量）"""
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def encode_columns(meta: Dict[str, Any], columns: List[Tuple[str, np.ndarray]]) -> bytes:
+    """把列编码为上述布局，各列长度必须一致"""
+    rows = len(columns[0][1]) if columns else 0
+    descriptors = []
+    blobs = []
+    offset = 0
+    for name, values in columns:
+        values = np.asarray(values)
+        if values.dtype.name not in _DTYPES:
+            raise ValueError(f"列 {name} 的类型 {values.dtype} 不支持")
+        if len(values) != rows:
+            raise ValueError(f"列 {name} 的长度与其它列不一致")
+        data = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<")).tobytes()
+        descriptors.append(
+            {"name": name, "dtype": values.dtype.name, "offset": offset, "length": len(data)}
+        )
+        blobs.append(data)
+        blobs.append(b"\0" * _padding(len(data)))
+        offset += len(data) + _padding(len(data))
+
+    header = json.dumps(
+        {"meta": _finite(meta), "rows": rows, "columns": descriptors},
+        ensure_ascii=False,
+        allow_nan=False,
+        default=str,
+    ).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    return b"".join([prefix, b"\0" * _padding(len(prefix))] + blobs)
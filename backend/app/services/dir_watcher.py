@@ -0,0 +1,225 @@
+"""DATA_DIR 目录监视：后台预解析新出现或被修改的 STDF 文件
+
+按间隔轮询目录（不依赖 inotify，网络共享目录也可用）。文件大小和修改时间
+在两次轮询之间保持不变才视为写入完成，然后以低优先级提交解析任务；
+解析完成后写入摘要、测试项列表和 Wafer Map 的数据库缓存。
+同时进行的预解析任务数有上限，不会占满解析工作池。
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+from ..models.db_models import STDFFile
+from .parse_scheduler import ACTIVE_STATUSES, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+STDF_SUFFIXES = (".stdf", ".std")
+
+
+def _is_enabled() -> bool:
+    return os.getenv("STDF_WATCH_DATA_DIR", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_interval() -> float:
+    """轮询间隔（秒），默认 10"""
+    try:
+        return max(1.0, float(os.getenv("STDF_WATCH_INTERVAL", "10")))
+    except ValueError:
+        return 10.0
+
+
+def _get_max_jobs() -> int:
+    """同时进行的预解析任务数，默认 1"""
+    try:
+        return max(1, int(os.getenv("STDF_WATCH_MAX_JOBS", "1")))
+    except ValueError:
+        return 1
+
+
+class DataDirWatcher:
+    """轮询数据目录并把新文件交给解析服务预解析"""
+
+    def __init__(
+        self,
+        parser_service,
+        get_data_dir: Callable[[], Path],
+        session_factory: Optional[Callable] = None,
+    ):
+        self._parser_service = parser_service
+        self._get_data_dir = get_data_dir
+        self._session_factory = session_factory
+        self.enabled = _is_enabled()
+        self.interval = _get_interval()
+        self.max_jobs = _get_max_jobs()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 路径 -> (大小, 修改时间)：上一次轮询看到的、已处理过的
+        self._last_seen: Dict[str, tuple] = {}
+        self._handled: Dict[str, tuple] = {}
+        self._queue: Deque[str] = deque()
+        # 路径 -> 解析任务 ID
+        self._running: Dict[str, str] = {}
+        self.processed = 0
+        self.failed = 0
+
+    # ========== 公共接口 ==========
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="data-dir-watcher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "interval_seconds": self.interval,
+                "max_jobs": self.max_jobs,
+                "queued": len(self._queue),
+                "running": len(self._running),
+                "processed": self.processed,
+                "failed": self.failed,
+            }
+
+    def poll(self) -> None:
+        """扫描一次目录，收集已完成的任务并提交排队的文件"""
+        current = self._scan()
+        with self._lock:
+            for path, signature in current.items():
+                if self._handled.get(path) == signature:
+                    continue
+                # 与上一次轮询相同才认为写入已完成
+                if self._last_seen.get(path) == signature:
+                    self._handled[path] = signature
+                    if path not in self._queue and path not in self._running:
+                        self._queue.append(path)
+            self._last_seen = current
+            for path in list(self._handled):
+                if path not in current:
+                    del self._handled[path]
+        self._collect_finished()
+        self._dispatch()
+
+    # ========== 内部实现 ==========
+
+    def _scan(self) -> Dict[str, tuple]:
+        data_dir = self._get_data_dir()
+        if not data_dir.exists():
+            return {}
+        files = {}
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                # 以 . 开头的是上传中的临时文件
+                if entry.name.startswith(".") or not entry.name.lower().endswith(STDF_SUFFIXES):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def _baseline(self) -> None:
+        """启动时已在数据库中有记录的文件视为已处理，不重新预解析"""
+        current = self._scan()
+        db = self._get_session_factory()()
+        try:
+            known = {
+                name for (name,) in db.query(STDFFile.filename)
+                .filter(STDFFile.parse_time.isnot(None))
+                .all()
+            }
+        finally:
+            db.close()
+        with self._lock:
+            self._last_seen = dict(current)
+            for path, signature in current.items():
+                if os.path.basename(path) in known:
+                    self._handled[path] = signature
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                if len(self._running) >= self.max_jobs or not self._queue:
+                    return
+                path = self._queue.popleft()
+            if not os.path.exists(path):
+                continue
+            try:
+                job = self._parser_service.start_parse(path, priority=PRIORITY_BACKGROUND)
+            except OSError as exc:
+                logger.warning("提交预解析失败: %s (%s)", path, exc)
+                continue
+            with self._lock:
+                self._running[path] = job["job_id"]
+
+    def _collect_finished(self) -> None:
+        with self._lock:
+            running = list(self._running.items())
+        for path, job_id in running:
+            job = self._parser_service.get_progress(job_id)
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                continue
+            with self._lock:
+                del self._running[path]
+            if job is not None and job["status"] == "done":
+                self._fill_db_cache(path)
+            else:
+                with self._lock:
+                    self.failed += 1
+                logger.warning(
+                    "预解析失败: %s (%s)", path, (job or {}).get("error") or "任务已过期"
+                )
+
+    def _fill_db_cache(self, path: str) -> None:
+        """记录文件（含解析耗时）并写入摘要、测试项列表和 Wafer Map 的数据库缓存（结果已在内存中）"""
+        db = self._get_session_factory()()
+        try:
+            self._parser_service.register_file(
+                path, db, self._parser_service.take_parse_time(path)
+            )
+            self._parser_service.get_summary(path, db=db)
+            self._parser_service.get_test_list(path, db=db)
+            self._parser_service.get_wafer_map(path, db=db)
+            with self._lock:
+                self.processed += 1
+        except Exception as exc:
+            db.rollback()
+            with self._lock:
+                self.failed += 1
+            logger.warning("写入预解析缓存失败: %s (%s)", path, exc)
+        finally:
+            db.close()
+
+    def _get_session_factory(self) -> Callable:
+        if self._session_factory is None:
+            from ..database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _loop(self) -> None:
+        try:
+            self._baseline()
+        except Exception as exc:
+            logger.warning("读取已解析文件列表失败，将预解析目录中的所有文件: %s", exc)
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as exc:
+                logger.warning("扫描数据目录失败: %s", exc)
@@ -0,0 +1,96 @@
+"""按字节预算淘汰的内存 LRU 缓存"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+def _get_max_bytes() -> int:
+    """内存缓存预算（MB），默认 2048"""
+    try:
+        return int(os.getenv("STDF_MEMORY_CACHE_MB", "2048")) * 1024 * 1024
+    except ValueError:
+        return 2048 * 1024 * 1024
+
+
+class MemoryCache:
+    """LRU 缓存：总估算大小超过预算时淘汰最久未使用的条目
+
+    pinned_keys 返回当前不可淘汰的 key（如仍在解析的文件）；只剩固定条目时
+    允许暂时超出预算。
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        pinned_keys: Optional[Callable[[], Iterable[str]]] = None,
+    ):
+        self.max_bytes = _get_max_bytes() if max_bytes is None else max_bytes
+        self._pinned_keys = pinned_keys
+        self._lock = threading.Lock()
+        # key -> (value, 估算字节数)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """返回缓存值并标记为最近使用（不计入命中统计）"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, value: Any, nbytes: int) -> None:
+        """写入条目并按预算淘汰其它条目"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+        self._evict(keep=key)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self, keep: str) -> None:
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+        pinned = set(self._pinned_keys()) if self._pinned_keys else set()
+        with self._lock:
+            for key in list(self._entries):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if key == keep or key in pinned:
+                    continue
+                _, nbytes = self._entries.pop(key)
+                self._total_bytes -= nbytes
+                self.evictions += 1
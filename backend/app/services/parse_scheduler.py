@@ -0,0 +1,404 @@
+"""解析任务调度器
+
+固定大小的工作池（默认是进程池，避开 GIL）执行解析任务：按优先级出队，
+支持取消、单任务超时以及已结束任务的定期清理。
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+# 优先级：数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+ACTIVE_STATUSES = frozenset({"pending", "running"})
+
+# 主进程轮询工作进程进度的间隔（秒）
+PROGRESS_POLL_INTERVAL = 0.2
+
+
+class ParseCancelled(Exception):
+    """解析任务被取消"""
+
+
+class ParseTimeout(Exception):
+    """解析任务超时"""
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def _get_worker_count() -> int:
+    """工作池大小，默认不超过 4"""
+    return max(1, _get_int_env("STDF_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def _use_processes() -> bool:
+    return os.getenv("STDF_PARSE_EXECUTOR", "process").strip().lower() != "thread"
+
+
+# ========== 工作进程侧 ==========
+
+_worker_progress = None
+_worker_cancel = None
+
+
+def _init_worker(progress, cancel) -> None:
+    """工作进程初始化：保存与主进程共享的进度/取消标志数组"""
+    global _worker_progress, _worker_cancel
+    _worker_progress = progress
+    _worker_cancel = cancel
+
+
+def _run_in_worker(target: Callable, slot: int, deadline: float, args: tuple, kwargs: dict):
+    """在工作进程中执行 target，进度写入共享数组，并在每次进度回调时检查取消与超时"""
+
+    def report(percent: int, stage: Optional[str] = None) -> None:
+        # 阶段名只在调度线程内执行的任务中记录，工作进程只共享百分比
+        _worker_progress[slot] = percent
+        if _worker_cancel[slot]:
+            raise ParseCancelled()
+        if deadline and time.time() > deadline:
+            raise ParseTimeout()
+
+    return target(*args, on_progress=report, **kwargs)
+
+
+# ========== 主进程侧 ==========
+
+class _Task:
+    __slots__ = ("target", "args", "kwargs", "on_done", "local")
+
+    def __init__(
+        self, target: Callable, args: tuple, kwargs: dict, on_done: Optional[Callable], local: bool
+    ):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.local = local
+
+
+class ParseScheduler:
+    """有界解析任务调度器
+
+    target 必须是模块级函数（进程池需要按引用序列化），调用形式为
+    target(*args, on_progress=callback, **kwargs)，返回值交给 on_done 在主进程处理；
+    callback(percent, stage=None) 只写任务字典或共享数组，不获取调度器的锁。
+    local=True 的任务直接在调度线程中执行，可通过 run_in_workers 把子任务分发到工作池。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        use_processes: Optional[bool] = None,
+        job_timeout: Optional[float] = None,
+        job_ttl: Optional[float] = None,
+    ):
+        self.max_workers = max_workers or _get_worker_count()
+        self.use_processes = _use_processes() if use_processes is None else use_processes
+        self.job_timeout = (
+            _get_int_env("STDF_PARSE_TIMEOUT", 1800) if job_timeout is None else job_timeout
+        )
+        self.job_ttl = _get_int_env("STDF_PARSE_JOB_TTL", 600) if job_ttl is None else job_ttl
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._finished = threading.Condition(self._lock)
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._jobs: Dict[str, Dict] = {}
+        self._job_by_key: Dict[str, str] = {}
+        self._tasks: Dict[str, _Task] = {}
+        self._threads: List[threading.Thread] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._cancel = None
+
+    # ========== 公共接口 ==========
+
+    def submit(
+        self,
+        key: str,
+        target: Callable,
+        args: tuple = (),
+        kwargs: Optional[dict] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_done: Optional[Callable] = None,
+        info: Optional[Dict] = None,
+        local: bool = False,
+    ) -> Dict:
+        """提交任务；同一 key 已有未结束的任务时直接返回该任务（必要时提升其优先级）"""
+        with self._wakeup:
+            self._evict_finished_locked()
+            existing = self._jobs.get(self._job_by_key.get(key, ""))
+            if existing and existing["status"] in ACTIVE_STATUSES:
+                if existing["status"] == "pending" and priority < existing["priority"]:
+                    existing["priority"] = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), existing["job_id"]))
+                    self._wakeup.notify()
+                return dict(existing)
+
+            job = self._new_job_locked(key, "pending", priority, info)
+            self._tasks[job["job_id"]] = _Task(target, args, kwargs or {}, on_done, local)
+            heapq.heappush(self._queue, (priority, next(self._seq), job["job_id"]))
+            self._start_threads_locked()
+            self._wakeup.notify()
+            return dict(job)
+
+    def add_finished(self, key: str, info: Optional[Dict] = None) -> Dict:
+        """登记一个无需执行、直接完成的任务（如命中缓存）"""
+        with self._lock:
+            self._evict_finished_locked()
+            job = self._new_job_locked(key, "done", PRIORITY_INTERACTIVE, info)
+            job["percent"] = 100
+            job["finished_at"] = job["created_at"]
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._evict_finished_locked()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find_active(self, key: str) -> Optional[Dict]:
+        """返回该 key 仍在排队或运行中的任务，没有时返回 None"""
+        with self._lock:
+            job = self._jobs.get(self._job_by_key.get(key, ""))
+            if job and job["status"] in ACTIVE_STATUSES:
+                return dict(job)
+            return None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """阻塞等待任务结束（或超时），返回任务当前状态"""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._finished:
+            job = self._jobs.get(job_id)
+            while job is not None and job["status"] in ACTIVE_STATUSES:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._finished.wait(remaining)
+            return dict(job) if job else None
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """取消任务：排队中的立即取消，运行中的在下一次进度回调时中止"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            if job["status"] == "pending":
+                self._tasks.pop(job_id, None)
+                self._finish_locked(job, "cancelled", "解析任务已取消")
+            elif job["status"] == "running":
+                job["cancel_requested"] = True
+            return dict(job)
+
+    def run_in_workers(
+        self,
+        target: Callable,
+        arg_list: List[tuple],
+        on_progress: Optional[Callable] = None,
+    ) -> List:
+        """把 target(*args) 分发到工作池并按 arg_list 顺序返回结果
+
+        供 local 任务使用；等待期间定期以已完成的子任务数调用 on_progress，
+        on_progress 抛出异常（取消/超时）时撤销尚未开始的子任务。
+        """
+        if not self.use_processes:
+            results = []
+            for args in arg_list:
+                results.append(target(*args))
+                if on_progress:
+                    on_progress(len(results))
+            return results
+
+        executor = self._get_executor()
+        futures = []
+        try:
+            futures = [executor.submit(target, *args) for args in arg_list]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=PROGRESS_POLL_INTERVAL)
+                if on_progress:
+                    on_progress(len(futures) - len(pending))
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def active_keys(self) -> List[str]:
+        """返回仍在排队或运行中的任务 key"""
+        with self._lock:
+            return [
+                key for key, job_id in self._job_by_key.items()
+                if self._jobs.get(job_id, {}).get("status") in ACTIVE_STATUSES
+            ]
+
+    # ========== 内部实现 ==========
+
+    def _new_job_locked(self, key: str, status: str, priority: int, info: Optional[Dict]) -> Dict:
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "key": key,
+            "status": status,
+            "percent": 0,
+            "stage": None,
+            "error": None,
+            "priority": priority,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "cancel_requested": False,
+        }
+        if info:
+            job.update(info)
+        self._jobs[job_id] = job
+        self._job_by_key[key] = job_id
+        return job
+
+    def _finish_locked(self, job: Dict, status: str, error: Optional[str] = None) -> None:
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = time.time()
+        if status == "done":
+            job["percent"] = 100
+        self._finished.notify_all()
+
+    def _evict_finished_locked(self) -> None:
+        """清理结束超过 job_ttl 秒的任务"""
+        if self.job_ttl <= 0:
+            return
+        expire_before = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < expire_before
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._job_by_key.get(job["key"]) == job_id:
+                del self._job_by_key[job["key"]]
+
+    def _start_threads_locked(self) -> None:
+        if self._threads:
+            return
+        if self.use_processes:
+            context = multiprocessing.get_context("spawn")
+            self._progress = context.RawArray("i", self.max_workers)
+            self._cancel = context.RawArray("b", self.max_workers)
+        for slot in range(self.max_workers):
+            thread = threading.Thread(
+                target=self._dispatch_loop, args=(slot,), name=f"parse-dispatch-{slot}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._progress, self._cancel),
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _next_job_locked(self) -> Optional[str]:
+        while self._queue:
+            priority, _, job_id = heapq.heappop(self._queue)
+            job = self._jobs.get(job_id)
+            # 已取消或已被更高优先级条目取代的队列项直接丢弃
+            if job is None or job["status"] != "pending" or job["priority"] != priority:
+                continue
+            if job_id not in self._tasks:
+                continue
+            return job_id
+        return None
+
+    def _dispatch_loop(self, slot: int) -> None:
+        while True:
+            with self._wakeup:
+                job_id = self._next_job_locked()
+                while job_id is None:
+                    self._wakeup.wait()
+                    job_id = self._next_job_locked()
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                task = self._tasks.pop(job_id)
+            self._execute(slot, job, task)
+
+    def _execute(self, slot: int, job: Dict, task: _Task) -> None:
+        deadline = job["started_at"] + self.job_timeout if self.job_timeout > 0 else 0
+        status, error = "done", None
+        try:
+            if self.use_processes and not task.local:
+                result = self._execute_in_process(slot, job, task, deadline)
+            else:
+                result = self._execute_in_thread(job, task, deadline)
+            if task.on_done:
+                task.on_done(result)
+        except ParseCancelled:
+            status, error = "cancelled", "解析任务已取消"
+        except ParseTimeout:
+            status, error = "error", f"解析超时（超过 {self.job_timeout} 秒）"
+        except BrokenProcessPool as exc:
+            status, error = "error", f"解析进程异常退出: {exc}"
+        except Exception as exc:
+            status, error = "error", str(exc)
+        with self._lock:
+            self._finish_locked(job, status, error)
+
+    def _execute_in_process(self, slot: int, job: Dict, task: _Task, deadline: float):
+        self._progress[slot] = 0
+        self._cancel[slot] = 0
+        executor = self._get_executor()
+        try:
+            future = executor.submit(
+                _run_in_worker, task.target, slot, deadline, task.args, task.kwargs
+            )
+            while True:
+                done, _ = wait([future], timeout=PROGRESS_POLL_INTERVAL)
+                job["percent"] = max(job["percent"], self._progress[slot])
+                if done:
+                    return future.result()
+                if job["cancel_requested"]:
+                    self._cancel[slot] = 1
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+
+    def _execute_in_thread(self, job: Dict, task: _Task, deadline: float):
+        def report(percent: int, stage: Optional[str] = None) -> None:
+            job["percent"] = max(job["percent"], percent)
+            if stage:
+                job["stage"] = stage
+            if job["cancel_requested"]:
+                raise ParseCancelled()
+            if deadline and time.time() > deadline:
+                raise ParseTimeout()
+
+        return task.target(*task.args, on_progress=report, **task.kwargs)
@@ -0,0 +1,182 @@
+"""PRR 级数据入库：把每个 part 写入 stdf_parts 表，支持跨文件按坐标或 bin 查询
+
+入库是可选阶段（STDF_INGEST_PARTS=1），在摘要写入数据库缓存时执行，
+也可通过 /api/parts 路由对单个文件手动触发。PostgreSQL 上使用 COPY，
+其它数据库按批 executemany 插入。
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.db_models import STDFFile, STDFFileMeta, STDFPart
+from .result_store import MISSING_COORD, PartStore
+
+logger = logging.getLogger(__name__)
+
+# executemany 每批插入的行数
+INGEST_BATCH_SIZE = 5000
+
+INGEST_COLUMNS = (
+    "file_id", "part_index", "part_id", "head_num", "site_num", "x_coord", "y_coord",
+    "hard_bin", "soft_bin", "part_flg", "test_time",
+)
+
+
+def _is_enabled() -> bool:
+    return os.getenv("STDF_INGEST_PARTS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _part_rows(file_id: int, parts: PartStore) -> List[tuple]:
+    """PartStore 各列转换为按 INGEST_COLUMNS 排列的行，缺失坐标写为 NULL"""
+    x_coords = [None if x == MISSING_COORD else x for x in parts["x_coord"].tolist()]
+    y_coords = [None if y == MISSING_COORD else y for y in parts["y_coord"].tolist()]
+    return [
+        (file_id,) + row
+        for row in zip(
+            parts["part_index"].tolist(),
+            parts.part_id,
+            parts["head_num"].tolist(),
+            parts["site_num"].tolist(),
+            x_coords,
+            y_coords,
+            parts["hard_bin"].tolist(),
+            parts["soft_bin"].tolist(),
+            parts["part_flg"].tolist(),
+            parts["test_t"].tolist(),
+        )
+    ]
+
+
+class PartIngestService:
+    """stdf_parts 表的写入与查询"""
+
+    def __init__(self):
+        self.enabled = _is_enabled()
+
+    # ========== 入库 ==========
+
+    @staticmethod
+    def is_ingested(db: Session, file_id: int) -> bool:
+        return db.query(STDFPart.id).filter(STDFPart.file_id == file_id).first() is not None
+
+    def ingest(self, db: Session, file_id: int, parts: PartStore) -> int:
+        """替换该文件的全部 part 行，返回写入的行数"""
+        rows = _part_rows(file_id, parts)
+        db.query(STDFPart).filter(STDFPart.file_id == file_id).delete(synchronize_session=False)
+        if db.get_bind().dialect.name == "postgresql":
+            self._copy_rows(db, rows)
+        else:
+            table = STDFPart.__table__
+            for start in range(0, len(rows), INGEST_BATCH_SIZE):
+                batch = rows[start:start + INGEST_BATCH_SIZE]
+                db.execute(table.insert(), [dict(zip(INGEST_COLUMNS, row)) for row in batch])
+        db.commit()
+        logger.info("part 入库: file_id=%d，%d 行", file_id, len(rows))
+        return len(rows)
+
+    @staticmethod
+    def _copy_rows(db: Session, rows: List[tuple]) -> None:
+        """PostgreSQL（psycopg 3）：在当前事务中用 COPY FROM STDIN 写入"""
+        raw = db.connection().connection
+        statement = f"COPY {STDFPart.__tablename__} ({', '.join(INGEST_COLUMNS)}) FROM STDIN"
+        with raw.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+    # ========== 查询 ==========
+
+    @staticmethod
+    def _query(db: Session):
+        return (
+            db.query(STDFPart, STDFFile.filename, STDFFileMeta.lot_id, STDFFileMeta.start_time)
+            .join(STDFFile, STDFFile.id == STDFPart.file_id)
+            .outerjoin(STDFFileMeta, STDFFileMeta.file_id == STDFPart.file_id)
+        )
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        part, filename, lot_id, start_time = row
+        return {
+            "filename": filename,
+            "lot_id": lot_id or "",
+            "start_time": start_time,
+            "part_index": part.part_index,
+            "part_id": part.part_id,
+            "head_num": part.head_num,
+            "site_num": part.site_num,
+            "x_coord": part.x_coord,
+            "y_coord": part.y_coord,
+            "hard_bin": part.hard_bin,
+            "soft_bin": part.soft_bin,
+            "part_flag": part.part_flg,
+            "test_time": part.test_time,
+        }
+
+    def find_die(
+        self,
+        db: Session,
+        x_coord: int,
+        y_coord: int,
+        lot_id: Optional[str] = None,
+        filenames: Optional[List[str]] = None,
+    ) -> List[Dict]:
+        """某坐标在所有已入库文件中的每次测试（含重测），按开始时间、文件和 part 顺序"""
+        query = self._query(db).filter(STDFPart.x_coord == x_coord, STDFPart.y_coord == y_coord)
+        if lot_id:
+            query = query.filter(STDFFileMeta.lot_id == lot_id)
+        if filenames:
+            query = query.filter(STDFFile.filename.in_(filenames))
+        rows = query.order_by(
+            STDFFileMeta.start_time, STDFFile.filename, STDFPart.part_index
+        ).all()
+        return [self._to_dict(row) for row in rows]
+
+    def find_parts(
+        self,
+        db: Session,
+        hard_bin: Optional[int] = None,
+        soft_bin: Optional[int] = None,
+        lot_id: Optional[str] = None,
+        start_from: Optional[int] = None,
+        start_to: Optional[int] = None,
+        page: int = 1,
+        page_size: int = 100,
+    ) -> Tuple[int, List[Dict]]:
+        """按 bin、批次和文件开始时间（Unix 秒）筛选 part，返回 (总数, 当前页)"""
+        query = self._query(db)
+        if hard_bin is not None:
+            query = query.filter(STDFPart.hard_bin == hard_bin)
+        if soft_bin is not None:
+            query = query.filter(STDFPart.soft_bin == soft_bin)
+        if lot_id:
+            query = query.filter(STDFFileMeta.lot_id == lot_id)
+        if start_from is not None:
+            query = query.filter(STDFFileMeta.start_time >= start_from)
+        if start_to is not None:
+            query = query.filter(STDFFileMeta.start_time < start_to)
+        total = query.order_by(None).count()
+        rows = (
+            query.order_by(STDFFileMeta.start_time.desc(), STDFPart.file_id, STDFPart.part_index)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+            .all()
+        )
+        return total, [self._to_dict(row) for row in rows]
+
+    def stats(self, db: Session) -> Dict:
+        total_parts, total_files = db.query(
+            func.count(STDFPart.id), func.count(func.distinct(STDFPart.file_id))
+        ).one()
+        return {
+            "enabled": self.enabled,
+            "total_parts": int(total_parts),
+            "ingested_files": int(total_files),
+        }
+
+
+part_ingest = PartIngestService()
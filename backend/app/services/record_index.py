@@ -0,0 +1,274 @@
+"""STDF 记录偏移索引
+
+首次完整解析后在后台为文件建立索引，按文件哈希保存为 .npz：
+每种非逐 part 记录的字节偏移、每个 part 从 PIR（或隐式开始的第一条测试记录）
+到 PRR 结束的字节范围，以及每条 PTR 的偏移和测试编号。之后查看表头、
+单个 die 或单个测试项时可直接按偏移读取，无需重新遍历整个文件。
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .cache_service import calculate_file_hash
+from .result_store import MISSING_COORD
+from .stdf_decoder import RECORD_TYPES, StdfDecoder, detect_endian
+
+INDEX_VERSION = 1
+
+# 逐 part 出现的记录由 part 范围和 PTR 偏移覆盖，不单独记录偏移
+_PER_PART_RECORDS = frozenset({"PIR", "PRR", "PTR", "FTR", "MPR"})
+
+# 建索引时汇报进度的间隔（字节）
+_PROGRESS_STEP = 16 * 1024 * 1024
+
+
+def _get_index_dir() -> Path:
+    index_dir = os.getenv("STDF_INDEX_DIR")
+    if index_dir:
+        return Path(index_dir)
+    return Path(__file__).resolve().parent.parent.parent / "stdf_index"
+
+
+def _path_key(file_path: str) -> str:
+    return hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+
+
+def index_path(file_path: str, file_hash: str) -> Path:
+    """返回文件（路径 + 内容哈希）对应的索引文件路径：{路径摘要}.{哈希}.npz"""
+    return _get_index_dir() / f"{_path_key(file_path)}.{file_hash}.npz"
+
+
+def _unlink(paths: Iterable[Path]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def remove_stale_indexes(file_path: str, keep: Path) -> int:
+    """删除同一文件其它内容版本的索引，返回删除的文件数"""
+    index_dir = _get_index_dir()
+    if not index_dir.exists():
+        return 0
+    return _unlink(p for p in index_dir.glob(f"{_path_key(file_path)}.*.npz") if p != keep)
+
+
+def remove_index_files(file_hashes: Optional[Iterable[str]] = None) -> int:
+    """删除给定内容哈希的索引，file_hashes 为 None 时删除全部，返回删除的文件数"""
+    index_dir = _get_index_dir()
+    if not index_dir.exists():
+        return 0
+    if file_hashes is None:
+        return _unlink(index_dir.glob("*.npz"))
+    return _unlink(
+        path for file_hash in set(file_hashes) for path in index_dir.glob(f"*{file_hash}.npz")
+    )
+
+
+class RecordIndex:
+    """单个 STDF 文件的记录偏移索引"""
+
+    def __init__(self, endian: str, arrays: Dict[str, np.ndarray]):
+        self.endian = endian
+        # 记录名 -> 偏移数组（如 MIR、MRR、HBR）
+        self.records = {
+            name[4:]: values for name, values in arrays.items() if name.startswith("rec_")
+        }
+        # part 按出现顺序编号，与收集器中的 part 序号一致
+        self.part_start = arrays["part_start"]
+        self.part_end = arrays["part_end"]
+        self.part_head = arrays["part_head"]
+        self.part_site = arrays["part_site"]
+        self.part_x = arrays["part_x"]
+        self.part_y = arrays["part_y"]
+        self.ptr_offset = arrays["ptr_offset"]
+        self.ptr_test_num = arrays["ptr_test_num"]
+
+    @property
+    def part_count(self) -> int:
+        return len(self.part_start)
+
+    def nbytes(self) -> int:
+        arrays = [self.part_start, self.part_end, self.part_head, self.part_site,
+                  self.part_x, self.part_y, self.ptr_offset, self.ptr_test_num]
+        return sum(a.nbytes for a in arrays) + sum(a.nbytes for a in self.records.values())
+
+    # ========== 建立 ==========
+
+    @classmethod
+    def build(cls, file_path: str, on_progress=None) -> "RecordIndex":
+        """只读记录头（以及 PTR 的测试编号、PRR 的坐标）建立索引"""
+        with open(file_path, "rb") as raw_file:
+            endian = detect_endian(raw_file.read(6))
+            with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                arrays = cls._scan(mapped, endian, on_progress)
+        return cls(endian, arrays)
+
+    @staticmethod
+    def _scan(buf, endian: str, on_progress=None) -> Dict[str, np.ndarray]:
+        unpack_header = struct.Struct(endian + "HBB").unpack_from
+        unpack_test_num = struct.Struct(endian + "I").unpack_from
+        unpack_coords = struct.Struct(endian + "hh").unpack_from
+
+        records: Dict[str, array] = {}
+        part_start, part_end = array("q"), array("q")
+        part_head, part_site = array("B"), array("B")
+        part_x, part_y = array("h"), array("h")
+        ptr_offset, ptr_test_num = array("q"), array("I")
+        # (head, site) -> 未结束的 part 序号（与收集器的隐式 part 语义一致）
+        open_parts: Dict[tuple, int] = {}
+
+        def open_part(key: tuple, pos: int) -> int:
+            part = len(part_start)
+            part_start.append(pos)
+            part_end.append(-1)
+            part_head.append(key[0])
+            part_site.append(key[1])
+            part_x.append(MISSING_COORD)
+            part_y.append(MISSING_COORD)
+            open_parts[key] = part
+            return part
+
+        end = len(buf)
+        pos = 0
+        next_report = _PROGRESS_STEP
+        while pos + 4 <= end:
+            rec_len, rec_typ, rec_sub = unpack_header(buf, pos)
+            body = pos + 4
+            rec_end = body + rec_len
+            if rec_end > end:
+                break
+            if rec_typ == 15 and rec_sub in (10, 20):
+                if rec_len >= 6:
+                    key = (buf[body + 4], buf[body + 5])
+                    if key not in open_parts:
+                        open_part(key, pos)
+                    if rec_sub == 10:
+                        ptr_offset.append(pos)
+                        ptr_test_num.append(unpack_test_num(buf, body)[0])
+            elif rec_typ == 5 and rec_sub in (10, 20):
+                if rec_len >= 2:
+                    key = (buf[body], buf[body + 1])
+                    if rec_sub == 10:
+                        open_part(key, pos)
+                    else:
+                        part = open_parts.pop(key, None)
+                        if part is None:
+                            part = open_part(key, pos)
+                            del open_parts[key]
+                        part_end[part] = rec_end
+                        if rec_len >= 13:
+                            part_x[part], part_y[part] = unpack_coords(buf, body + 9)
+            else:
+                name = RECORD_TYPES.get((rec_typ, rec_sub))
+                if name is not None and name not in _PER_PART_RECORDS:
+                    offsets = records.get(name)
+                    if offsets is None:
+                        offsets = records[name] = array("q")
+                    offsets.append(pos)
+            pos = rec_end
+            if on_progress and pos >= next_report:
+                next_report = pos + _PROGRESS_STEP
+                on_progress(min(int(pos * 100 / end), 99))
+
+        arrays = {
+            "part_start": np.array(part_start, dtype=np.int64),
+            "part_end": np.array(part_end, dtype=np.int64),
+            "part_head": np.array(part_head, dtype=np.uint8),
+            "part_site": np.array(part_site, dtype=np.uint8),
+            "part_x": np.array(part_x, dtype=np.int16),
+            "part_y": np.array(part_y, dtype=np.int16),
+            "ptr_offset": np.array(ptr_offset, dtype=np.int64),
+            "ptr_test_num": np.array(ptr_test_num, dtype=np.uint32),
+        }
+        for name, offsets in records.items():
+            arrays[f"rec_{name}"] = np.array(offsets, dtype=np.int64)
+        return arrays
+
+    # ========== 保存 / 加载 ==========
+
+    def save(self, path: Path) -> None:
+        """写入 .npz（先写临时文件再替换，避免读到写了一半的索引）"""
+        arrays = {
+            "version": np.array(INDEX_VERSION),
+            "endian": np.array(self.endian),
+            "part_start": self.part_start,
+            "part_end": self.part_end,
+            "part_head": self.part_head,
+            "part_site": self.part_site,
+            "part_x": self.part_x,
+            "part_y": self.part_y,
+            "ptr_offset": self.ptr_offset,
+            "ptr_test_num": self.ptr_test_num,
+        }
+        for name, offsets in self.records.items():
+            arrays[f"rec_{name}"] = offsets
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["RecordIndex"]:
+        """加载索引，文件不存在或版本不符时返回 None"""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != INDEX_VERSION:
+                    return None
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(str(arrays.pop("endian")), arrays)
+
+    # ========== 按偏移读取 ==========
+
+    def read_records(self, file_path: str, offsets, collector) -> None:
+        """把给定偏移处的记录逐条解码后交给收集器"""
+        with open(file_path, "rb") as raw_file:
+            with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mmap, "MADV_RANDOM"):
+                    mapped.madvise(mmap.MADV_RANDOM)
+                unpack_len = struct.Struct(self.endian + "H").unpack_from
+                decoder = StdfDecoder(collector, self.endian)
+                view = memoryview(mapped)
+                try:
+                    for offset in np.asarray(offsets).tolist():
+                        rec_len = unpack_len(view, offset)[0]
+                        decoder.decode_buffer(view, offset, offset + 4 + rec_len)
+                finally:
+                    view.release()
+
+    def read_range(self, file_path: str, start: int, end: int, collector) -> None:
+        """解码 [start, end) 范围内的全部记录"""
+        with open(file_path, "rb") as raw_file:
+            raw_file.seek(start)
+            data = raw_file.read(end - start)
+        StdfDecoder(collector, self.endian).decode_buffer(data, 0, len(data))
+
+
+def build_index_file(file_path: str, on_progress=None) -> str:
+    """为文件建立索引并按路径和哈希保存（同时删除该文件旧内容的索引），已存在时直接返回路径
+
+    模块级函数，可直接交给解析工作进程执行。
+    """
+    path = index_path(file_path, calculate_file_hash(file_path))
+    if not path.exists():
+        RecordIndex.build(file_path, on_progress).save(path)
+        remove_stale_indexes(file_path, path)
+    return str(path)
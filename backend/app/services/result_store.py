@@ -0,0 +1,358 @@
+"""列式结果存储
+
+解析期间用 array.array 追加定长列，解析完成后冻结为 NumPy 数组；
+测试项文本、单位和上下限在每个测试项的元数据表中只保存一份。
+"""
+
+import copy
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# STDF 中表示坐标缺失的值
+MISSING_COORD = -32768
+
+
+class ColumnTable:
+    """定长列表：构建期追加到 array.array，冻结后以 NumPy 数组读取"""
+
+    # (列名, array 类型码, NumPy dtype)
+    COLUMNS: Tuple[Tuple[str, str, type], ...] = ()
+
+    def __init__(self):
+        self._builders: Optional[Dict[str, array]] = {
+            name: array(code) for name, code, _ in self.COLUMNS
+        }
+        self._columns: Dict[str, np.ndarray] = {}
+        self._bind()
+
+    def __len__(self) -> int:
+        if self._builders is not None:
+            first = self.COLUMNS[0][0]
+            return len(self._builders[first])
+        return len(self._columns[self.COLUMNS[0][0]])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        self.freeze()
+        return self._columns[name]
+
+    @property
+    def frozen(self) -> bool:
+        return self._builders is None
+
+    def freeze(self) -> None:
+        """把构建缓冲区转换为 NumPy 数组（零拷贝）"""
+        if self._builders is None:
+            return
+        for name, _, dtype in self.COLUMNS:
+            builder = self._builders[name]
+            if len(builder):
+                self._columns[name] = np.frombuffer(builder, dtype=dtype)
+            else:
+                self._columns[name] = np.empty(0, dtype=dtype)
+        self._builders = None
+        self._bind()
+
+    def copy(self) -> "ColumnTable":
+        """返回可追加的副本，原表保持不变（用于增量解析）"""
+        clone = copy.copy(self)
+        builders = {}
+        for name, code, _ in self.COLUMNS:
+            builder = array(code)
+            if self._builders is None:
+                builder.frombytes(self._columns[name].tobytes())
+            else:
+                builder.extend(self._builders[name])
+            builders[name] = builder
+        clone._builders = builders
+        clone._columns = {}
+        clone._bind()
+        return clone
+
+    def _set_columns(self, columns: Dict[str, np.ndarray]) -> None:
+        """直接以冻结状态载入列数据"""
+        self._builders = None
+        self._columns = columns
+        self._bind()
+
+    @classmethod
+    def _concat_columns(cls, pieces: Dict[str, List[np.ndarray]]) -> Dict[str, np.ndarray]:
+        return {
+            name: np.concatenate(pieces[name]) if pieces[name] else np.empty(0, dtype=dtype)
+            for name, _, dtype in cls.COLUMNS
+        }
+
+    def _bind(self) -> None:
+        """缓存各列构建缓冲区的 append 方法，按 COLUMNS 顺序排列"""
+        if self._builders is None:
+            self._appenders = None
+            return
+        self._appenders = tuple(self._builders[name].append for name, _, _ in self.COLUMNS)
+
+    def nbytes(self) -> int:
+        if self._builders is not None:
+            return sum(b.itemsize * len(b) for b in self._builders.values())
+        return sum(col.nbytes for col in self._columns.values())
+
+
+class TestMetaTable:
+    """测试项元数据表：每种 (test_num, test_txt, units, lo_limit, hi_limit) 组合只存一份"""
+
+    def __init__(self):
+        self._ids: Dict[tuple, int] = {}
+        self.test_num: List[int] = []
+        self.test_txt: List[str] = []
+        self.units: List[str] = []
+        self.lo_limit: List[Optional[float]] = []
+        self.hi_limit: List[Optional[float]] = []
+        self._limit_cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.test_num)
+
+    def get_id(self, test_num: int, test_txt, units, lo_limit, hi_limit) -> int:
+        # NaN 不等于自身，无法作为字典键命中，统一按缺失处理
+        if lo_limit != lo_limit:
+            lo_limit = None
+        if hi_limit != hi_limit:
+            hi_limit = None
+        key = (test_num, test_txt, units, lo_limit, hi_limit)
+        meta_id = self._ids.get(key)
+        if meta_id is None:
+            meta_id = len(self.test_num)
+            self._ids[key] = meta_id
+            self.test_num.append(test_num)
+            self.test_txt.append(test_txt or "")
+            self.units.append(units or "")
+            self.lo_limit.append(None if lo_limit is None else float(lo_limit))
+            self.hi_limit.append(None if hi_limit is None else float(hi_limit))
+        return meta_id
+
+    def copy(self) -> "TestMetaTable":
+        clone = TestMetaTable()
+        clone._ids = dict(self._ids)
+        clone.test_num = list(self.test_num)
+        clone.test_txt = list(self.test_txt)
+        clone.units = list(self.units)
+        clone.lo_limit = list(self.lo_limit)
+        clone.hi_limit = list(self.hi_limit)
+        return clone
+
+    def limit_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """返回上下限数组，缺失的限值为 NaN（元数据表增长前重复调用直接返回缓存）"""
+        cached = self._limit_cache
+        if cached is None or len(cached[0]) != len(self.test_num):
+            lo = np.array([np.nan if v is None else v for v in self.lo_limit], dtype=np.float64)
+            hi = np.array([np.nan if v is None else v for v in self.hi_limit], dtype=np.float64)
+            cached = self._limit_cache = (lo, hi)
+        return cached
+
+    def nbytes(self) -> int:
+        text_bytes = sum(len(t) for t in self.test_txt) + sum(len(u) for u in self.units)
+        return text_bytes + len(self.test_num) * 160
+
+
+class TestRowIndex:
+    """按 (test_num, site_num) 分组的行号索引
+
+    行号按 (test_num, site_num) 稳定排序，同一组内保持文件顺序；
+    keys 为各组的组合键，starts[i]:starts[i + 1] 为第 i 组在 order 中的范围。
+    """
+
+    def __init__(self, test_nums: np.ndarray, site_nums: np.ndarray):
+        composite = (test_nums.astype(np.uint64) << np.uint64(8)) | site_nums.astype(np.uint64)
+        self.order = np.argsort(composite, kind="stable").astype(np.int32)
+        self.keys, starts = np.unique(composite[self.order], return_index=True)
+        self.starts = np.append(starts, len(self.order)).astype(np.int64)
+
+    def _group_range(self, lo_key: int, hi_key: int) -> Tuple[int, int]:
+        """组合键落在 [lo_key, hi_key) 内的各组在 order 中的范围"""
+        lo = int(np.searchsorted(self.keys, np.uint64(lo_key), side="left"))
+        hi = int(np.searchsorted(self.keys, np.uint64(hi_key), side="left"))
+        return int(self.starts[lo]), int(self.starts[hi])
+
+    def rows(self, test_num: int, site_num: Optional[int] = None) -> np.ndarray:
+        """返回匹配的行号（文件顺序）"""
+        if site_num is not None:
+            key = (test_num << 8) | site_num
+            start, end = self._group_range(key, key + 1)
+            return self.order[start:end]
+        start, end = self._group_range(test_num << 8, (test_num + 1) << 8)
+        # 同一测试项的多个 site 组各自有序，合并后恢复文件顺序
+        return np.sort(self.order[start:end])
+
+    def nbytes(self) -> int:
+        return self.order.nbytes + self.keys.nbytes + self.starts.nbytes
+
+
+class TestResultStore(ColumnTable):
+    """PTR/FTR 列式存储，每行一条测试记录"""
+
+    COLUMNS = (
+        ("test_num", "I", np.uint32),
+        ("head_num", "B", np.uint8),
+        ("site_num", "B", np.uint8),
+        ("test_flg", "B", np.uint8),
+        ("parm_flg", "B", np.uint8),
+        ("result", "f", np.float32),
+        ("part_index", "i", np.int32),
+        ("meta_id", "i", np.int32),
+    )
+
+    def __init__(self):
+        self.meta = TestMetaTable()
+        self._row_index: Optional[TestRowIndex] = None
+        super().__init__()
+
+    def append(
+        self,
+        test_num: int,
+        head_num: int,
+        site_num: int,
+        test_flg: int,
+        parm_flg: int,
+        result: float,
+        part_index: int,
+        meta_id: int,
+    ) -> None:
+        (add_test_num, add_head, add_site, add_flg, add_parm,
+         add_result, add_part, add_meta) = self._appenders
+        add_test_num(test_num)
+        add_head(head_num)
+        add_site(site_num)
+        add_flg(test_flg)
+        add_parm(parm_flg)
+        add_result(result)
+        add_part(part_index)
+        add_meta(meta_id)
+
+    def copy(self) -> "TestResultStore":
+        clone = super().copy()
+        clone.meta = self.meta.copy()
+        clone._row_index = None
+        return clone
+
+    def build_row_index(self) -> TestRowIndex:
+        """冻结并建立 (test_num, site_num) 行号索引"""
+        if self._row_index is None:
+            self._row_index = TestRowIndex(self["test_num"], self["site_num"])
+        return self._row_index
+
+    def select_rows(
+        self, test_num: Optional[int] = None, site_num: Optional[int] = None
+    ) -> Union[np.ndarray, range]:
+        """按测试编号/站点筛选行号（文件顺序），指定测试编号时只访问匹配的行
+
+        不筛选时返回 range(len(self))，调用方切出一页后再索引，不为全部行生成数组。
+        """
+        if test_num is not None:
+            if not 0 <= test_num <= 0xFFFFFFFF or (site_num is not None and not 0 <= site_num <= 255):
+                return np.empty(0, dtype=np.int32)
+            return self.build_row_index().rows(test_num, site_num)
+        if site_num is not None:
+            return np.flatnonzero(self["site_num"] == site_num)
+        return range(len(self))
+
+    @classmethod
+    def concat(cls, stores: List["TestResultStore"], part_offsets: List[int]) -> "TestResultStore":
+        """按顺序合并多个分段的结果，重映射 meta id 并平移 part 序号"""
+        merged = cls()
+        pieces: Dict[str, List[np.ndarray]] = {name: [] for name, _, _ in cls.COLUMNS}
+        for store, part_offset in zip(stores, part_offsets):
+            meta = store.meta
+            mapping = np.array(
+                [
+                    merged.meta.get_id(
+                        meta.test_num[i], meta.test_txt[i], meta.units[i],
+                        meta.lo_limit[i], meta.hi_limit[i],
+                    )
+                    for i in range(len(meta))
+                ],
+                dtype=np.int32,
+            )
+            for name, _, _ in cls.COLUMNS:
+                column = store[name]
+                if name == "meta_id" and len(column):
+                    column = mapping[column]
+                elif name == "part_index":
+                    column = column + np.int32(part_offset)
+                pieces[name].append(column)
+        merged._set_columns(cls._concat_columns(pieces))
+        return merged
+
+    def nbytes(self) -> int:
+        index_bytes = self._row_index.nbytes() if self._row_index is not None else 0
+        return super().nbytes() + self.meta.nbytes() + index_bytes
+
+
+class PartStore(ColumnTable):
+    """PRR 列式存储，每行一个 part"""
+
+    COLUMNS = (
+        ("head_num", "B", np.uint8),
+        ("site_num", "B", np.uint8),
+        ("part_flg", "B", np.uint8),
+        ("num_test", "H", np.uint16),
+        ("hard_bin", "H", np.uint16),
+        ("soft_bin", "H", np.uint16),
+        ("x_coord", "h", np.int16),
+        ("y_coord", "h", np.int16),
+        ("test_t", "I", np.uint32),
+        ("part_index", "i", np.int32),
+    )
+
+    def __init__(self):
+        self.part_id: List[str] = []
+        super().__init__()
+
+    def append(
+        self,
+        head_num: int,
+        site_num: int,
+        part_flg: int,
+        num_test: int,
+        hard_bin: int,
+        soft_bin: int,
+        x_coord: int,
+        y_coord: int,
+        test_t: int,
+        part_index: int,
+        part_id: str,
+    ) -> None:
+        (add_head, add_site, add_flg, add_num_test, add_hard_bin, add_soft_bin,
+         add_x, add_y, add_test_t, add_part) = self._appenders
+        add_head(head_num)
+        add_site(site_num)
+        add_flg(part_flg)
+        add_num_test(num_test)
+        add_hard_bin(hard_bin)
+        add_soft_bin(soft_bin)
+        add_x(x_coord)
+        add_y(y_coord)
+        add_test_t(test_t)
+        add_part(part_index)
+        self.part_id.append(part_id)
+
+    def copy(self) -> "PartStore":
+        clone = super().copy()
+        clone.part_id = list(self.part_id)
+        return clone
+
+    @classmethod
+    def concat(cls, stores: List["PartStore"], part_offsets: List[int]) -> "PartStore":
+        """按顺序合并多个分段的 PRR，平移 part 序号"""
+        merged = cls()
+        pieces: Dict[str, List[np.ndarray]] = {name: [] for name, _, _ in cls.COLUMNS}
+        for store, part_offset in zip(stores, part_offsets):
+            for name, _, _ in cls.COLUMNS:
+                column = store[name]
+                if name == "part_index":
+                    column = column + np.int32(part_offset)
+                pieces[name].append(column)
+            merged.part_id.extend(store.part_id)
+        merged._set_columns(cls._concat_columns(pieces))
+        return merged
+
+    def nbytes(self) -> int:
+        return super().nbytes() + sum(len(p) + 50 for p in self.part_id)
@@ -0,0 +1,382 @@
+"""STDF V4 原生解码器
+
+直接按 REC_LEN/REC_TYP/REC_SUB 批量遍历记录头，热点记录（PTR/PRR/PIR/FTR）
+用预编译的 struct 解码为标量后交给收集器，其余只解码收集器需要的记录类型，
+其它记录按 REC_LEN 直接跳过。pystdf 作为回退与对照实现保留。
+"""
+
+import mmap
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 每次从文件读取的块大小
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+# mmap 模式下每个解码窗口的大小（进度按窗口汇报）
+MMAP_WINDOW_SIZE = 16 * 1024 * 1024
+
+# 记录类型 (REC_TYP, REC_SUB) -> 名称
+RECORD_TYPES: Dict[Tuple[int, int], str] = {
+    (0, 10): "FAR",
+    (0, 20): "ATR",
+    (1, 10): "MIR",
+    (1, 20): "MRR",
+    (1, 30): "PCR",
+    (1, 40): "HBR",
+    (1, 50): "SBR",
+    (1, 60): "PMR",
+    (1, 62): "PGR",
+    (1, 63): "PLR",
+    (1, 70): "RDR",
+    (1, 80): "SDR",
+    (2, 10): "WIR",
+    (2, 20): "WRR",
+    (2, 30): "WCR",
+    (5, 10): "PIR",
+    (5, 20): "PRR",
+    (10, 30): "TSR",
+    (15, 10): "PTR",
+    (15, 15): "MPR",
+    (15, 20): "FTR",
+    (20, 10): "BPS",
+    (20, 20): "EPS",
+    (50, 10): "GDR",
+    (50, 30): "DTR",
+}
+
+# 非热点记录的字段定义（字段名与 pystdf 保持一致）
+RECORD_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    "FAR": [("CPU_TYPE", "U1"), ("STDF_VER", "U1")],
+    "MIR": [
+        ("SETUP_T", "U4"), ("START_T", "U4"), ("STAT_NUM", "U1"), ("MODE_COD", "C1"),
+        ("RTST_COD", "C1"), ("PROT_COD", "C1"), ("BURN_TIM", "U2"), ("CMOD_COD", "C1"),
+        ("LOT_ID", "Cn"), ("PART_TYP", "Cn"), ("NODE_NAM", "Cn"), ("TSTR_TYP", "Cn"),
+        ("JOB_NAM", "Cn"), ("JOB_REV", "Cn"), ("SBLOT_ID", "Cn"), ("OPER_NAM", "Cn"),
+        ("EXEC_TYP", "Cn"), ("EXEC_VER", "Cn"), ("TEST_COD", "Cn"), ("TST_TEMP", "Cn"),
+        ("USER_TXT", "Cn"), ("AUX_FILE", "Cn"), ("PKG_TYP", "Cn"), ("FAMLY_ID", "Cn"),
+        ("DATE_COD", "Cn"), ("FACIL_ID", "Cn"), ("FLOOR_ID", "Cn"), ("PROC_ID", "Cn"),
+        ("OPER_FRQ", "Cn"), ("SPEC_NAM", "Cn"), ("SPEC_VER", "Cn"), ("FLOW_ID", "Cn"),
+        ("SETUP_ID", "Cn"), ("DSGN_REV", "Cn"), ("ENG_ID", "Cn"), ("ROM_COD", "Cn"),
+        ("SERL_NUM", "Cn"), ("SUPR_NAM", "Cn"),
+    ],
+    "MRR": [("FINISH_T", "U4"), ("DISP_COD", "C1"), ("USR_DESC", "Cn"), ("EXC_DESC", "Cn")],
+    "HBR": [
+        ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("HBIN_NUM", "U2"), ("HBIN_CNT", "U4"),
+        ("HBIN_PF", "C1"), ("HBIN_NAM", "Cn"),
+    ],
+    "SBR": [
+        ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("SBIN_NUM", "U2"), ("SBIN_CNT", "U4"),
+        ("SBIN_PF", "C1"), ("SBIN_NAM", "Cn"),
+    ],
+    "WIR": [("HEAD_NUM", "U1"), ("SITE_GRP", "U1"), ("START_T", "U4"), ("WAFER_ID", "Cn")],
+    "WRR": [
+        ("HEAD_NUM", "U1"), ("SITE_GRP", "U1"), ("FINISH_T", "U4"), ("PART_CNT", "U4"),
+        ("RTST_CNT", "U4"), ("ABRT_CNT", "U4"), ("GOOD_CNT", "U4"), ("FUNC_CNT", "U4"),
+        ("WAFER_ID", "Cn"), ("FABWF_ID", "Cn"), ("FRAME_ID", "Cn"), ("MASK_ID", "Cn"),
+        ("USR_DESC", "Cn"), ("EXC_DESC", "Cn"),
+    ],
+    "WCR": [
+        ("WAFR_SIZ", "R4"), ("DIE_HT", "R4"), ("DIE_WID", "R4"), ("WF_UNITS", "U1"),
+        ("WF_FLAT", "C1"), ("CENTER_X", "I2"), ("CENTER_Y", "I2"), ("POS_X", "C1"),
+        ("POS_Y", "C1"),
+    ],
+    "TSR": [
+        ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("TEST_TYP", "C1"), ("TEST_NUM", "U4"),
+        ("EXEC_CNT", "U4"), ("FAIL_CNT", "U4"), ("ALRM_CNT", "U4"), ("TEST_NAM", "Cn"),
+        ("SEQ_NAME", "Cn"), ("TEST_LBL", "Cn"), ("OPT_FLAG", "B1"), ("TEST_TIM", "R4"),
+        ("TEST_MIN", "R4"), ("TEST_MAX", "R4"), ("TST_SUMS", "R4"), ("TST_SQRS", "R4"),
+    ],
+}
+
+# 定长字段的 struct 格式
+_FIXED_FORMATS = {
+    "U1": "B", "U2": "H", "U4": "I",
+    "I1": "b", "I2": "h", "I4": "i",
+    "R4": "f", "R8": "d", "B1": "B",
+}
+
+# 字符串字段解码方式（与 pystdf 的单字节字符语义一致）
+TEXT_ENCODING = "latin-1"
+
+
+class StdfDecodeError(Exception):
+    """原生解码失败（不是 STDF V4 文件或文件已损坏）"""
+
+
+def detect_endian(head: bytes) -> str:
+    """根据首条 FAR 记录判断字节序，返回 struct 字节序前缀"""
+    if len(head) < 6:
+        raise StdfDecodeError("文件过短，不是有效的 STDF 文件")
+    if head[2] != 0 or head[3] != 10:
+        raise StdfDecodeError("首条记录不是 FAR，不是有效的 STDF 文件")
+    if head[5] != 4:
+        raise StdfDecodeError(f"不支持的 STDF 版本: {head[5]}")
+    if head[0:2] == b"\x02\x00":
+        return "<"
+    if head[0:2] == b"\x00\x02":
+        return ">"
+    raise StdfDecodeError("无法识别 FAR 记录长度，不是有效的 STDF 文件")
+
+
+def find_part_boundaries(buf, endian: str, min_chunk_bytes: int) -> List[int]:
+    """只读记录头，找出可以安全切分文件的偏移
+
+    切分点位于某条 PRR 之后、且此时所有 (head, site) 都没有未结束的 part
+    （包括没有 PIR、由 PTR/FTR 隐式开始的 part），因此每段内的 part 都是完整的。
+    返回 [0, p1, p2, ..., end]，end 为最后一条完整记录的结束位置。
+    """
+    unpack_header = struct.Struct(endian + "HBB").unpack_from
+    end = len(buf)
+    pos = 0
+    open_parts = set()
+    points = [0]
+    while pos + 4 <= end:
+        rec_len, rec_typ, rec_sub = unpack_header(buf, pos)
+        body = pos + 4
+        rec_end = body + rec_len
+        if rec_end > end:
+            break
+        if rec_typ == 5 and rec_sub in (10, 20):
+            # 截断的 PIR/PRR 无法确定 site，之后不再切分
+            key = (buf[body], buf[body + 1]) if rec_len >= 2 else None
+            if rec_sub == 10 or key is None:
+                open_parts.add(key)
+            else:
+                open_parts.discard(key)
+                if not open_parts and rec_end - points[-1] >= min_chunk_bytes:
+                    points.append(rec_end)
+        elif rec_typ == 15 and rec_sub in (10, 20):
+            key = (buf[body + 4], buf[body + 5]) if rec_len >= 6 else None
+            open_parts.add(key)
+        pos = rec_end
+    if pos > points[-1]:
+        points.append(pos)
+    return points
+
+
+class StdfDecoder:
+    """STDF V4 解码器，把记录逐条写入 StdfRecordCollector
+
+    record_types 指定需要解码的记录名（如 {"PRR", "WIR"}），其余记录只读记录头，
+    按 REC_LEN 跳过；为 None 时解码收集器用到的全部记录。
+    """
+
+    def __init__(self, collector, endian: str = "<", record_types: Optional[frozenset] = None):
+        self._collector = collector
+        self.endian = endian
+        self._compile(endian)
+        self._handlers: Dict[Tuple[int, int], Callable] = {
+            (15, 10): self._decode_ptr,
+            (15, 20): self._decode_ftr,
+            (5, 10): self._decode_pir,
+            (5, 20): self._decode_prr,
+        }
+        for key, name in RECORD_TYPES.items():
+            if name in RECORD_FIELDS:
+                self._handlers[key] = self._make_generic_handler(name, RECORD_FIELDS[name])
+        if record_types is not None:
+            self._handlers = {
+                key: handler for key, handler in self._handlers.items()
+                if RECORD_TYPES[key] in record_types
+            }
+
+    def _compile(self, endian: str) -> None:
+        self._header = struct.Struct(endian + "HBB")
+        self._ptr_fixed = struct.Struct(endian + "IBBBBf")
+        self._ptr_limits = struct.Struct(endian + "ff")
+        self._ftr_fixed = struct.Struct(endian + "IBBB")
+        self._prr_fixed = struct.Struct(endian + "BBBHHHhhI")
+        self._u2 = struct.Struct(endian + "H")
+        self._u2_pair = struct.Struct(endian + "HH")
+        self._r4 = struct.Struct(endian + "f")
+        self._fixed = {
+            code: struct.Struct(endian + fmt) for code, fmt in _FIXED_FORMATS.items()
+        }
+
+    # ========== 记录遍历 ==========
+
+    def decode_buffer(self, buf, pos: int = 0, end: Optional[int] = None) -> int:
+        """解码 buf[pos:end] 中所有完整的记录，返回第一条不完整记录的位置"""
+        if end is None:
+            end = len(buf)
+        unpack_header = self._header.unpack_from
+        handlers = self._handlers
+        while pos + 4 <= end:
+            rec_len, rec_typ, rec_sub = unpack_header(buf, pos)
+            body = pos + 4
+            rec_end = body + rec_len
+            if rec_end > end:
+                break
+            handler = handlers.get((rec_typ, rec_sub))
+            if handler is not None:
+                handler(buf, body, rec_end)
+            pos = rec_end
+        return pos
+
+    def decode_file(self, file_obj, on_progress=None, total_bytes: int = 0) -> int:
+        """按大块读取文件并解码，返回已完整解码的字节数（末尾不完整的记录不解码）"""
+        pending = b""
+        consumed = 0
+        while True:
+            chunk = file_obj.read(READ_BLOCK_SIZE)
+            if not chunk:
+                break
+            buf = pending + chunk if pending else chunk
+            pos = self.decode_buffer(buf)
+            consumed += pos
+            pending = buf[pos:]
+            if on_progress and total_bytes > 0:
+                on_progress(min(int(consumed * 100 / total_bytes), 99))
+        return consumed
+
+    def decode_mapped(self, file_obj, on_progress=None) -> int:
+        """mmap 映射整个文件，以 memoryview 零拷贝切片解码，按当前偏移汇报进度
+
+        返回已完整解码的字节数。
+        """
+        with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                total = len(view)
+                pos = 0
+                while pos < total:
+                    end = min(pos + MMAP_WINDOW_SIZE, total)
+                    next_pos = self.decode_buffer(view, pos, end)
+                    if end == total or next_pos == pos:
+                        pos = next_pos
+                        break
+                    pos = next_pos
+                    if on_progress:
+                        on_progress(min(int(pos * 100 / total), 99))
+            finally:
+                view.release()
+        return pos
+
+    # ========== 字段读取 ==========
+
+    def _read_cn(self, buf, pos: int, end: int):
+        if pos >= end:
+            return None, end
+        length = buf[pos]
+        stop = min(pos + 1 + length, end)
+        return str(buf[pos + 1:stop], TEXT_ENCODING), pos + 1 + length
+
+    def _read_field(self, buf, pos: int, end: int, code: str):
+        if code == "Cn":
+            return self._read_cn(buf, pos, end)
+        if code == "C1":
+            return str(buf[pos:pos + 1], TEXT_ENCODING), pos + 1
+        if code == "Bn":
+            length = buf[pos]
+            return list(buf[pos + 1:min(pos + 1 + length, end)]), pos + 1 + length
+        packer = self._fixed[code]
+        if pos + packer.size > end:
+            return None, end
+        return packer.unpack_from(buf, pos)[0], pos + packer.size
+
+    def _make_generic_handler(self, name: str, fields: List[Tuple[str, str]]):
+        add_record = self._collector.add_record
+
+        def handler(buf, pos, end):
+            record = {}
+            for field_name, code in fields:
+                if pos >= end:
+                    # 记录被截断：其余字段按 pystdf 的约定置为 None
+                    record[field_name] = None
+                    continue
+                record[field_name], pos = self._read_field(buf, pos, end, code)
+            add_record(name, record)
+
+        return handler
+
+    # ========== 热点记录 ==========
+
+    def _decode_ptr(self, buf, pos: int, end: int) -> None:
+        if end - pos < self._ptr_fixed.size:
+            return self._decode_short(buf, pos, end, "PTR")
+        test_num, head_num, site_num, test_flg, parm_flg, result = self._ptr_fixed.unpack_from(buf, pos)
+        pos += self._ptr_fixed.size
+        test_txt = lo_limit = hi_limit = units = None
+        if pos < end:
+            test_txt, pos = self._read_cn(buf, pos, end)
+            if pos < end:
+                pos += 1 + buf[pos]  # ALARM_ID
+            pos += 4  # OPT_FLAG, RES_SCAL, LLM_SCAL, HLM_SCAL
+            if pos + 8 <= end:
+                lo_limit, hi_limit = self._ptr_limits.unpack_from(buf, pos)
+                pos += 8
+                units, pos = self._read_cn(buf, pos, end)
+            elif pos + 4 <= end:
+                lo_limit = self._r4.unpack_from(buf, pos)[0]
+        self._collector.add_ptr(
+            test_num, head_num, site_num, test_flg, parm_flg, result,
+            test_txt, lo_limit, hi_limit, units,
+        )
+
+    def _decode_ftr(self, buf, pos: int, end: int) -> None:
+        if end - pos < self._ftr_fixed.size:
+            return self._decode_short(buf, pos, end, "FTR")
+        test_num, head_num, site_num, test_flg = self._ftr_fixed.unpack_from(buf, pos)
+        test_txt = None
+        # 跳过 OPT_FLAG .. VECT_OFF 到 RTN_ICNT
+        pos += 34
+        if pos + 4 <= end:
+            rtn_icnt, pgm_icnt = self._u2_pair.unpack_from(buf, pos)
+            pos += 4
+            pos += rtn_icnt * 2 + (rtn_icnt + 1) // 2  # RTN_INDX, RTN_STAT
+            pos += pgm_icnt * 2 + (pgm_icnt + 1) // 2  # PGM_INDX, PGM_STAT
+            if pos + 2 <= end:
+                bit_count = self._u2.unpack_from(buf, pos)[0]
+                pos += 2 + (bit_count + 7) // 8  # FAIL_PIN
+                for _ in range(3):  # VECT_NAM, TIME_SET, OP_CODE
+                    if pos < end:
+                        pos += 1 + buf[pos]
+                test_txt, pos = self._read_cn(buf, pos, end)
+        self._collector.add_ftr(test_num, head_num, site_num, test_flg, test_txt)
+
+    def _decode_pir(self, buf, pos: int, end: int) -> None:
+        if end - pos < 2:
+            return self._decode_short(buf, pos, end, "PIR")
+        self._collector.add_pir(buf[pos], buf[pos + 1])
+
+    def _decode_prr(self, buf, pos: int, end: int) -> None:
+        if end - pos < self._prr_fixed.size:
+            return self._decode_short(buf, pos, end, "PRR")
+        (head_num, site_num, part_flg, num_test, hard_bin, soft_bin,
+         x_coord, y_coord, test_t) = self._prr_fixed.unpack_from(buf, pos)
+        pos += self._prr_fixed.size
+        part_id, pos = self._read_cn(buf, pos, end)
+        part_txt, pos = self._read_cn(buf, pos, end)
+        self._collector.add_prr(
+            head_num, site_num, part_flg, num_test, hard_bin, soft_bin,
+            x_coord, y_coord, test_t, part_id, part_txt,
+        )
+
+    def _decode_short(self, buf, pos: int, end: int, name: str) -> None:
+        """热点记录被截断到定长部分以内时，走通用字段路径"""
+        fields = _SHORT_FIELDS[name]
+        record = {}
+        for field_name, code in fields:
+            if pos >= end:
+                record[field_name] = None
+                continue
+            record[field_name], pos = self._read_field(buf, pos, end, code)
+        self._collector.add_record(name, record)
+
+
+# 热点记录的前缀字段，仅在记录截断时使用
+_SHORT_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    "PTR": [
+        ("TEST_NUM", "U4"), ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("TEST_FLG", "B1"),
+        ("PARM_FLG", "B1"), ("RESULT", "R4"),
+    ],
+    "FTR": [("TEST_NUM", "U4"), ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("TEST_FLG", "B1")],
+    "PIR": [("HEAD_NUM", "U1"), ("SITE_NUM", "U1")],
+    "PRR": [
+        ("HEAD_NUM", "U1"), ("SITE_NUM", "U1"), ("PART_FLG", "B1"), ("NUM_TEST", "U2"),
+        ("HARD_BIN", "U2"), ("SOFT_BIN", "U2"), ("X_COORD", "I2"), ("Y_COORD", "I2"),
+        ("TEST_T", "U4"),
+    ],
+}
@@ -1,42 +1,110 @@
 """STDF 文件解析服务"""
 
+import copy
+import hashlib
+import logging
+import mmap
 import os
 import threading
-import uuid
 import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 from pystdf.IO import Parser
-from pystdf import V4
 from sqlalchemy.orm import Session
 
 from ..models.stdf_models import (
+    DieDetailResponse,
+    HeaderResponse,
+    LotMapResponse,
+    LotWaferInfo,
+    MergedFileStats,
+    MergedTestResponse,
+    MergedTestResultItem,
     StdfSummaryResponse,
     TestResultsResponse,
+    WaferGridResponse,
     WaferMapResponse,
     TestResultItem,
     TestInfo,
+    TestStats,
+    TestStatsResponse,
     DieResult,
     MirInfo,
     MrrInfo,
     SiteYield,
     HardBinInfo,
 )
+from ..models.db_models import STDFFile
 from .cache_service import CacheService, calculate_file_hash
+from .columnar import encode_columns
+from .memory_cache import MemoryCache
+from .part_ingest import part_ingest
+from .parse_scheduler import ACTIVE_STATUSES, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, ParseScheduler
+from .record_index import RecordIndex, build_index_file, index_path
+from .result_store import MISSING_COORD, PartStore, TestResultStore
+from .test_stats import describe
+from .wafer_grid import EMPTY_BIN, MAX_ZOOM, TILE_SIZE, WaferGrid, stack_grids
+from .stdf_decoder import StdfDecodeError, StdfDecoder, detect_endian, find_part_boundaries
+
+logger = logging.getLogger(__name__)
+
+# 解析引擎：native 为内置解码器，pystdf 为参考实现
+PARSER_ENGINES = ("native", "pystdf")
+
+
+# 摘要以外只需 Wafer Map 时用到的记录类型（PTR/FTR 按 REC_LEN 直接跳过）
+WAFER_MAP_RECORDS = frozenset({"FAR", "MIR", "MRR", "PIR", "PRR", "WIR", "WRR", "WCR", "HBR", "SBR"})
+
+# 只查看表头时需要的记录类型
+HEADER_RECORDS = frozenset({"FAR", "MIR", "MRR"})
+
+
+def _get_parser_engine() -> str:
+    engine = os.getenv("STDF_PARSER_ENGINE", "native").strip().lower()
+    return engine if engine in PARSER_ENGINES else "native"
+
+
+def _use_mmap() -> bool:
+    """原生引擎是否通过 mmap 读取文件（默认开启）"""
+    return os.getenv("STDF_PARSE_MMAP", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _use_tail_parse() -> bool:
+    """文件在末尾增长时是否增量解析（默认开启）"""
+    return os.getenv("STDF_TAIL_PARSE", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+# 单个分段的最小字节数，避免把文件切得过碎
+PARALLEL_MIN_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def _get_parallel_min_bytes() -> int:
+    """文件不小于该大小（MB）时按分段并行解析，0 表示关闭"""
+    try:
+        return int(os.getenv("STDF_PARALLEL_MIN_MB", "256")) * 1024 * 1024
+    except ValueError:
+        return 256 * 1024 * 1024
 
 
 class StdfRecordCollector:
-    """STDF 记录收集器，配合 pystdf 使用"""
+    """STDF 记录收集器，配合原生解码器或 pystdf 使用
 
-    def __init__(self):
+    PTR/FTR/PRR 按列存入 result_store 中的列式表，其余记录保留为字典。
+    record_types 不为 None 时只收集其中列出的记录类型（投影解析）。
+    """
+
+    def __init__(self, record_types: Optional[frozenset] = None):
+        self.record_types = record_types
         self.mir: Optional[Dict] = None
         self.mrr: Optional[Dict] = None
         self.wcr: Optional[Dict] = None
-        self.ptr_list: List[Dict] = []
-        self.ftr_list: List[Dict] = []
-        self.prr_list: List[Dict] = []
-        self.pir_list: List[Dict] = []
+        self.ptr = TestResultStore()
+        self.ftr = TestResultStore()
+        self.parts = PartStore()
+        self.pir_count = 0
+        self.part_count = 0
         self.wrr_list: List[Dict] = []
         self.wir_list: List[Dict] = []
         self.tsr_list: List[Dict] = []
@@ -44,14 +112,17 @@ class StdfRecordCollector:
         self.sbr_list: List[Dict] = []
         self.far: Optional[Dict] = None
         self.failed_tests_by_bin: Dict[int, Dict[str, int]] = {}
-        self._ptr_buffer: Dict[tuple, List[Dict]] = {}
-
-    def _is_fail(self, record: Dict) -> bool:
-        # ... (rest of _is_fail method)
-        test_flag = record.get("TEST_FLG")
-        result = record.get("RESULT")
-        lo_limit = record.get("LO_LIMIT")
-        hi_limit = record.get("HI_LIMIT")
+        # (head, site) -> 当前未结束的 part 序号
+        self._open_parts: Dict[tuple, int] = {}
+        # (head, site) -> 当前 part 中失败测试项的标签，PRR 到达时归入其 Hard Bin
+        self._pending_failures: Dict[tuple, List[str]] = {}
+        self._fail_labels: Dict[tuple, str] = {}
+        # 已完整解码到的文件偏移及其之前内容的摘要（原生引擎，用于增量解析）
+        self.bytes_consumed = 0
+        self.prefix_digest: Optional[str] = None
+
+    @staticmethod
+    def _is_fail(test_flag, result, lo_limit, hi_limit) -> bool:
         # Check TEST_FLG bit 6 (explicit fail flag)
         if test_flag is not None and (test_flag & 0x40) != 0:
             return True
@@ -63,215 +134,910 @@ class StdfRecordCollector:
                 return True
         return False
 
-    def _record_failures_for_bin(self, hbin: int, records: List[Dict]) -> None:
-        if hbin not in self.failed_tests_by_bin:
-            self.failed_tests_by_bin[hbin] = {}
-        for rec in records:
-            if not self._is_fail(rec):
-                continue
-            test_num = rec.get("TEST_NUM", 0)
-            test_name = rec.get("TEST_TXT", "") or rec.get("TEST_NAM", "") or f"Test {test_num}"
-            if not test_name:
-                continue
-            test_label = f"{test_num} - {test_name}"
-            self.failed_tests_by_bin[hbin][test_label] = (
-                self.failed_tests_by_bin[hbin].get(test_label, 0) + 1
-            )
+    def _record_failure(self, key: tuple, test_num, test_txt) -> None:
+        label_key = (test_num, test_txt)
+        label = self._fail_labels.get(label_key)
+        if label is None:
+            test_name = test_txt or f"Test {test_num}"
+            label = f"{test_num} - {test_name}"
+            self._fail_labels[label_key] = label
+        pending = self._pending_failures.get(key)
+        if pending is None:
+            self._pending_failures[key] = [label]
+        else:
+            pending.append(label)
+
+    def _part_for(self, key: tuple) -> int:
+        """返回 (head, site) 当前的 part 序号，没有 PIR 时隐式开始一个"""
+        part = self._open_parts.get(key)
+        if part is None:
+            part = self.part_count
+            self.part_count += 1
+            self._open_parts[key] = part
+        return part
 
     def after_send(self, dataSource, data):
         """pystdf 回调 - 收集记录"""
         record_obj, field_values = data
+        rec_name = type(record_obj).__name__.upper()
+        if self.record_types is not None and rec_name not in self.record_types:
+            return
         record = dict(zip(record_obj.columnNames, field_values))
+        self.add_record(rec_name, record)
 
-        if isinstance(record_obj, V4.Mir):
+    def add_record(self, rec_name: str, record: Dict) -> None:
+        """收集一条已解码为字典的记录（pystdf 路径及原生解码器的非热点记录）"""
+        if rec_name == "PTR":
+            self.add_ptr(
+                record.get("TEST_NUM"),
+                record.get("HEAD_NUM"),
+                record.get("SITE_NUM"),
+                record.get("TEST_FLG"),
+                record.get("PARM_FLG"),
+                record.get("RESULT"),
+                record.get("TEST_TXT"),
+                record.get("LO_LIMIT"),
+                record.get("HI_LIMIT"),
+                record.get("UNITS"),
+            )
+        elif rec_name == "FTR":
+            self.add_ftr(
+                record.get("TEST_NUM"),
+                record.get("HEAD_NUM"),
+                record.get("SITE_NUM"),
+                record.get("TEST_FLG"),
+                record.get("TEST_TXT"),
+            )
+        elif rec_name == "PRR":
+            self.add_prr(
+                record.get("HEAD_NUM"),
+                record.get("SITE_NUM"),
+                record.get("PART_FLG"),
+                record.get("NUM_TEST"),
+                record.get("HARD_BIN"),
+                record.get("SOFT_BIN"),
+                record.get("X_COORD"),
+                record.get("Y_COORD"),
+                record.get("TEST_T"),
+                record.get("PART_ID"),
+                record.get("PART_TXT"),
+            )
+        elif rec_name == "PIR":
+            self.add_pir(record.get("HEAD_NUM"), record.get("SITE_NUM"))
+        elif rec_name == "MIR":
             self.mir = record
-        elif isinstance(record_obj, V4.Mrr):
+        elif rec_name == "MRR":
             self.mrr = record
-        elif isinstance(record_obj, V4.Wcr):
+        elif rec_name == "WCR":
             self.wcr = record
-        elif isinstance(record_obj, V4.Ptr):
-            self.ptr_list.append(record)
-            head = record.get("HEAD_NUM", 255)
-            site = record.get("SITE_NUM", 0)
-            key = (head, site)
-            if key not in self._ptr_buffer:
-                self._ptr_buffer[key] = []
-            self._ptr_buffer[key].append(record)
-        elif isinstance(record_obj, V4.Ftr):
-            self.ftr_list.append(record)
-            head = record.get("HEAD_NUM", 255)
-            site = record.get("SITE_NUM", 0)
-            key = (head, site)
-            if key not in self._ptr_buffer:
-                self._ptr_buffer[key] = []
-            self._ptr_buffer[key].append(record)
-        elif isinstance(record_obj, V4.Prr):
-            self.prr_list.append(record)
-            head = record.get("HEAD_NUM", 255)
-            site = record.get("SITE_NUM", 0)
-            hbin = record.get("HARD_BIN", 0)
-            key = (head, site)
-            buffered = self._ptr_buffer.pop(key, [])
-            if buffered:
-                self._record_failures_for_bin(hbin, buffered)
-        elif isinstance(record_obj, V4.Pir):
-            self.pir_list.append(record)
-        elif isinstance(record_obj, V4.Wrr):
+        elif rec_name == "FAR":
+            self.far = record
+        elif rec_name == "WRR":
             self.wrr_list.append(record)
-        elif isinstance(record_obj, V4.Wir):
+        elif rec_name == "WIR":
             self.wir_list.append(record)
-        elif isinstance(record_obj, V4.Tsr):
+        elif rec_name == "TSR":
             self.tsr_list.append(record)
-        elif isinstance(record_obj, V4.Hbr):
+        elif rec_name == "HBR":
             self.hbr_list.append(record)
-        elif isinstance(record_obj, V4.Sbr):
+        elif rec_name == "SBR":
             self.sbr_list.append(record)
-        elif isinstance(record_obj, V4.Far):
-            self.far = record
+
+    def add_ptr(
+        self,
+        test_num,
+        head_num,
+        site_num,
+        test_flg,
+        parm_flg,
+        result,
+        test_txt,
+        lo_limit,
+        hi_limit,
+        units,
+    ) -> None:
+        """收集一条 PTR"""
+        test_num = test_num or 0
+        head_num = head_num or 0
+        site_num = site_num or 0
+        key = (head_num, site_num)
+        self.ptr.append(
+            test_num,
+            head_num,
+            site_num,
+            test_flg or 0,
+            parm_flg or 0,
+            0.0 if result is None else result,
+            self._part_for(key),
+            self.ptr.meta.get_id(test_num, test_txt, units, lo_limit, hi_limit),
+        )
+        if self._is_fail(test_flg, result, lo_limit, hi_limit):
+            self._record_failure(key, test_num, test_txt)
+
+    def add_ftr(self, test_num, head_num, site_num, test_flg, test_txt) -> None:
+        """收集一条 FTR"""
+        test_num = test_num or 0
+        head_num = head_num or 0
+        site_num = site_num or 0
+        key = (head_num, site_num)
+        self.ftr.append(
+            test_num,
+            head_num,
+            site_num,
+            test_flg or 0,
+            0,
+            0.0,
+            self._part_for(key),
+            self.ftr.meta.get_id(test_num, test_txt, None, None, None),
+        )
+        if self._is_fail(test_flg, None, None, None):
+            self._record_failure(key, test_num, test_txt)
+
+    def add_pir(self, head_num, site_num) -> None:
+        """收集一条 PIR，开始一个新的 part"""
+        self.pir_count += 1
+        self._open_parts[(head_num or 0, site_num or 0)] = self.part_count
+        self.part_count += 1
+
+    def add_prr(
+        self,
+        head_num,
+        site_num,
+        part_flg,
+        num_test,
+        hard_bin,
+        soft_bin,
+        x_coord,
+        y_coord,
+        test_t,
+        part_id,
+        part_txt,
+    ) -> None:
+        """收集一条 PRR，并把该 part 中失败的测试项归入其 Hard Bin"""
+        head_num = head_num or 0
+        site_num = site_num or 0
+        hard_bin = hard_bin or 0
+        key = (head_num, site_num)
+        part = self._part_for(key)
+        del self._open_parts[key]
+        self.parts.append(
+            head_num,
+            site_num,
+            part_flg or 0,
+            num_test or 0,
+            hard_bin,
+            soft_bin or 0,
+            MISSING_COORD if x_coord is None else x_coord,
+            MISSING_COORD if y_coord is None else y_coord,
+            test_t or 0,
+            part,
+            part_id or "",
+        )
+        failures = self._pending_failures.pop(key, None)
+        if failures:
+            bin_failures = self.failed_tests_by_bin.setdefault(hard_bin, {})
+            for label in failures:
+                bin_failures[label] = bin_failures.get(label, 0) + 1
+
+    def covers(self, record_types: Optional[frozenset]) -> bool:
+        """是否已收集 record_types 所需的全部记录"""
+        if self.record_types is None:
+            return True
+        return record_types is not None and record_types <= self.record_types
+
+    def finalize(self, build_index: bool = True) -> None:
+        """解析结束：把列式表冻结为 NumPy 数组，并建立 PTR 的 (test_num, site_num) 行号索引"""
+        self.ptr.freeze()
+        if build_index:
+            self.ptr.build_row_index()
+        self.ftr.freeze()
+        self.parts.freeze()
+
+    def nbytes(self) -> int:
+        """估算占用的内存字节数（列式表按实际大小，字典记录按每条约 1 KB 估算）"""
+        record_count = (
+            len(self.wrr_list) + len(self.wir_list) + len(self.tsr_list)
+            + len(self.hbr_list) + len(self.sbr_list) + 4
+        )
+        label_count = sum(len(tests) for tests in self.failed_tests_by_bin.values())
+        return (
+            self.ptr.nbytes() + self.ftr.nbytes() + self.parts.nbytes()
+            + record_count * 1024 + (label_count + len(self._fail_labels)) * 200
+        )
+
+    def copy(self) -> "StdfRecordCollector":
+        """返回可继续追加记录的副本，原收集器不受影响（用于增量解析）"""
+        clone = copy.copy(self)
+        clone.ptr = self.ptr.copy()
+        clone.ftr = self.ftr.copy()
+        clone.parts = self.parts.copy()
+        clone.wrr_list = list(self.wrr_list)
+        clone.wir_list = list(self.wir_list)
+        clone.tsr_list = list(self.tsr_list)
+        clone.hbr_list = list(self.hbr_list)
+        clone.sbr_list = list(self.sbr_list)
+        clone.failed_tests_by_bin = {
+            hard_bin: dict(tests) for hard_bin, tests in self.failed_tests_by_bin.items()
+        }
+        clone._open_parts = dict(self._open_parts)
+        clone._pending_failures = {
+            key: list(labels) for key, labels in self._pending_failures.items()
+        }
+        clone._fail_labels = dict(self._fail_labels)
+        return clone
+
+    @classmethod
+    def merge(cls, chunks: List["StdfRecordCollector"]) -> "StdfRecordCollector":
+        """按文件顺序合并各分段的收集器，结果与串行解析一致
+
+        分段边界处没有未结束的 part，因此只需平移 part 序号；
+        单例记录按串行解析的覆盖语义取最后一个，失败计数逐项累加。
+        """
+        merged = cls()
+        part_offsets = []
+        for chunk in chunks:
+            part_offsets.append(merged.part_count)
+            merged.part_count += chunk.part_count
+            merged.pir_count += chunk.pir_count
+
+        merged.ptr = TestResultStore.concat([c.ptr for c in chunks], part_offsets)
+        merged.ftr = TestResultStore.concat([c.ftr for c in chunks], part_offsets)
+        merged.parts = PartStore.concat([c.parts for c in chunks], part_offsets)
+
+        for chunk in chunks:
+            for name in ("mir", "mrr", "wcr", "far"):
+                value = getattr(chunk, name)
+                if value is not None:
+                    setattr(merged, name, value)
+            merged.wrr_list.extend(chunk.wrr_list)
+            merged.wir_list.extend(chunk.wir_list)
+            merged.tsr_list.extend(chunk.tsr_list)
+            merged.hbr_list.extend(chunk.hbr_list)
+            merged.sbr_list.extend(chunk.sbr_list)
+            for hard_bin, tests in chunk.failed_tests_by_bin.items():
+                bin_failures = merged.failed_tests_by_bin.setdefault(hard_bin, {})
+                for label, count in tests.items():
+                    bin_failures[label] = bin_failures.get(label, 0) + count
+            merged._fail_labels.update(chunk._fail_labels)
+
+        if chunks:
+            # 只有最后一段可能以未结束的 part 收尾
+            last, offset = chunks[-1], part_offsets[-1]
+            merged._open_parts = {key: part + offset for key, part in last._open_parts.items()}
+            merged._pending_failures = {
+                key: list(labels) for key, labels in last._pending_failures.items()
+            }
+        return merged
+
+
+def parse_stdf_file(
+    file_path: str, on_progress=None, record_types: Optional[frozenset] = None
+) -> StdfRecordCollector:
+    """解析 STDF 文件并返回收集器，record_types 为需要的记录类型（None 表示全部）
+
+    模块级函数，可直接交给解析工作进程执行。
+    """
+    collector = None
+    if _get_parser_engine() == "native":
+        try:
+            collector = _parse_file_native(file_path, on_progress, record_types)
+        except StdfDecodeError as exc:
+            logger.warning("原生解码失败，回退到 pystdf: %s (%s)", file_path, exc)
+    if collector is None:
+        collector = _parse_file_pystdf(file_path, on_progress, record_types)
+    else:
+        collector.prefix_digest = _prefix_digest(file_path, collector.bytes_consumed)
+    collector.finalize()
+    return collector
+
+
+# 前缀摘要覆盖的字节数：文件开头和已解码末尾各取一段
+_DIGEST_SPAN = 64 * 1024
+
+
+def _prefix_digest(file_path: str, end: int) -> str:
+    """文件 [0, end) 的快速摘要，用于判断文件只是在末尾追加了数据"""
+    digest = hashlib.sha256(str(end).encode())
+    with open(file_path, "rb") as f:
+        digest.update(f.read(min(end, _DIGEST_SPAN)))
+        tail_start = max(end - _DIGEST_SPAN, _DIGEST_SPAN)
+        if tail_start < end:
+            f.seek(tail_start)
+            digest.update(f.read(end - tail_start))
+    return digest.hexdigest()
+
+
+def parse_stdf_tail(file_path: str, collector: StdfRecordCollector) -> Optional[StdfRecordCollector]:
+    """文件仍在写入时只解码新追加的字节，返回更新后的收集器副本
+
+    收集器不是原生引擎的结果、文件变短或已解码部分的内容发生变化时返回 None。
+    """
+    start = collector.bytes_consumed
+    if (
+        start <= 0
+        or collector.prefix_digest is None
+        or os.path.getsize(file_path) < start
+        or _prefix_digest(file_path, start) != collector.prefix_digest
+    ):
+        return None
+
+    updated = collector.copy()
+    with open(file_path, "rb") as raw_file:
+        endian = detect_endian(raw_file.read(6))
+        raw_file.seek(start)
+        decoder = StdfDecoder(updated, endian, updated.record_types)
+        updated.bytes_consumed = start + decoder.decode_file(raw_file)
+    updated.prefix_digest = _prefix_digest(file_path, updated.bytes_consumed)
+    updated.finalize()
+    return updated
+
+
+def _parse_file_native(
+    file_path: str, on_progress=None, record_types: Optional[frozenset] = None
+) -> StdfRecordCollector:
+    """使用内置解码器解析"""
+    collector = StdfRecordCollector(record_types)
+    total_bytes = os.path.getsize(file_path)
+    with open(file_path, "rb") as raw_file:
+        endian = detect_endian(raw_file.read(6))
+        raw_file.seek(0)
+        decoder = StdfDecoder(collector, endian, record_types)
+        if _use_mmap():
+            collector.bytes_consumed = decoder.decode_mapped(raw_file, on_progress)
+        else:
+            collector.bytes_consumed = decoder.decode_file(raw_file, on_progress, total_bytes)
+    return collector
+
+
+def scan_split_points(file_path: str, min_chunk_bytes: int) -> List[int]:
+    """扫描记录头，返回分段并行解析的切分偏移 [0, p1, ..., end]"""
+    with open(file_path, "rb") as raw_file:
+        endian = detect_endian(raw_file.read(6))
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            return find_part_boundaries(mapped, endian, min_chunk_bytes)
+
+
+def parse_stdf_range(file_path: str, start: int, end: int) -> StdfRecordCollector:
+    """用原生解码器解析文件中 [start, end) 范围内的完整记录
+
+    模块级函数，由解析工作进程执行；返回的收集器已冻结。
+    """
+    collector = StdfRecordCollector()
+    with open(file_path, "rb") as raw_file:
+        endian = detect_endian(raw_file.read(6))
+        decoder = StdfDecoder(collector, endian)
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                decoder.decode_buffer(view, start, end)
+            finally:
+                view.release()
+    # 行号索引在合并后统一建立
+    collector.finalize(build_index=False)
+    return collector
+
+
+def _parse_file_pystdf(
+    file_path: str, on_progress=None, record_types: Optional[frozenset] = None
+) -> StdfRecordCollector:
+    """使用 pystdf 解析"""
+
+    class ProgressFile:
+        def __init__(self, file_obj, total_bytes, on_progress_cb):
+            self._file = file_obj
+            self._total = total_bytes
+            self._read = 0
+            self._last_percent = -1
+            self._on_progress = on_progress_cb
+
+        def read(self, size=-1):
+            data = self._file.read(size)
+            if data:
+                self._read += len(data)
+                if self._total > 0 and self._on_progress:
+                    percent = int(self._read * 100 / self._total)
+                    percent = min(max(percent, 0), 99)
+                    # pystdf 每条记录读取多次，只在百分比变化时回调
+                    if percent != self._last_percent:
+                        self._last_percent = percent
+                        self._on_progress(percent)
+            return data
+
+        def close(self):
+            return self._file.close()
+
+        def __getattr__(self, name):
+            return getattr(self._file, name)
+
+    collector = StdfRecordCollector(record_types)
+    total_bytes = os.path.getsize(file_path)
+    with open(file_path, "rb") as raw_file:
+        file_obj = ProgressFile(raw_file, total_bytes, on_progress) if on_progress else raw_file
+        parser = Parser(inp=file_obj)
+        parser.addSink(collector)
+        parser.parse()
+    return collector
+
+
+def _safe_str(value) -> str:
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _format_stdf_time(value) -> str:
+    """将 STDF 时间字段格式化为可读时间。
+    STDF 中常见为 Unix 秒级时间戳；若不是时间戳则原样返回字符串。
+    """
+    if value is None:
+        return ""
+    try:
+        if isinstance(value, (int, float)):
+            ts = int(value)
+        elif isinstance(value, str):
+            raw = value.strip()
+            if not raw:
+                return ""
+            if raw.isdigit() or (raw.startswith("-") and raw[1:].isdigit()):
+                ts = int(raw)
+            else:
+                return raw
+        else:
+            return str(value)
+
+        if ts <= 0:
+            return str(value)
+
+        dt_local = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone()
+        return dt_local.strftime("%Y-%m-%d %H:%M:%S %Z")
+    except Exception:
+        return str(value)
+
+
+def _stdf_timestamp(value) -> Optional[int]:
+    """STDF 时间字段的 Unix 秒，不是有效时间戳时返回 None"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, (int, float)) and value > 0:
+        return int(value)
+    return None
+
+
+def _build_mir_info(mir: Optional[Dict]) -> Optional[MirInfo]:
+    if not mir:
+        return None
+    return MirInfo(
+        setup_time=_format_stdf_time(mir.get("SETUP_T")),
+        start_time=_format_stdf_time(mir.get("START_T")),
+        start_timestamp=_stdf_timestamp(mir.get("START_T")),
+        station_number=mir.get("STAT_NUM") or 0,
+        mode_code=_safe_str(mir.get("MODE_COD")),
+        lot_id=_safe_str(mir.get("LOT_ID")),
+        part_type=_safe_str(mir.get("PART_TYP")),
+        node_name=_safe_str(mir.get("NODE_NAM")),
+        tester_type=_safe_str(mir.get("TSTR_TYP")),
+        job_name=_safe_str(mir.get("JOB_NAM")),
+        exec_type=_safe_str(mir.get("EXEC_TYP")),
+        exec_ver=_safe_str(mir.get("EXEC_VER")),
+        facility_id=_safe_str(mir.get("FACIL_ID")),
+        floor_id=_safe_str(mir.get("FLOOR_ID")),
+        process_id=_safe_str(mir.get("PROC_ID")),
+    )
+
+
+def _build_mrr_info(mrr: Optional[Dict]) -> Optional[MrrInfo]:
+    if not mrr:
+        return None
+    return MrrInfo(
+        finish_time=_format_stdf_time(mrr.get("FINISH_T")),
+        disposition_code=_safe_str(mrr.get("DISP_COD")),
+        user_description=_safe_str(mrr.get("USR_DESC")),
+        exec_description=_safe_str(mrr.get("EXC_DESC")),
+    )
 
 
 class StdfParserService:
     """STDF 解析服务"""
 
-    def __init__(self, db: Optional[Session] = None):
-        self._cache: Dict[str, Dict] = {}
-        self._jobs: Dict[str, Dict] = {}
-        self._job_by_file: Dict[str, str] = {}
+    def __init__(self, db: Optional[Session] = None, scheduler: Optional[ParseScheduler] = None):
+        self._scheduler = scheduler or ParseScheduler()
+        # 解析结果与记录索引共用一个按字节预算淘汰的缓存，仍在解析的文件不会被淘汰
+        self._cache = MemoryCache(pinned_keys=self._scheduler.active_keys)
         self._lock = threading.Lock()
         self._db = db  # 数据库会话（可选）
+        # 文件路径 -> (完整解析任务 ID, 提交时的文件签名)，耗时尚未写入数据库
+        self._unrecorded_parses: Dict[str, Tuple[str, str]] = {}
 
     def set_db(self, db: Session):
         """设置数据库会话"""
         self._db = db
 
+    def cache_stats(self) -> Dict[str, int]:
+        """内存缓存统计（条目数、估算字节数、命中/未命中/淘汰次数）"""
+        return self._cache.stats()
+
     def _get_signature(self, file_path: str) -> str:
         stat = os.stat(file_path)
         return f"{stat.st_size}:{stat.st_mtime}"
 
-    def _get_cached_collector(self, file_path: str) -> Optional[StdfRecordCollector]:
-        """从内存缓存获取 collector"""
+    def _get_cached_collector(
+        self,
+        file_path: str,
+        record_types: Optional[frozenset] = None,
+        record_stats: bool = True,
+    ) -> Optional[StdfRecordCollector]:
+        """从内存缓存获取 collector，record_types 为所需记录类型（None 表示全部）
+
+        文件在末尾增长时（仍在写入的测试文件）只增量解析新增的字节。
+        record_stats 为 False 时不计入命中统计（调用方之后还会再次查询）。
+        """
+        collector = self._lookup_collector(file_path, record_types)
+        if record_stats:
+            if collector is None:
+                self._cache.record_miss()
+            else:
+                self._cache.record_hit()
+        return collector
+
+    def _lookup_collector(
+        self, file_path: str, record_types: Optional[frozenset]
+    ) -> Optional[StdfRecordCollector]:
         signature = self._get_signature(file_path)
-        with self._lock:
-            cached = self._cache.get(file_path)
-            if cached and cached.get("signature") == signature:
-                return cached.get("collector")
+        cached = self._cache.get(file_path)
+        if not cached or not cached["collector"].covers(record_types):
+            return None
+        if cached["signature"] == signature:
+            return cached["collector"]
+        if _use_tail_parse():
+            return self._parse_tail(file_path, cached["signature"], record_types)
         return None
 
-    def _set_cache(self, file_path: str, collector: StdfRecordCollector) -> None:
-        """设置内存缓存"""
+    def _parse_tail(
+        self, file_path: str, stale_signature: str, record_types: Optional[frozenset]
+    ) -> Optional[StdfRecordCollector]:
+        """通过调度器增量解析追加的数据（同一文件的并发请求共享一个任务），无法增量解析时返回 None"""
+        job = self._scheduler.submit(
+            f"tail:{file_path}",
+            self._run_tail_parse,
+            args=(file_path,),
+            priority=PRIORITY_INTERACTIVE,
+            info={"file_path": file_path, "filename": os.path.basename(file_path)},
+            local=True,
+        )
+        job = self._scheduler.wait(job["job_id"])
+        if job is None or job["status"] != "done":
+            return None
+        # 缓存仍是旧签名说明无法增量解析；任务开始后文件又有追加时，
+        # 返回任务开始时的结果，下次访问再增量解析
+        cached = self._cache.get(file_path)
+        if not cached or cached["signature"] == stale_signature:
+            return None
+        if not cached["collector"].covers(record_types):
+            return None
+        return cached["collector"]
+
+    def _run_tail_parse(self, file_path: str, on_progress=None) -> None:
+        """增量解析并替换缓存
+
+        是否只是末尾追加由 _prefix_digest 抽样判断（只覆盖首尾各 64 KB），足以复用内存中的结果，
+        但不能据此推出整个文件的 SHA-256；数据库缓存使用的哈希仍由 calculate_file_hash 按新内容计算。
+        """
         signature = self._get_signature(file_path)
+        cached = self._cache.get(file_path)
+        if not cached or cached["signature"] == signature:
+            return
+        previous = cached["collector"]
+        try:
+            collector = parse_stdf_tail(file_path, previous)
+        except (OSError, StdfDecodeError) as exc:
+            logger.warning("增量解析失败，将重新完整解析: %s (%s)", file_path, exc)
+            return
+        if collector is None:
+            return
         with self._lock:
-            self._cache[file_path] = {
-                "signature": signature,
-                "collector": collector,
-            }
+            if self._cache.get(file_path) is cached:
+                self._cache.put(
+                    file_path,
+                    {"signature": signature, "collector": collector},
+                    collector.nbytes(),
+                )
 
-    def _parse_file(self, file_path: str, on_progress=None) -> StdfRecordCollector:
-        """解析 STDF 文件并返回收集器"""
+    def _set_cache(
+        self, file_path: str, collector: StdfRecordCollector, signature: Optional[str] = None
+    ) -> None:
+        """设置内存缓存（不会用投影解析的结果覆盖更完整的结果）
 
-        class ProgressFile:
-            def __init__(self, file_obj, total_bytes, on_progress_cb):
-                self._file = file_obj
-                self._total = total_bytes
-                self._read = 0
-                self._on_progress = on_progress_cb
-
-            def read(self, size=-1):
-                data = self._file.read(size)
-                if data:
-                    self._read += len(data)
-                    if self._total > 0 and self._on_progress:
-                        percent = int(self._read * 100 / self._total)
-                        percent = min(max(percent, 0), 99)
-                        self._on_progress(percent)
-                return data
+        signature 应在解析开始前取得：文件在解析期间增长时，
+        较旧的签名保证下次访问会增量解析新增部分。
+        """
+        signature = signature or self._get_signature(file_path)
+        with self._lock:
+            cached = self._cache.get(file_path)
+            if (
+                cached
+                and cached.get("signature") == signature
+                and not collector.covers(cached["collector"].record_types)
+            ):
+                return
+            self._cache.put(
+                file_path,
+                {"signature": signature, "collector": collector},
+                collector.nbytes(),
+            )
 
-            def close(self):
-                return self._file.close()
+    def _on_parsed(
+        self, file_path: str, collector: StdfRecordCollector, signature: Optional[str] = None
+    ) -> None:
+        """解析完成：写入内存缓存，完整解析后在后台建立记录偏移索引"""
+        self._set_cache(file_path, collector, signature)
+        if collector.record_types is None:
+            self._schedule_index(file_path)
 
-            def __getattr__(self, name):
-                return getattr(self._file, name)
+    def _schedule_index(self, file_path: str) -> None:
+        """提交低优先级的建索引任务（索引已存在时任务直接返回）"""
+        signature = self._get_signature(file_path)
+        cached = self._cache.get(f"index:{file_path}")
+        if cached and cached["signature"] == signature:
+            return
+        self._scheduler.submit(
+            f"index:{file_path}",
+            build_index_file,
+            args=(file_path,),
+            priority=PRIORITY_BACKGROUND,
+            info={"file_path": file_path, "filename": os.path.basename(file_path)},
+        )
 
-        collector = StdfRecordCollector()
-        total_bytes = os.path.getsize(file_path)
-        with open(file_path, "rb") as raw_file:
-            file_obj = ProgressFile(raw_file, total_bytes, on_progress) if on_progress else raw_file
-            parser = Parser(inp=file_obj)
-            parser.addSink(collector)
-            parser.parse()
+    def _get_record_index(self, file_path: str) -> Optional[RecordIndex]:
+        """获取文件的记录偏移索引，尚未建立时返回 None"""
+        signature = self._get_signature(file_path)
+        cache_key = f"index:{file_path}"
+        cached = self._cache.get(cache_key)
+        if cached and cached["signature"] == signature:
+            return cached["index"]
+        index = RecordIndex.load(index_path(file_path, calculate_file_hash(file_path)))
+        if index is not None:
+            self._cache.put(cache_key, {"signature": signature, "index": index}, index.nbytes())
+        return index
+
+    def _load_collector(
+        self,
+        file_path: str,
+        db: Optional[Session] = None,
+        record_types: Optional[frozenset] = None,
+        record_stats: bool = True,
+    ) -> StdfRecordCollector:
+        """从内存缓存获取 collector，未命中时等待该文件的解析任务并记录到数据库
+
+        同一文件的并发请求（包括后台预解析）共享同一个进行中的解析任务。
+        """
+        collector = self._get_cached_collector(file_path, record_types, record_stats)
+        if collector:
+            # 上传或后台预解析的结果：由第一个带数据库会话的请求补记解析耗时
+            if db and file_path in self._unrecorded_parses:
+                parse_time = self.take_parse_time(file_path)
+                if parse_time is not None:
+                    self.register_file(file_path, db, parse_time)
+            return collector
+
+        self._await_parse(file_path, record_types)
+        collector = self._get_cached_collector(file_path, record_types, record_stats=False)
+        if collector is None:
+            # 结果已被淘汰（超出内存预算）或文件在解析后又发生变化，在当前线程重新解析
+            signature = self._get_signature(file_path)
+            collector = self._parse_file(file_path, record_types=record_types)
+            self._on_parsed(file_path, collector, signature)
+
+        # 保存文件记录到数据库（只记录完整解析的耗时）
+        if db:
+            self.register_file(file_path, db, self.take_parse_time(file_path))
         return collector
 
-    def _run_parse_job(self, job_id: str) -> None:
+    def register_file(
+        self, file_path: str, db: Session, parse_time: Optional[float] = None
+    ) -> STDFFile:
+        """保存文件记录，parse_time 为 None 时不覆盖已有的解析耗时"""
+        return CacheService.save_file_record(
+            db, calculate_file_hash(file_path), os.path.basename(file_path),
+            os.path.getsize(file_path), parse_time,
+        )
+
+    def take_parse_time(self, file_path: str) -> Optional[float]:
+        """取出该文件最近一次完整解析任务的耗时（finished_at - started_at），每个任务只返回一次
+
+        任务仍在运行时保留待下次读取；任务已过期、失败或文件内容已变化时丢弃。
+        """
         with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
-            file_path = job["file_path"]
-            job["status"] = "running"
-            job["percent"] = 0
+            pending = self._unrecorded_parses.get(file_path)
+            if pending is None:
+                return None
+            job_id, signature = pending
+            job = self._scheduler.get(job_id)
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                return None
+            del self._unrecorded_parses[file_path]
+        if (
+            job is None
+            or job["status"] != "done"
+            or not job.get("started_at")
+            or self._get_signature(file_path) != signature
+        ):
+            return None
+        return job["finished_at"] - job["started_at"]
+
+    def _await_parse(self, file_path: str, record_types: Optional[frozenset]) -> Optional[Dict]:
+        """加入或提交解析任务并等待完成，返回结束时的任务状态
 
-        def update_progress(value: int) -> None:
-            with self._lock:
-                current = self._jobs.get(job_id)
-                if not current:
-                    return
-                current["percent"] = max(current.get("percent", 0), value)
+        进行中的完整解析可满足任意投影请求；否则按所需记录类型提交任务，
+        同一 key 的任务由调度器合并。缓存已满足要求时返回 None。
+        """
+        job = self._scheduler.find_active(file_path)
+        if job is None:
+            if self._get_cached_collector(file_path, record_types, record_stats=False):
+                return None
+            job = self._submit_parse(file_path, PRIORITY_INTERACTIVE, record_types)
+        job = self._scheduler.wait(job["job_id"]) or job
+        if job["status"] != "done":
+            raise RuntimeError(job.get("error") or f"解析任务{job['status']}")
+        return job
+
+    def _parse_file(
+        self, file_path: str, on_progress=None, record_types: Optional[frozenset] = None
+    ) -> StdfRecordCollector:
+        """解析 STDF 文件并返回收集器"""
+        return parse_stdf_file(file_path, on_progress, record_types)
 
+    def _use_parallel(self, file_path: str) -> bool:
+        """大文件在多进程工作池下按分段并行解析（仅原生引擎）"""
+        min_bytes = _get_parallel_min_bytes()
+        return (
+            min_bytes > 0
+            and _get_parser_engine() == "native"
+            and self._scheduler.use_processes
+            and self._scheduler.max_workers > 1
+            and os.path.getsize(file_path) >= min_bytes
+        )
+
+    def _parse_parallel(self, file_path: str, on_progress=None) -> StdfRecordCollector:
+        """分段并行解析：工作进程先扫描切分点，再各自解码一段，最后按顺序合并
+
+        在调度线程中执行，子任务通过 run_in_workers 分发到工作池。
+        """
+        report = on_progress or (lambda percent, stage=None: None)
+        total_bytes = os.path.getsize(file_path)
+        min_chunk = max(total_bytes // (self._scheduler.max_workers * 4), PARALLEL_MIN_CHUNK_BYTES)
         try:
-            collector = self._parse_file(file_path, on_progress=update_progress)
-            self._set_cache(file_path, collector)
-            with self._lock:
-                current = self._jobs.get(job_id)
-                if current:
-                    current["status"] = "done"
-                    current["percent"] = 100
-        except Exception as exc:
-            with self._lock:
-                current = self._jobs.get(job_id)
-                if current:
-                    current["status"] = "error"
-                    current["error"] = str(exc)
-
-    def start_parse(self, file_path: str) -> Dict:
-        cached = self._get_cached_collector(file_path)
-        if cached:
-            job_id = str(uuid.uuid4())
-            with self._lock:
-                self._jobs[job_id] = {
-                    "job_id": job_id,
-                    "file_path": file_path,
-                    "filename": os.path.basename(file_path),
-                    "status": "done",
-                    "percent": 100,
-                    "error": None,
-                }
-            return self._jobs[job_id]
+            points = self._scheduler.run_in_workers(
+                scan_split_points, [(file_path, min_chunk)], lambda done: report(0, "scanning")
+            )[0]
+            report(10, "decoding")
 
-        with self._lock:
-            existing_job_id = self._job_by_file.get(file_path)
-            if existing_job_id:
-                existing_job = self._jobs.get(existing_job_id)
-                if existing_job and existing_job.get("status") in {"running", "pending"}:
-                    return existing_job
-
-            job_id = str(uuid.uuid4())
-            self._jobs[job_id] = {
-                "job_id": job_id,
+            ranges = [(file_path, start, end) for start, end in zip(points[:-1], points[1:])]
+            chunks = self._scheduler.run_in_workers(
+                parse_stdf_range,
+                ranges,
+                lambda done: report(10 + done * 85 // max(len(ranges), 1), "decoding"),
+            )
+        except StdfDecodeError as exc:
+            # 串行解析同样交给工作池，避免在 API 进程中解码整个文件
+            logger.warning("分段解码失败，回退到串行解析: %s (%s)", file_path, exc)
+            return self._scheduler.run_in_workers(
+                parse_stdf_file, [(file_path,)], lambda done: report(10, "decoding")
+            )[0]
+
+        report(95, "merging")
+        collector = StdfRecordCollector.merge(chunks)
+        collector.bytes_consumed = points[-1]
+        collector.prefix_digest = _prefix_digest(file_path, collector.bytes_consumed)
+        collector.finalize()
+        return collector
+
+    def start_parse(self, file_path: str, priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """提交后台解析任务，完成后结果写入内存缓存"""
+        if self._get_cached_collector(file_path):
+            info = {
                 "file_path": file_path,
                 "filename": os.path.basename(file_path),
-                "status": "pending",
-                "percent": 0,
-                "error": None,
+                "total_bytes": os.path.getsize(file_path),
             }
-            self._job_by_file[file_path] = job_id
+            return self._scheduler.add_finished(file_path, info)
+        return self._submit_parse(file_path, priority)
 
-        thread = threading.Thread(target=self._run_parse_job, args=(job_id,), daemon=True)
-        thread.start()
-        return self._jobs[job_id]
+    def _submit_parse(
+        self, file_path: str, priority: int, record_types: Optional[frozenset] = None
+    ) -> Dict:
+        """提交解析任务；完整解析以文件路径为 key，投影解析另加记录类型"""
+        info = {
+            "file_path": file_path,
+            "filename": os.path.basename(file_path),
+            "record_types": sorted(record_types) if record_types is not None else None,
+            "total_bytes": os.path.getsize(file_path),
+        }
+        signature = self._get_signature(file_path)
 
-    def get_progress(self, job_id: str) -> Optional[Dict]:
+        def on_done(collector: StdfRecordCollector) -> None:
+            self._on_parsed(file_path, collector, signature)
+
+        if record_types is not None:
+            return self._scheduler.submit(
+                f"{file_path}|{','.join(info['record_types'])}",
+                parse_stdf_file,
+                args=(file_path,),
+                kwargs={"record_types": record_types},
+                priority=priority,
+                on_done=on_done,
+                info=info,
+            )
+        if self._use_parallel(file_path):
+            job = self._scheduler.submit(
+                file_path,
+                self._parse_parallel,
+                args=(file_path,),
+                priority=priority,
+                on_done=on_done,
+                info=info,
+                local=True,
+            )
+        else:
+            job = self._scheduler.submit(
+                file_path,
+                parse_stdf_file,
+                args=(file_path,),
+                priority=priority,
+                on_done=on_done,
+                info=info,
+            )
+        # 完整解析的耗时由之后持有数据库会话的调用方写入文件记录
         with self._lock:
-            return self._jobs.get(job_id)
+            self._unrecorded_parses[file_path] = (job["job_id"], signature)
+        return job
+
+    def cancel_parse(self, job_id: str) -> Optional[Dict]:
+        """取消解析任务"""
+        return self._scheduler.cancel(job_id)
+
+    def get_progress(self, job_id: str) -> Optional[Dict]:
+        return self._scheduler.get(job_id)
+
+    def get_progress_detail(self, job_id: str) -> Optional[Dict]:
+        """任务进度及阶段、已处理字节数、速率和预计剩余时间（按百分比和文件大小估算）"""
+        job = self._scheduler.get(job_id)
+        if not job:
+            return None
+        total_bytes = job.get("total_bytes") or 0
+        bytes_done = total_bytes * job["percent"] // 100
+        started_at = job.get("started_at")
+        elapsed = ((job.get("finished_at") or time.time()) - started_at) if started_at else 0.0
+
+        bytes_per_sec = bytes_done / elapsed if elapsed > 0 else None
+        eta_seconds = None
+        if job["status"] == "running" and bytes_per_sec:
+            eta_seconds = round((total_bytes - bytes_done) / bytes_per_sec, 1)
+        elif job["status"] == "done":
+            eta_seconds = 0.0
+
+        stage = job.get("stage")
+        if job["status"] == "pending":
+            stage = "queued"
+        elif job["status"] == "running":
+            stage = stage or "parsing"
+        else:
+            stage = job["status"]
+
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "stage": stage,
+            "percent": job["percent"],
+            "filename": job["filename"],
+            "error": job.get("error"),
+            "total_bytes": total_bytes,
+            "bytes_done": bytes_done,
+            "elapsed_seconds": round(elapsed, 2),
+            "bytes_per_sec": round(bytes_per_sec) if bytes_per_sec is not None else None,
+            "eta_seconds": eta_seconds,
+        }
 
     def get_summary(self, file_path: str, db: Optional[Session] = None) -> StdfSummaryResponse:
         """获取 STDF 文件摘要"""
@@ -285,111 +1051,30 @@ class StdfParserService:
                     if cached_data.get("summary_version", 1) >= 5:
                         return StdfSummaryResponse(**cached_data)
         
-        # 2. 尝试从内存缓存获取
-        collector = self._get_cached_collector(file_path)
-        if not collector:
-            # 3. 解析文件
-            start_time = time.time()
-            collector = self._parse_file(file_path)
-            parse_time = time.time() - start_time
-            self._set_cache(file_path, collector)
-            
-            # 保存到数据库
-            if db:
-                file_size = os.path.getsize(file_path)
-                filename = os.path.basename(file_path)
-                file_record = CacheService.save_file_record(
-                    db, file_hash, filename, file_size, parse_time
-                )
+        # 2. 从内存缓存或文件解析（失败测试项统计需要 PTR/FTR，摘要使用完整解析）
+        collector = self._load_collector(file_path, db)
 
-        def _safe_str(value) -> str:
-            if value is None:
-                return ""
-            return str(value)
-
-        def _format_stdf_time(value) -> str:
-            """将 STDF 时间字段格式化为可读时间。
-            STDF 中常见为 Unix 秒级时间戳；若不是时间戳则原样返回字符串。
-            """
-            if value is None:
-                return ""
-            try:
-                if isinstance(value, (int, float)):
-                    ts = int(value)
-                elif isinstance(value, str):
-                    raw = value.strip()
-                    if not raw:
-                        return ""
-                    if raw.isdigit() or (raw.startswith("-") and raw[1:].isdigit()):
-                        ts = int(raw)
-                    else:
-                        return raw
-                else:
-                    return str(value)
-
-                if ts <= 0:
-                    return str(value)
-
-                dt_local = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone()
-                return dt_local.strftime("%Y-%m-%d %H:%M:%S %Z")
-            except Exception:
-                return str(value)
-
-        mir_info = None
-        if collector.mir:
-            mir = collector.mir
-            mir_info = MirInfo(
-                setup_time=_format_stdf_time(mir.get("SETUP_T")),
-                start_time=_format_stdf_time(mir.get("START_T")),
-                station_number=mir.get("STAT_NUM") or 0,
-                mode_code=_safe_str(mir.get("MODE_COD")),
-                lot_id=_safe_str(mir.get("LOT_ID")),
-                part_type=_safe_str(mir.get("PART_TYP")),
-                node_name=_safe_str(mir.get("NODE_NAM")),
-                tester_type=_safe_str(mir.get("TSTR_TYP")),
-                job_name=_safe_str(mir.get("JOB_NAM")),
-                exec_type=_safe_str(mir.get("EXEC_TYP")),
-                exec_ver=_safe_str(mir.get("EXEC_VER")),
-                facility_id=_safe_str(mir.get("FACIL_ID")),
-                floor_id=_safe_str(mir.get("FLOOR_ID")),
-                process_id=_safe_str(mir.get("PROC_ID")),
-            )
-
-        mrr_info = None
-        if collector.mrr:
-            mrr = collector.mrr
-            mrr_info = MrrInfo(
-                finish_time=_format_stdf_time(mrr.get("FINISH_T")),
-                disposition_code=_safe_str(mrr.get("DISP_COD")),
-                user_description=_safe_str(mrr.get("USR_DESC")),
-                exec_description=_safe_str(mrr.get("EXC_DESC")),
-            )
+        mir_info = _build_mir_info(collector.mir)
+        mrr_info = _build_mrr_info(collector.mrr)
 
         # 统计信息
-        total_parts = len(collector.prr_list)
-        pass_count = sum(
-            1 for prr in collector.prr_list if prr.get("HARD_BIN", 1) == 1
-        )
+        hard_bins = collector.parts["hard_bin"]
+        part_sites = collector.parts["site_num"]
+        passed = hard_bins == 1
+        total_parts = len(hard_bins)
+        pass_count = int(np.count_nonzero(passed))
         fail_count = total_parts - pass_count
 
-        # 站点列表
-        sites = sorted(set(prr.get("SITE_NUM", 0) for prr in collector.prr_list))
-
         # 按site统计yield
-        site_yield_map: Dict[int, Dict[str, int]] = {}
-        for prr in collector.prr_list:
-            site = prr.get("SITE_NUM", 0)
-            if site not in site_yield_map:
-                site_yield_map[site] = {"total": 0, "pass": 0}
-            site_yield_map[site]["total"] += 1
-            if prr.get("HARD_BIN", 1) == 1:
-                site_yield_map[site]["pass"] += 1
+        site_values, site_inverse, site_totals = np.unique(
+            part_sites, return_inverse=True, return_counts=True
+        )
+        site_passes = np.bincount(site_inverse, weights=passed, minlength=len(site_values))
+        sites = [int(site) for site in site_values]
 
         site_yields = []
-        for site in sites:
-            stats = site_yield_map.get(site, {"total": 0, "pass": 0})
-            total = stats["total"]
-            pass_count_site = stats["pass"]
+        for site, total, pass_count_site in zip(sites, site_totals.tolist(), site_passes.tolist()):
+            pass_count_site = int(pass_count_site)
             fail_count_site = total - pass_count_site
             yield_rate_site = round(pass_count_site / total * 100, 2) if total > 0 else 0
             site_yields.append(
@@ -403,10 +1088,8 @@ class StdfParserService:
             )
 
         # Hard Bin 统计
-        hbin_counts: Dict[int, int] = {}
-        for prr in collector.prr_list:
-            hbin = prr.get("HARD_BIN", 0)
-            hbin_counts[hbin] = hbin_counts.get(hbin, 0) + 1
+        bin_values, bin_totals = np.unique(hard_bins, return_counts=True)
+        hbin_counts: Dict[int, int] = dict(zip(bin_values.tolist(), bin_totals.tolist()))
 
         # 统计每个bin中失败次数最多的测试项（按实际PRR归属汇总）
         bin_failed_tests: Dict[int, Dict[str, int]] = collector.failed_tests_by_bin or {}
@@ -452,7 +1135,7 @@ class StdfParserService:
             site_yields=site_yields,
             hbin_counts=hbin_counts,
             hbin_details=hbin_details,
-            total_tests=len(set(ptr.get("TEST_NUM", 0) for ptr in collector.ptr_list)),
+            total_tests=len(np.unique(collector.ptr["test_num"])),
         )
         
         # 保存到数据库
@@ -460,10 +1143,107 @@ class StdfParserService:
             file_hash = calculate_file_hash(file_path)
             cached_file = CacheService.get_cached_file_by_hash(db, file_hash)
             if cached_file:
-                CacheService.save_data(db, cached_file.id, "summary", summary_response.dict())
+                summary_data = summary_response.dict()
+                CacheService.save_data(db, cached_file.id, "summary", summary_data)
+                CacheService.save_file_meta(db, cached_file.id, summary_data)
+                if part_ingest.enabled and not part_ingest.is_ingested(db, cached_file.id):
+                    part_ingest.ingest(db, cached_file.id, collector.parts)
         
         return summary_response
 
+    @staticmethod
+    def _build_result_items(
+        ptr: TestResultStore, rows: np.ndarray, item_cls=TestResultItem, **extra
+    ) -> List[TestResultItem]:
+        """只为给定行构建 TestResultItem（extra 为附加到每一行的字段）"""
+        meta = ptr.meta
+        items = []
+        for tnum, head, site, flag, result, meta_id in zip(
+            ptr["test_num"][rows].tolist(),
+            ptr["head_num"][rows].tolist(),
+            ptr["site_num"][rows].tolist(),
+            ptr["test_flg"][rows].tolist(),
+            ptr["result"][rows].tolist(),
+            ptr["meta_id"][rows].tolist(),
+        ):
+            items.append(
+                item_cls(
+                    test_num=tnum,
+                    head_num=head,
+                    site_num=site,
+                    test_flag=flag,
+                    result=result,
+                    test_txt=meta.test_txt[meta_id],
+                    lo_limit=meta.lo_limit[meta_id],
+                    hi_limit=meta.hi_limit[meta_id],
+                    units=meta.units[meta_id],
+                    **extra,
+                )
+            )
+        return items
+
+    def _select_result_rows(
+        self,
+        file_path: str,
+        test_num: Optional[int],
+        site_num: Optional[int],
+        db: Optional[Session] = None,
+    ):
+        """返回 (ptr, 匹配的行号)；单个测试项且内存中没有解析结果时按索引只读取该测试项的 PTR"""
+        if test_num is not None and self._get_cached_collector(file_path, record_stats=False) is None:
+            index = self._get_record_index(file_path)
+            if index is not None:
+                self._cache.record_miss()
+                collector = StdfRecordCollector()
+                offsets = index.ptr_offset[index.ptr_test_num == test_num]
+                index.read_records(file_path, offsets, collector)
+                collector.finalize()
+                return collector.ptr, collector.ptr.select_rows(site_num=site_num)
+
+        collector = self._load_collector(file_path, db)
+        return collector.ptr, collector.ptr.select_rows(test_num, site_num)
+
+    def get_test_results_columnar(
+        self,
+        file_path: str,
+        test_num: Optional[int] = None,
+        site_num: Optional[int] = None,
+        page: int = 1,
+        page_size: int = 100,
+        db: Optional[Session] = None,
+    ) -> bytes:
+        """以列式二进制格式返回一页测试结果
+
+        test_txt/units/上下限按页内出现的元数据字典编码，meta_id 列为字典下标。
+        """
+        ptr, rows = self._select_result_rows(file_path, test_num, site_num, db)
+        total = len(rows)
+        start = (page - 1) * page_size
+        rows = rows[start:start + page_size]
+
+        meta = ptr.meta
+        used, meta_ids = np.unique(ptr["meta_id"][rows], return_inverse=True)
+        used = used.tolist()
+        header = {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "dictionary": {
+                "test_txt": [meta.test_txt[i] for i in used],
+                "units": [meta.units[i] for i in used],
+                "lo_limit": [meta.lo_limit[i] for i in used],
+                "hi_limit": [meta.hi_limit[i] for i in used],
+            },
+        }
+        return encode_columns(header, [
+            ("test_num", ptr["test_num"][rows]),
+            ("head_num", ptr["head_num"][rows]),
+            ("site_num", ptr["site_num"][rows]),
+            ("test_flag", ptr["test_flg"][rows]),
+            ("result", ptr["result"][rows]),
+            ("meta_id", meta_ids.astype(np.int32)),
+        ])
+
     def get_test_results(
         self,
         file_path: str,
@@ -494,48 +1274,14 @@ class StdfParserService:
                         results=paged_results,
                     )
         
-        # 2. 从内存缓存或文件解析
-        collector = self._get_cached_collector(file_path)
-        if not collector:
-            start_time = time.time()
-            collector = self._parse_file(file_path)
-            parse_time = time.time() - start_time
-            self._set_cache(file_path, collector)
-            
-            # 保存文件记录到数据库
-            if db:
-                file_hash = calculate_file_hash(file_path)
-                file_size = os.path.getsize(file_path)
-                filename = os.path.basename(file_path)
-                CacheService.save_file_record(db, file_hash, filename, file_size, parse_time)
-
-        results = []
-        for ptr in collector.ptr_list:
-            # 筛选
-            if test_num is not None and ptr.get("TEST_NUM") != test_num:
-                continue
-            if site_num is not None and ptr.get("SITE_NUM") != site_num:
-                continue
-
-            results.append(
-                TestResultItem(
-                    test_num=ptr.get("TEST_NUM", 0),
-                    head_num=ptr.get("HEAD_NUM", 0),
-                    site_num=ptr.get("SITE_NUM", 0),
-                    test_flag=ptr.get("TEST_FLG", 0),
-                    result=float(ptr.get("RESULT", 0)),
-                    test_txt=ptr.get("TEST_TXT", ""),
-                    lo_limit=float(ptr.get("LO_LIMIT", 0)) if ptr.get("LO_LIMIT") is not None else None,
-                    hi_limit=float(ptr.get("HI_LIMIT", 0)) if ptr.get("HI_LIMIT") is not None else None,
-                    units=ptr.get("UNITS", ""),
-                )
-            )
+        # 2. 从内存缓存、记录索引或文件解析
+        ptr, rows = self._select_result_rows(file_path, test_num, site_num, db)
 
-        total = len(results)
+        total = len(rows)
         start = (page - 1) * page_size
         end = start + page_size
-        paged_results = results[start:end]
-        
+        paged_results = self._build_result_items(ptr, rows[start:end])
+
         response = TestResultsResponse(
             total=total,
             page=page,
@@ -553,7 +1299,7 @@ class StdfParserService:
                     "total": total,
                     "page": 1,
                     "page_size": total,
-                    "results": [r.dict() for r in results],
+                    "results": [r.dict() for r in self._build_result_items(ptr, rows)],
                 }
                 CacheService.save_data(db, cached_file.id, "test_results", full_response_data)
 
@@ -571,54 +1317,36 @@ class StdfParserService:
                     return [TestInfo(**item) for item in cached_data]
         
         # 2. 从内存缓存或文件解析
-        collector = self._get_cached_collector(file_path)
-        if not collector:
-            start_time = time.time()
-            collector = self._parse_file(file_path)
-            parse_time = time.time() - start_time
-            self._set_cache(file_path, collector)
-            
-            # 保存文件记录到数据库
-            if db:
-                file_hash = calculate_file_hash(file_path)
-                file_size = os.path.getsize(file_path)
-                filename = os.path.basename(file_path)
-                CacheService.save_file_record(db, file_hash, filename, file_size, parse_time)
+        collector = self._load_collector(file_path, db)
 
+        ptr = collector.ptr
+        test_nums = ptr["test_num"]
         test_map: Dict[int, TestInfo] = {}
-        for ptr in collector.ptr_list:
-            tnum = ptr.get("TEST_NUM", 0)
-            if tnum not in test_map:
+        if len(test_nums):
+            unique_tests, first_rows, test_inverse, test_counts = np.unique(
+                test_nums, return_index=True, return_inverse=True, return_counts=True
+            )
+            # 按每条记录自身的上下限判断是否失败（缺失限值为 NaN，比较结果为 False）
+            lo_limits, hi_limits = ptr.meta.limit_arrays()
+            meta_ids = ptr["meta_id"]
+            results = ptr["result"].astype(np.float64)
+            failed = (results < lo_limits[meta_ids]) | (results > hi_limits[meta_ids])
+            fail_counts = np.bincount(test_inverse, weights=failed, minlength=len(unique_tests))
+
+            meta = ptr.meta
+            first_meta_ids = meta_ids[first_rows].tolist()
+            for tnum, meta_id, total, fail_count in zip(
+                unique_tests.tolist(), first_meta_ids, test_counts.tolist(), fail_counts.tolist()
+            ):
                 test_map[tnum] = TestInfo(
                     test_num=tnum,
-                    test_txt=ptr.get("TEST_TXT", ""),
-                    units=ptr.get("UNITS", ""),
-                    lo_limit=float(ptr.get("LO_LIMIT", 0)) if ptr.get("LO_LIMIT") is not None else None,
-                    hi_limit=float(ptr.get("HI_LIMIT", 0)) if ptr.get("HI_LIMIT") is not None else None,
-                    count=0,
+                    test_txt=meta.test_txt[meta_id],
+                    units=meta.units[meta_id],
+                    lo_limit=meta.lo_limit[meta_id],
+                    hi_limit=meta.hi_limit[meta_id],
+                    count=total,
+                    fail_rate=round((fail_count / total * 100), 2) if total > 0 else 0,
                 )
-            test_map[tnum].count += 1
-
-        # 计算每个测试项的失败率
-        for tnum, ptr in enumerate(collector.ptr_list):
-            test_idx = ptr.get("TEST_NUM", 0)
-            if test_idx in test_map:
-                lo_limit = ptr.get("LO_LIMIT")
-                hi_limit = ptr.get("HI_LIMIT")
-                result = float(ptr.get("RESULT", 0))
-                is_pass = (lo_limit is None or result >= lo_limit) and (hi_limit is None or result <= hi_limit)
-                if not hasattr(test_map[test_idx], '_fail_count'):
-                    test_map[test_idx]._fail_count = 0
-                    test_map[test_idx]._total_count = 0
-                test_map[test_idx]._total_count += 1
-                if not is_pass:
-                    test_map[test_idx]._fail_count += 1
-
-        # 计算失败率
-        for test_info in test_map.values():
-            total = getattr(test_info, '_total_count', test_info.count)
-            fail_count = getattr(test_info, '_fail_count', 0)
-            test_info.fail_rate = round((fail_count / total * 100), 2) if total > 0 else 0
 
         # 按失败率从高到低排序
         test_list = sorted(test_map.values(), key=lambda t: (-t.fail_rate, t.test_num))
@@ -632,52 +1360,262 @@ class StdfParserService:
         
         return test_list
 
-    def get_wafer_map(self, file_path: str, db: Optional[Session] = None) -> WaferMapResponse:
-        """获取 Wafer Map 数据"""
-        # 1. 尝试从数据库缓存获取
-        if db:
-            file_hash = calculate_file_hash(file_path)
-            cached_file = CacheService.get_cached_file_by_hash(db, file_hash)
-            if cached_file:
-                cached_data = CacheService.get_cached_data(db, cached_file.id, "wafer_map")
-                if cached_data:
-                    return WaferMapResponse(**cached_data)
-        
-        # 2. 从内存缓存或文件解析
+    def get_header(self, file_path: str, db: Optional[Session] = None) -> HeaderResponse:
+        """获取 MIR/MRR 表头，有索引时只读取这两条记录"""
+        collector = self._get_cached_collector(file_path, HEADER_RECORDS)
+        if collector is None:
+            index = self._get_record_index(file_path)
+            if index is not None:
+                collector = StdfRecordCollector(HEADER_RECORDS)
+                for name in ("MIR", "MRR"):
+                    if name in index.records:
+                        index.read_records(file_path, index.records[name], collector)
+            else:
+                collector = self._load_collector(file_path, db, HEADER_RECORDS, record_stats=False)
+        return HeaderResponse(mir=_build_mir_info(collector.mir), mrr=_build_mrr_info(collector.mrr))
+
+    def get_die(
+        self, file_path: str, x_coord: int, y_coord: int, db: Optional[Session] = None
+    ) -> Optional[DieDetailResponse]:
+        """获取单个 die 的 PRR 信息及其全部 PTR 结果（同一坐标多次测试时取最后一次）
+
+        内存中没有解析结果时按索引只读取该 part 的字节范围。
+        """
         collector = self._get_cached_collector(file_path)
-        if not collector:
-            start_time = time.time()
-            collector = self._parse_file(file_path)
-            parse_time = time.time() - start_time
-            self._set_cache(file_path, collector)
-            
-            # 保存文件记录到数据库
-            if db:
-                file_hash = calculate_file_hash(file_path)
-                file_size = os.path.getsize(file_path)
-                filename = os.path.basename(file_path)
-                CacheService.save_file_record(db, file_hash, filename, file_size, parse_time)
-
-        dies = []
-        for prr in collector.prr_list:
-            x = prr.get("X_COORD", -32768)
-            y = prr.get("Y_COORD", -32768)
-            
-            # STDF spec: -32768 means missing coordinate
-            if x == -32768 or y == -32768:
-                continue
-
-            dies.append(
-                DieResult(
-                    x_coord=x,
-                    y_coord=y,
-                    hard_bin=prr.get("HARD_BIN", 0),
-                    soft_bin=prr.get("SOFT_BIN", 0),
-                    part_flag=prr.get("PART_FLG", 0),
-                    site_num=prr.get("SITE_NUM", 0),
-                )
+        index = None if collector is not None else self._get_record_index(file_path)
+        if index is not None:
+            parts = np.flatnonzero(
+                (index.part_x == x_coord) & (index.part_y == y_coord) & (index.part_end >= 0)
+            )
+            if not len(parts):
+                return None
+            part = int(parts[-1])
+            collector = StdfRecordCollector()
+            index.read_range(
+                file_path, int(index.part_start[part]), int(index.part_end[part]), collector
             )
+            collector.finalize()
+            # 范围以该 part 的 PRR 结束，最后一行即目标 part
+            row = len(collector.parts) - 1
+        else:
+            if collector is None:
+                collector = self._load_collector(file_path, db, record_stats=False)
+            rows = np.flatnonzero(
+                (collector.parts["x_coord"] == x_coord) & (collector.parts["y_coord"] == y_coord)
+            )
+            if not len(rows):
+                return None
+            row = int(rows[-1])
 
+        parts = collector.parts
+        part_index = parts["part_index"][row]
+        ptr_rows = np.flatnonzero(collector.ptr["part_index"] == part_index)
+        return DieDetailResponse(
+            x_coord=x_coord,
+            y_coord=y_coord,
+            head_num=int(parts["head_num"][row]),
+            site_num=int(parts["site_num"][row]),
+            hard_bin=int(parts["hard_bin"][row]),
+            soft_bin=int(parts["soft_bin"][row]),
+            part_flag=int(parts["part_flg"][row]),
+            part_id=parts.part_id[row],
+            test_time=int(parts["test_t"][row]),
+            results=self._build_result_items(collector.ptr, ptr_rows),
+        )
+
+    @staticmethod
+    def _row_values(ptr: TestResultStore, rows: np.ndarray):
+        """返回给定行的测试值、逐行失败标记（按各行自身的限值）以及第一行的 meta id"""
+        lo_limits, hi_limits = ptr.meta.limit_arrays()
+        values = ptr["result"][rows].astype(np.float64)
+        row_meta = ptr["meta_id"][rows]
+        failed = (values < lo_limits[row_meta]) | (values > hi_limits[row_meta])
+        return values, failed, int(row_meta[0]) if len(row_meta) else None
+
+    @staticmethod
+    def _build_test_stats(
+        ptr: TestResultStore,
+        test_num: Optional[int] = None,
+        site_num: Optional[int] = None,
+        by_site: bool = False,
+        bins: Optional[int] = None,
+    ) -> List[TestStats]:
+        """按测试项（可选再按站点）分组计算统计量，分组行号取自 (test_num, site_num) 索引
+
+        失败按每行自身的上下限判断；Cp/Cpk 使用该测试项第一条记录的上下限。
+        """
+        index = ptr.build_row_index()
+        key_tests = (index.keys >> np.uint64(8)).astype(np.int64)
+        key_sites = (index.keys & np.uint64(0xFF)).astype(np.int64)
+        test_nums = np.unique(key_tests).tolist() if test_num is None else [test_num]
+
+        meta = ptr.meta
+        stats = []
+        for tnum in test_nums:
+            if site_num is not None:
+                groups = [(site_num, ptr.select_rows(tnum, site_num))]
+            else:
+                groups = [(None, ptr.select_rows(tnum))]
+                if by_site:
+                    groups += [
+                        (site, ptr.select_rows(tnum, site))
+                        for site in key_sites[key_tests == tnum].tolist()
+                    ]
+            for site, rows in groups:
+                if not len(rows):
+                    continue
+                values, failed, first_meta = StdfParserService._row_values(ptr, rows)
+                stats.append(
+                    TestStats(
+                        test_num=tnum,
+                        test_txt=meta.test_txt[first_meta],
+                        units=meta.units[first_meta],
+                        site_num=site,
+                        **describe(
+                            values, failed,
+                            meta.lo_limit[first_meta], meta.hi_limit[first_meta], bins,
+                        ),
+                    )
+                )
+        return stats
+
+    def get_test_stats(
+        self,
+        file_path: str,
+        test_num: Optional[int] = None,
+        site_num: Optional[int] = None,
+        by_site: bool = False,
+        bins: Optional[int] = None,
+        db: Optional[Session] = None,
+    ) -> TestStatsResponse:
+        """获取测试项统计（计数、均值、标准差、百分位、Cp/Cpk、直方图）"""
+        collector = self._load_collector(file_path, db)
+        return TestStatsResponse(
+            tests=self._build_test_stats(collector.ptr, test_num, site_num, by_site, bins)
+        )
+
+    def _load_collectors(
+        self,
+        file_paths: List[str],
+        db: Optional[Session] = None,
+        record_types: Optional[frozenset] = None,
+    ) -> List[StdfRecordCollector]:
+        """加载多个文件，未缓存的文件先全部提交到调度器并行解析再统一等待
+
+        record_types 为所需记录类型（None 表示全部），只需部分记录时提交投影解析。
+        """
+        jobs = []
+        for file_path in file_paths:
+            if self._get_cached_collector(file_path, record_types, record_stats=False) is None:
+                jobs.append(self._submit_parse(file_path, PRIORITY_INTERACTIVE, record_types))
+        for job in jobs:
+            job = self._scheduler.wait(job["job_id"]) or job
+            if job["status"] != "done":
+                raise RuntimeError(f"{job['filename']}: {job.get('error') or job['status']}")
+        return [self._load_collector(file_path, db, record_types) for file_path in file_paths]
+
+    @staticmethod
+    def _select_test_rows(
+        ptr: TestResultStore, test_num: int, test_txt: Optional[str], site_num: Optional[int]
+    ) -> np.ndarray:
+        rows = ptr.select_rows(test_num, site_num)
+        if test_txt is not None and len(rows):
+            same_name = np.array([txt == test_txt for txt in ptr.meta.test_txt], dtype=bool)
+            rows = rows[same_name[ptr["meta_id"][rows]]]
+        return rows
+
+    def get_merged_results(
+        self,
+        file_paths: List[str],
+        test_num: int,
+        test_txt: Optional[str] = None,
+        site_num: Optional[int] = None,
+        mode: str = "rows",
+        page: int = 1,
+        page_size: int = 1000,
+        bins: Optional[int] = None,
+        db: Optional[Session] = None,
+    ) -> MergedTestResponse:
+        """跨文件合并同一测试项（按 test_num，指定 test_txt 时再按名称对齐）
+
+        mode=rows 返回带来源文件名的结果行（只构建当前页），
+        mode=stats 返回合并统计及每个文件的统计。
+        """
+        collectors = self._load_collectors(file_paths, db)
+        selections = [
+            (os.path.basename(file_path), collector.ptr,
+             self._select_test_rows(collector.ptr, test_num, test_txt, site_num))
+            for file_path, collector in zip(file_paths, collectors)
+        ]
+        total = sum(len(rows) for _, _, rows in selections)
+        response = MergedTestResponse(
+            test_num=test_num, test_txt=test_txt, total=total, page=page, page_size=page_size
+        )
+
+        if mode == "stats":
+            all_values, all_failed, limits = [], [], None
+            for file_name, ptr, rows in selections:
+                if not len(rows):
+                    continue
+                values, failed, first_meta = self._row_values(ptr, rows)
+                all_values.append(values)
+                all_failed.append(failed)
+                meta = ptr.meta
+                file_limits = (
+                    meta.test_txt[first_meta], meta.units[first_meta],
+                    meta.lo_limit[first_meta], meta.hi_limit[first_meta],
+                )
+                limits = limits or file_limits
+                response.file_stats.append(
+                    MergedFileStats(
+                        file_name=file_name,
+                        test_num=test_num,
+                        test_txt=file_limits[0],
+                        units=file_limits[1],
+                        site_num=site_num,
+                        **describe(values, failed, file_limits[2], file_limits[3], bins),
+                    )
+                )
+            if limits:
+                response.stats = TestStats(
+                    test_num=test_num,
+                    test_txt=limits[0],
+                    units=limits[1],
+                    site_num=site_num,
+                    **describe(
+                        np.concatenate(all_values), np.concatenate(all_failed),
+                        limits[2], limits[3], bins,
+                    ),
+                )
+            return response
+
+        # 在各文件依次拼接的虚拟结果列表上取当前页
+        start = (page - 1) * page_size
+        end = start + page_size
+        offset = 0
+        for file_name, ptr, rows in selections:
+            lo, hi = max(start - offset, 0), min(end - offset, len(rows))
+            if lo < hi:
+                response.results.extend(
+                    self._build_result_items(
+                        ptr, rows[lo:hi], MergedTestResultItem, file_name=file_name
+                    )
+                )
+            offset += len(rows)
+            if offset >= end:
+                break
+        return response
+
+    @staticmethod
+    def _wafer_map_rows(parts: PartStore) -> np.ndarray:
+        """坐标有效的 PRR 行号（STDF 中 -32768 表示坐标缺失）"""
+        x_coords = parts["x_coord"]
+        y_coords = parts["y_coord"]
+        return np.flatnonzero((x_coords != MISSING_COORD) & (y_coords != MISSING_COORD))
+
+    @staticmethod
+    def _wafer_map_header(collector: StdfRecordCollector) -> Dict:
+        """Wafer Map 的 wafer_id、WCR 信息和 bin 名称"""
         wafer_id = ""
         if collector.wir_list:
             wafer_id = collector.wir_list[0].get("WAFER_ID", "")
@@ -696,13 +1634,55 @@ class StdfParserService:
             if sbin_num is not None:
                 sbin_names[sbin_num] = sbin_nam or f"SBin {sbin_num}"
 
+        return {
+            "wafer_id": wafer_id,
+            "wcr_info": collector.wcr,
+            "hbin_names": hbin_names,
+            "sbin_names": sbin_names,
+        }
+
+    def get_wafer_map(self, file_path: str, db: Optional[Session] = None) -> WaferMapResponse:
+        """获取 Wafer Map 数据"""
+        # 1. 尝试从数据库缓存获取
+        if db:
+            file_hash = calculate_file_hash(file_path)
+            cached_file = CacheService.get_cached_file_by_hash(db, file_hash)
+            if cached_file:
+                cached_data = CacheService.get_cached_data(db, cached_file.id, "wafer_map")
+                if cached_data:
+                    return WaferMapResponse(**cached_data)
+        
+        # 2. 从内存缓存或文件解析
+        # Wafer Map 只需 PRR/WIR/WCR/HBR/SBR 等记录，PTR/FTR 按 REC_LEN 跳过
+        collector = self._load_collector(file_path, db, WAFER_MAP_RECORDS)
+
+        parts = collector.parts
+        rows = self._wafer_map_rows(parts)
+        x_coords = parts["x_coord"]
+        y_coords = parts["y_coord"]
+        dies = [
+            DieResult(
+                x_coord=x,
+                y_coord=y,
+                hard_bin=hard_bin,
+                soft_bin=soft_bin,
+                part_flag=part_flag,
+                site_num=site,
+            )
+            for x, y, hard_bin, soft_bin, part_flag, site in zip(
+                x_coords[rows].tolist(),
+                y_coords[rows].tolist(),
+                parts["hard_bin"][rows].tolist(),
+                parts["soft_bin"][rows].tolist(),
+                parts["part_flg"][rows].tolist(),
+                parts["site_num"][rows].tolist(),
+            )
+        ]
+
         wafer_response = WaferMapResponse(
-            wafer_id=wafer_id,
             total_dies=len(dies),
             dies=dies,
-            wcr_info=collector.wcr,
-            hbin_names=hbin_names,
-            sbin_names=sbin_names,
+            **self._wafer_map_header(collector),
         )
         
         # 保存到数据库
@@ -713,3 +1693,172 @@ class StdfParserService:
                 CacheService.save_data(db, cached_file.id, "wafer_map", wafer_response.dict())
         
         return wafer_response
+
+    def get_wafer_map_columnar(self, file_path: str, db: Optional[Session] = None) -> bytes:
+        """以列式二进制格式返回 Wafer Map（不读取数据库中的 JSON 缓存）"""
+        collector = self._load_collector(file_path, db, WAFER_MAP_RECORDS)
+        parts = collector.parts
+        rows = self._wafer_map_rows(parts)
+        header = self._wafer_map_header(collector)
+        header["total_dies"] = len(rows)
+        return encode_columns(header, [
+            ("x_coord", parts["x_coord"][rows]),
+            ("y_coord", parts["y_coord"][rows]),
+            ("hard_bin", parts["hard_bin"][rows]),
+            ("soft_bin", parts["soft_bin"][rows]),
+            ("part_flag", parts["part_flg"][rows]),
+            ("site_num", parts["site_num"][rows]),
+        ])
+
+    def _get_wafer_grid(
+        self, file_path: str, bin_type: str = "hard", db: Optional[Session] = None
+    ) -> Tuple[WaferGrid, StdfRecordCollector, int]:
+        """返回 (网格, collector, 有坐标的 PRR 数)，网格与 collector 一起缓存在内存中"""
+        signature = self._get_signature(file_path)
+        collector = self._load_collector(file_path, db, WAFER_MAP_RECORDS)
+        parts = collector.parts
+        rows = self._wafer_map_rows(parts)
+        cache_key = f"grid:{bin_type}:{file_path}"
+        cached = self._cache.get(cache_key)
+        if cached and cached["signature"] == signature:
+            return cached["grid"], collector, len(rows)
+
+        grid = WaferGrid.build(
+            parts["x_coord"][rows], parts["y_coord"][rows], parts[f"{bin_type}_bin"][rows]
+        )
+        self._cache.put(cache_key, {"signature": signature, "grid": grid}, grid.nbytes())
+        return grid, collector, len(rows)
+
+    def get_wafer_grid(
+        self, file_path: str, bin_type: str = "hard", db: Optional[Session] = None
+    ) -> WaferGridResponse:
+        """获取游程编码的稠密 bin 网格"""
+        grid, collector, total_dies = self._get_wafer_grid(file_path, bin_type, db)
+        run_values, run_lengths = grid.run_lengths()
+        header = self._wafer_map_header(collector)
+        return WaferGridResponse(
+            wafer_id=header["wafer_id"],
+            total_dies=total_dies,
+            retest_count=grid.retest_count,
+            bin_type=bin_type,
+            origin_x=grid.origin_x,
+            origin_y=grid.origin_y,
+            width=grid.width,
+            height=grid.height,
+            empty_value=EMPTY_BIN,
+            run_values=run_values.tolist(),
+            run_lengths=run_lengths.tolist(),
+            bin_counts=grid.bin_counts(),
+            hbin_names=header["hbin_names"],
+            sbin_names=header["sbin_names"],
+            tile_size=TILE_SIZE,
+            max_zoom=MAX_ZOOM,
+        )
+
+    def get_wafer_tile(
+        self,
+        file_path: str,
+        zoom: int,
+        tile_x: int,
+        tile_y: int,
+        bin_type: str = "hard",
+        db: Optional[Session] = None,
+    ) -> Optional[bytes]:
+        """渲染 PNG 瓦片，瓦片超出网格范围时返回 None"""
+        grid, _, _ = self._get_wafer_grid(file_path, bin_type, db)
+        tiles_x, tiles_y = grid.tile_count(zoom)
+        if not (0 <= tile_x < tiles_x and 0 <= tile_y < tiles_y):
+            return None
+        return grid.render_tile(zoom, tile_x, tile_y)
+
+    def ingest_parts(self, file_path: str, db: Session) -> int:
+        """把文件的全部 PRR 写入 stdf_parts（替换已有的行），返回行数"""
+        collector = self._load_collector(file_path, db, record_types=WAFER_MAP_RECORDS)
+        file_record = CacheService.get_cached_file_by_hash(db, calculate_file_hash(file_path))
+        if file_record is None:
+            file_record = CacheService.save_file_record(
+                db, calculate_file_hash(file_path), os.path.basename(file_path),
+                os.path.getsize(file_path),
+            )
+        return part_ingest.ingest(db, file_record.id, collector.parts)
+
+    def get_lot_id(self, file_path: str, db: Optional[Session] = None) -> str:
+        """读取 MIR 中的 lot_id，内存中没有时优先使用数据库中的文件元数据"""
+        if db and self._get_cached_collector(file_path, HEADER_RECORDS, record_stats=False) is None:
+            cached_file = CacheService.get_cached_file_by_hash(db, calculate_file_hash(file_path))
+            if cached_file and cached_file.meta is not None:
+                return cached_file.meta.lot_id
+        header = self.get_header(file_path, db)
+        return header.mir.lot_id if header.mir else ""
+
+    def _stack_lot(self, file_paths: List[str], db: Optional[Session] = None) -> Dict:
+        """叠加各文件的 hard bin 网格，返回合成结果和按文件哈希记录的单片统计"""
+        self._load_collectors(file_paths, db, WAFER_MAP_RECORDS)
+        grids, wafers, hbin_names, lot_id = [], {}, {}, ""
+        for file_path in file_paths:
+            grid, collector, _ = self._get_wafer_grid(file_path, "hard", db)
+            grids.append(grid)
+            header = self._wafer_map_header(collector)
+            for bin_num, name in header["hbin_names"].items():
+                hbin_names.setdefault(bin_num, name)
+            if not lot_id and collector.mir:
+                lot_id = _safe_str(collector.mir.get("LOT_ID"))
+            total = int(np.count_nonzero(grid.grid != EMPTY_BIN))
+            passed = int(np.count_nonzero(grid.grid == 1))
+            wafers[calculate_file_hash(file_path)] = {
+                "wafer_id": header["wafer_id"],
+                "total_dies": total,
+                "pass_count": passed,
+            }
+        composite = stack_grids(grids)
+        composite.update(wafers=wafers, hbin_names=hbin_names, lot_id=lot_id)
+        return composite
+
+    def get_lot_map(self, file_paths: List[str], db: Optional[Session] = None) -> LotMapResponse:
+        """叠加一个批次的多片 wafer，计算每个坐标的通过率和主导 hard bin
+
+        合成结果按文件哈希集合缓存在内存中，文件内容不变时重复请求无需重新计算。
+        """
+        # 内容相同的文件只叠加一次
+        unique_paths = {}
+        for file_path in file_paths:
+            unique_paths.setdefault(calculate_file_hash(file_path), file_path)
+        lot_key = hashlib.sha256(",".join(sorted(unique_paths)).encode()).hexdigest()
+        cache_key = f"lot:{lot_key}"
+        composite = self._cache.get(cache_key)
+        if composite is None:
+            composite = self._stack_lot(list(unique_paths.values()), db)
+            nbytes = sum(v.nbytes for v in composite.values() if isinstance(v, np.ndarray))
+            self._cache.put(cache_key, composite, nbytes + 200 * len(unique_paths))
+
+        wafers = []
+        for file_hash, file_path in unique_paths.items():
+            info = composite["wafers"][file_hash]
+            total = info["total_dies"]
+            wafers.append(LotWaferInfo(
+                filename=os.path.basename(file_path),
+                yield_rate=round(info["pass_count"] / total * 100, 2) if total > 0 else 0,
+                **info,
+            ))
+
+        tested = composite["tested"]
+        passed = composite["passed"]
+        total_tested = int(tested.sum())
+        return LotMapResponse(
+            lot_id=composite["lot_id"],
+            wafer_count=len(wafers),
+            wafers=wafers,
+            composite_yield=round(int(passed.sum()) / total_tested * 100, 2) if total_tested else 0,
+            origin_x=composite["origin_x"],
+            origin_y=composite["origin_y"],
+            width=composite["width"],
+            height=composite["height"],
+            x_coords=composite["x_coord"].tolist(),
+            y_coords=composite["y_coord"].tolist(),
+            tested=tested.tolist(),
+            passed=passed.tolist(),
+            pass_rate=np.round(passed / np.maximum(tested, 1), 4).tolist(),
+            dominant_bin=composite["dominant_bin"].tolist(),
+            dominant_count=composite["dominant_count"].tolist(),
+            hbin_names=composite["hbin_names"],
+        )
@@ -0,0 +1,79 @@
+"""测试项统计：在列式结果上用 NumPy 计算分布、百分位与过程能力指数"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+# 返回的百分位
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def describe(
+    values: np.ndarray,
+    failed: np.ndarray,
+    lo_limit: Optional[float],
+    hi_limit: Optional[float],
+    bins: Optional[int] = None,
+) -> Dict:
+    """计算一组测试值的统计量
+
+    values 为测试值，failed 为与之对应的逐行失败标记（按各行自身的限值判断）；
+    lo_limit/hi_limit 用于 Cp/Cpk，标准差按总体标准差（除以 n）计算。
+    非有限值（NaN/Inf）不参与分布统计。bins 为 None 时取 min(30, ceil(sqrt(n)))。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    fail_count = int(np.count_nonzero(failed))
+    stats = {
+        "count": int(len(values)),
+        "pass_count": int(len(values)) - fail_count,
+        "fail_count": fail_count,
+        "lo_limit": lo_limit,
+        "hi_limit": hi_limit,
+        "mean": None,
+        "stdev": None,
+        "min": None,
+        "max": None,
+        "median": None,
+        "percentiles": {},
+        "cp": None,
+        "cpu": None,
+        "cpl": None,
+        "cpk": None,
+        "histogram": None,
+    }
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return stats
+
+    mean = float(values.mean())
+    stdev = float(values.std())
+    min_value = float(values.min())
+    max_value = float(values.max())
+    percentile_values = np.percentile(values, PERCENTILES).tolist()
+    stats.update(
+        mean=mean,
+        stdev=stdev,
+        min=min_value,
+        max=max_value,
+        median=percentile_values[PERCENTILES.index(50)],
+        percentiles={f"p{p}": v for p, v in zip(PERCENTILES, percentile_values)},
+    )
+
+    if stdev > 0:
+        if hi_limit is not None:
+            stats["cpu"] = (hi_limit - mean) / (3 * stdev)
+        if lo_limit is not None:
+            stats["cpl"] = (mean - lo_limit) / (3 * stdev)
+        if lo_limit is not None and hi_limit is not None:
+            stats["cp"] = (hi_limit - lo_limit) / (6 * stdev)
+        candidates = [v for v in (stats["cpu"], stats["cpl"]) if v is not None]
+        if candidates:
+            stats["cpk"] = min(candidates)
+
+    if not bins:
+        bins = min(30, int(np.ceil(np.sqrt(len(values)))))
+    # 所有值相同时给一个单位宽度的区间，与前端直方图一致
+    hist_range = (min_value, max_value) if max_value > min_value else (min_value, min_value + 1)
+    counts, edges = np.histogram(values, bins=bins, range=hist_range)
+    stats["histogram"] = {"bin_edges": edges.tolist(), "counts": counts.tolist()}
+    return stats
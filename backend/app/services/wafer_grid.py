@@ -0,0 +1,198 @@
+"""Wafer Map 的稠密网格表示与 PNG 瓦片渲染
+
+由 PRR 的 X/Y/bin 列向量化生成二维 bin 网格（同一坐标多次测试时取最后一次），
+网格按行展开后以游程编码返回；PNG 瓦片直接由网格按缩放级别采样生成。
+"""
+
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 网格中没有 die 的位置（STDF bin 编号范围为 0..32767）
+EMPTY_BIN = 0xFFFF
+
+# 网格单元数上限，防止异常坐标导致分配过大的数组
+MAX_GRID_CELLS = 16 * 1024 * 1024
+
+TILE_SIZE = 256
+
+# 缩放级别 z 下每个 die 占 2**z 像素
+MAX_ZOOM = 5
+
+# 与前端 WaferMap 一致：bin 1 为绿色，其余按 bin 编号顺序轮流取色
+PASS_COLOR = (0x4D, 0xE3, 0x8E)
+PALETTE = (
+    (0xFF, 0x5D, 0x67),
+    (0xFF, 0x7A, 0x45),
+    (0xF7, 0xB9, 0x55),
+    (0x9C, 0x82, 0xFF),
+    (0x5C, 0xB3, 0xFF),
+    (0x33, 0xD0, 0xB2),
+    (0xFF, 0x8D, 0xB2),
+)
+
+
+class WaferGrid:
+    """二维 bin 网格，grid[row, col] 对应坐标 (origin_x + col, origin_y + row)"""
+
+    def __init__(self, origin_x: int, origin_y: int, grid: np.ndarray, retest_count: int = 0):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.grid = grid
+        self.retest_count = retest_count
+        self._lut = None
+
+    @property
+    def width(self) -> int:
+        return self.grid.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.grid.shape[0]
+
+    def nbytes(self) -> int:
+        return self.grid.nbytes + (self._lut.nbytes if self._lut is not None else 0)
+
+    @classmethod
+    def build(cls, x_coords: np.ndarray, y_coords: np.ndarray, bins: np.ndarray) -> "WaferGrid":
+        """由坐标和 bin 列生成网格（调用方需先去掉坐标缺失的行）"""
+        if not len(x_coords):
+            return cls(0, 0, np.full((0, 0), EMPTY_BIN, dtype=np.uint16))
+        x_coords = x_coords.astype(np.int64)
+        y_coords = y_coords.astype(np.int64)
+        origin_x, origin_y = int(x_coords.min()), int(y_coords.min())
+        width = int(x_coords.max()) - origin_x + 1
+        height = int(y_coords.max()) - origin_y + 1
+        if width * height > MAX_GRID_CELLS:
+            raise ValueError(f"Wafer 坐标范围过大（{width} x {height}）")
+
+        flat = (y_coords - origin_y) * width + (x_coords - origin_x)
+        # 同一坐标取最后一次测试：在反转后的序列里 np.unique 返回首次出现的位置
+        _, first_in_reversed = np.unique(flat[::-1], return_index=True)
+        last = len(flat) - 1 - first_in_reversed
+        grid = np.full(width * height, EMPTY_BIN, dtype=np.uint16)
+        grid[flat[last]] = bins[last]
+        return cls(origin_x, origin_y, grid.reshape(height, width), len(flat) - len(last))
+
+    def bin_counts(self) -> Dict[int, int]:
+        """各 bin 的 die 数（重测只计最后一次）"""
+        values, counts = np.unique(self.grid[self.grid != EMPTY_BIN], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def run_lengths(self) -> Tuple[np.ndarray, np.ndarray]:
+        """按行展开后的游程编码，返回 (值, 长度)"""
+        flat = self.grid.ravel()
+        if not len(flat):
+            return flat[:0], np.empty(0, dtype=np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(flat)) + 1))
+        lengths = np.diff(np.append(starts, len(flat)))
+        return flat[starts], lengths
+
+    def tile_count(self, zoom: int) -> Tuple[int, int]:
+        """缩放级别下 X/Y 方向的瓦片数"""
+        scale = 1 << zoom
+        return (
+            -(-self.width * scale // TILE_SIZE),
+            -(-self.height * scale // TILE_SIZE),
+        )
+
+    def render_tile(self, zoom: int, tile_x: int, tile_y: int) -> bytes:
+        """渲染一个 TILE_SIZE x TILE_SIZE 的 RGBA PNG 瓦片，超出网格的部分透明"""
+        pixels = np.arange(TILE_SIZE)
+        cols = (tile_x * TILE_SIZE + pixels) >> zoom
+        rows = (tile_y * TILE_SIZE + pixels) >> zoom
+        col_ok = cols < self.width
+        row_ok = rows < self.height
+
+        rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+        if col_ok.any() and row_ok.any():
+            block = self.grid[np.ix_(rows[row_ok], cols[col_ok])]
+            colors = self._palette()
+            rgba[np.ix_(row_ok, col_ok)] = colors[block.astype(np.int64)]
+        return encode_png(rgba)
+
+    def _palette(self) -> np.ndarray:
+        """bin 编号 -> RGBA 查找表，空位为透明（同一网格的各瓦片共用）"""
+        if self._lut is None:
+            lut = np.zeros((EMPTY_BIN + 1, 4), dtype=np.uint8)
+            for i, bin_num in enumerate(sorted(self.bin_counts())):
+                color = PASS_COLOR if bin_num == 1 else PALETTE[i % len(PALETTE)]
+                lut[bin_num] = color + (0xFF,)
+            self._lut = lut
+        return self._lut
+
+
+def stack_grids(grids: List[WaferGrid]) -> Dict:
+    """叠加多片 wafer 的网格，返回有 die 的坐标及其测试片数、通过片数和主导 bin
+
+    主导 bin 为该坐标上出现次数最多的 hard bin，次数相同时取编号较小的。
+    """
+    grids = [g for g in grids if g.grid.size]
+    empty = np.empty(0, dtype=np.int64)
+    if not grids:
+        return {
+            "origin_x": 0, "origin_y": 0, "width": 0, "height": 0,
+            "x_coord": empty, "y_coord": empty, "tested": empty, "passed": empty,
+            "dominant_bin": empty, "dominant_count": empty,
+        }
+    origin_x = min(g.origin_x for g in grids)
+    origin_y = min(g.origin_y for g in grids)
+    width = max(g.origin_x + g.width for g in grids) - origin_x
+    height = max(g.origin_y + g.height for g in grids) - origin_y
+    if width * height > MAX_GRID_CELLS:
+        raise ValueError(f"Wafer 坐标范围过大（{width} x {height}）")
+
+    cell_parts, bin_parts = [], []
+    for g in grids:
+        rows, cols = np.nonzero(g.grid != EMPTY_BIN)
+        cell_parts.append((rows + (g.origin_y - origin_y)) * width + cols + (g.origin_x - origin_x))
+        bin_parts.append(g.grid[rows, cols])
+    cells = np.concatenate(cell_parts).astype(np.int64)
+    bins = np.concatenate(bin_parts).astype(np.int64)
+
+    size = width * height
+    tested = np.bincount(cells, minlength=size)
+    passed = np.bincount(cells, weights=bins == 1, minlength=size).astype(np.int64)
+
+    # 每个 (坐标, bin) 组合计数后，按坐标升序、次数降序、bin 升序排序取每个坐标的第一项
+    pair_keys, pair_counts = np.unique((cells << 16) | bins, return_counts=True)
+    pair_cells = pair_keys >> 16
+    pair_bins = pair_keys & 0xFFFF
+    order = np.lexsort((pair_bins, -pair_counts, pair_cells))
+    _, first = np.unique(pair_cells[order], return_index=True)
+    best = order[first]
+    present = pair_cells[best]
+
+    return {
+        "origin_x": origin_x,
+        "origin_y": origin_y,
+        "width": width,
+        "height": height,
+        "x_coord": present % width + origin_x,
+        "y_coord": present // width + origin_y,
+        "tested": tested[present],
+        "passed": passed[present],
+        "dominant_bin": pair_bins[best],
+        "dominant_count": pair_counts[best],
+    }
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """把 (高, 宽, 4) 的 uint8 数组编码为 PNG（每行过滤方式 0）"""
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
@@ -4,7 +4,7 @@ import {
   BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend,
   ReferenceLine, ResponsiveContainer,
 } from 'recharts';
-import { getTestResults, getTestList } from '../services/api';
+import { getMergedResults, getTestList } from '../services/api';
 
 const { Option } = Select;
 
@@ -73,39 +73,31 @@ function TestResults({ filenames = [], canMergeTests = true, programWarning = fa
 
   const loadResultsForTest = useCallback(
     async (testNum) => {
-      setResultsMap((prev) => ({ ...prev, [testNum]: { results: [], loading: true } }));
+      setResultsMap((prev) => ({ ...prev, [testNum]: { stats: null, loading: true } }));
       try {
-        let results = [];
-        if (canMergeTests) {
-          const fetchFile = async (file) => {
-            const first = await getTestResults(file, { test_num: testNum, page: 1, page_size: MERGE_FETCH_LIMIT });
-            const total = first.data.total || 0;
-            const all = [...(first.data.results || [])];
-            const pages = Math.max(1, Math.ceil(total / MERGE_FETCH_LIMIT));
-            for (let p = 2; p <= pages; p += 1) {
-              const res = await getTestResults(file, { test_num: testNum, page: p, page_size: MERGE_FETCH_LIMIT });
-              all.push(...(res.data.results || []));
-            }
-            return all.map((r, idx) => ({ ...r, file_name: file, _row_key: `${file}-${idx}` }));
-          };
-          const all = await Promise.all(activeFilenames.map(fetchFile));
-          results = all.flat();
-        } else {
-          const file = activeFilenames[0];
-          if (file) {
-            const res = await getTestResults(file, { test_num: testNum, page: 1, page_size: MERGE_FETCH_LIMIT });
-            results = (res.data.results || []).map((r, idx) => ({ ...r, _row_key: `${file}-${idx}` }));
-          }
-        }
-        setResultsMap((prev) => ({ ...prev, [testNum]: { results, loading: false } }));
+        const res = await getMergedResults(activeFilenames, { test_num: testNum, mode: 'stats' });
+        setResultsMap((prev) => ({ ...prev, [testNum]: { stats: res.data.stats, loading: false } }));
       } catch (err) {
         message.error(`加载测试 #${testNum} 失败: ${err.message}`);
-        setResultsMap((prev) => ({ ...prev, [testNum]: { results: [], loading: false } }));
+        setResultsMap((prev) => ({ ...prev, [testNum]: { stats: null, loading: false } }));
       }
     },
-    [activeFilenames, canMergeTests],
+    [activeFilenames],
   );
 
+  const fetchAllRows = async (testNum) => {
+    const fetchPage = (page) =>
+      getMergedResults(activeFilenames, { test_num: testNum, page, page_size: MERGE_FETCH_LIMIT });
+    const first = await fetchPage(1);
+    const rows = [...(first.data.results || [])];
+    const pages = Math.max(1, Math.ceil((first.data.total || 0) / MERGE_FETCH_LIMIT));
+    for (let p = 2; p <= pages; p += 1) {
+      const res = await fetchPage(p);
+      rows.push(...(res.data.results || []));
+    }
+    return rows;
+  };
+
   useEffect(() => {
     const selectedSet = new Set(selectedTests);
     selectedTests.forEach((testNum) => {
@@ -123,77 +115,30 @@ function TestResults({ filenames = [], canMergeTests = true, programWarning = fa
     }
   }, [selectedTests]); // eslint-disable-line react-hooks/exhaustive-deps
 
-  const generateHistogramData = (results) => {
-    if (!results || results.length === 0) return null;
-    const values = results.map((r) => r.result).filter((v) => v != null);
-    if (values.length === 0) return null;
-    const minVal = Math.min(...values);
-    const maxVal = Math.max(...values);
-    const range = maxVal - minVal;
-    const bucketCount = Math.min(30, Math.ceil(Math.sqrt(values.length)));
-    const bucketWidth = range === 0 ? 1 : range / bucketCount;
-    const buckets = Array(bucketCount).fill(0);
-    values.forEach((val) => {
-      let idx = Math.floor((val - minVal) / bucketWidth);
-      if (idx === bucketCount) idx = bucketCount - 1;
-      buckets[idx] += 1;
-    });
-    const bins = buckets.map((count, i) => {
-      const bMin = minVal + i * bucketWidth;
-      return { x: bMin + bucketWidth / 2, count };
-    });
-    return { bins, minVal, maxVal, bucketWidth };
+  const generateHistogramData = (stats) => {
+    const histogram = stats?.histogram;
+    if (!histogram || histogram.counts.length === 0) return null;
+    const edges = histogram.bin_edges;
+    const bins = histogram.counts.map((count, i) => ({ x: (edges[i] + edges[i + 1]) / 2, count }));
+    return { bins, minVal: stats.min, maxVal: stats.max, bucketWidth: edges[1] - edges[0] };
   };
 
-  const calculateStats = (results, testInfo) => {
-    if (!results || results.length === 0) return null;
-    const values = results.map((r) => r.result).filter((v) => v != null).sort((a, b) => a - b);
-    const n = values.length;
-    if (n === 0) return null;
-    const mean = values.reduce((a, b) => a + b, 0) / n;
-    const median = n % 2 === 0 ? (values[n / 2 - 1] + values[n / 2]) / 2 : values[Math.floor(n / 2)];
-    const variance = values.reduce((sum, val) => sum + (val - mean) ** 2, 0) / n;
-    const stdDev = Math.sqrt(variance);
-    const loLimit = testInfo?.lo_limit ?? null;
-    const hiLimit = testInfo?.hi_limit ?? null;
-    const passCount = results.filter(
-      (r) => (loLimit === null || r.result >= loLimit) && (hiLimit === null || r.result <= hiLimit),
-    ).length;
-
-    let cp = null;
-    let cpk = null;
-    let cpu = null;
-    let cpl = null;
-
-    if (stdDev > 0) {
-      if (loLimit !== null && hiLimit !== null) {
-        cp = (hiLimit - loLimit) / (6 * stdDev);
-        cpu = (hiLimit - mean) / (3 * stdDev);
-        cpl = (mean - loLimit) / (3 * stdDev);
-        cpk = Math.min(cpu, cpl);
-      } else if (hiLimit !== null) {
-        cpu = (hiLimit - mean) / (3 * stdDev);
-        cpk = cpu;
-      } else if (loLimit !== null) {
-        cpl = (mean - loLimit) / (3 * stdDev);
-        cpk = cpl;
-      }
-    }
-
+  const calculateStats = (stats) => {
+    if (!stats || stats.mean == null) return null;
     return {
-      mean,
-      median,
-      stdDev,
-      min: values[0],
-      max: values[n - 1],
-      passCount,
-      failCount: n - passCount,
-      loLimit,
-      hiLimit,
-      cp,
-      cpk,
-      cpu,
-      cpl,
+      mean: stats.mean,
+      median: stats.median,
+      stdDev: stats.stdev,
+      min: stats.min,
+      max: stats.max,
+      passCount: stats.pass_count,
+      failCount: stats.fail_count,
+      loLimit: stats.lo_limit ?? null,
+      hiLimit: stats.hi_limit ?? null,
+      cp: stats.cp ?? null,
+      cpk: stats.cpk ?? null,
+      cpu: stats.cpu ?? null,
+      cpl: stats.cpl ?? null,
     };
   };
 
@@ -241,15 +186,23 @@ function TestResults({ filenames = [], canMergeTests = true, programWarning = fa
 
       {selectedTests.map((testNum) => {
         const testInfo = testList.find((t) => t.test_num === testNum);
-        const { results = [], loading: testLoading } = resultsMap[testNum] || { loading: true };
-        const hist = generateHistogramData(results);
+        const { stats: rawStats = null, loading: testLoading } = resultsMap[testNum] || { loading: true };
+        const hist = generateHistogramData(rawStats);
         const histData = hist?.bins || [];
-        const stats = calculateStats(results, testInfo);
+        const stats = calculateStats(rawStats);
+        const resultCount = rawStats?.count || 0;
         const showLimits = !!showLimitsMap[testNum];
 
-        const exportCurrentTestCSV = () => {
+        const exportCurrentTestCSV = async () => {
           const headers = ['test_num', 'test_txt', 'site_num', 'head_num', 'result', 'units', 'lo_limit', 'hi_limit'];
           if (canMergeTests && filenames.length > 1) headers.unshift('file_name');
+          let results = [];
+          try {
+            results = await fetchAllRows(testNum);
+          } catch (err) {
+            message.error(`导出失败: ${err.message}`);
+            return;
+          }
           const rows = results.map((r) =>
             headers
               .map((h) => {
@@ -304,7 +257,7 @@ function TestResults({ filenames = [], canMergeTests = true, programWarning = fa
                   type="primary"
                   className="apple-primary-btn"
                   onClick={exportCurrentTestCSV}
-                  disabled={testLoading || results.length === 0}
+                  disabled={testLoading || resultCount === 0}
                 >
                   导出至CSV
                 </Button>
@@ -2,7 +2,9 @@ import React, { useState, useEffect, useMemo } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import { Tabs, Spin, Button, message, Progress, Alert, Space, Tag } from 'antd';
 import { ArrowLeftOutlined } from '@ant-design/icons';
-import { getFileSummary, getWaferMap, startParse, getParseProgress } from '../services/api';
+import {
+  getFileSummary, getWaferMap, startParse, getParseProgress, getParseProgressStreamUrl,
+} from '../services/api';
 import TestSummary from '../components/TestSummary';
 import TestResults from '../components/TestResults';
 import WaferMap from '../components/WaferMap';
@@ -100,6 +102,21 @@ const mergeSummaries = (summaryItems) => {
   };
 };
 
+const STAGE_LABELS = {
+  queued: '排队中',
+  parsing: '解析中',
+  scanning: '扫描切分点',
+  decoding: '并行解码',
+  merging: '合并结果',
+};
+
+const formatParseDetail = ({ stage, bytes_per_sec: rate, eta_seconds: eta }) => {
+  const parts = [STAGE_LABELS[stage] || stage];
+  if (rate) parts.push(`${(rate / 1024 / 1024).toFixed(1)} MB/s`);
+  if (eta != null) parts.push(`剩余约 ${Math.ceil(eta)} 秒`);
+  return parts.join(' · ');
+};
+
 function FileDetail() {
   const { filename } = useParams();
   const navigate = useNavigate();
@@ -111,6 +128,7 @@ function FileDetail() {
   const [parsePercent, setParsePercent] = useState(0);
   const [parseStatus, setParseStatus] = useState('idle');
   const [currentParsingFile, setCurrentParsingFile] = useState('');
+  const [parseDetail, setParseDetail] = useState(null);
 
   const filenames = useMemo(() => {
     const fromState = location.state?.filenames;
@@ -125,8 +143,14 @@ function FileDetail() {
 
     let stopped = false;
 
-    const waitForParseDone = async (jobId, fileIndex, fileCount) => {
-      return new Promise((resolve, reject) => {
+    const applyProgress = (progress, fileIndex, fileCount) => {
+      const overall = ((fileIndex + (progress.percent || 0) / 100) / fileCount) * 100;
+      setParsePercent(Math.round(overall));
+      setParseDetail(progress.stage ? progress : null);
+    };
+
+    const pollParseDone = (jobId, fileIndex, fileCount) =>
+      new Promise((resolve, reject) => {
         const poll = async () => {
           try {
             const progressRes = await getParseProgress(jobId);
@@ -135,15 +159,14 @@ function FileDetail() {
               return;
             }
 
-            const { status, percent, error } = progressRes.data;
-            const overall = ((fileIndex + (percent || 0) / 100) / fileCount) * 100;
-            setParsePercent(Math.round(overall));
+            const { status, error } = progressRes.data;
+            applyProgress(progressRes.data, fileIndex, fileCount);
 
             if (status === 'done') {
               resolve();
               return;
             }
-            if (status === 'error') {
+            if (status === 'error' || status === 'cancelled') {
               reject(new Error(error || '未知解析错误'));
               return;
             }
@@ -154,6 +177,38 @@ function FileDetail() {
         };
         poll();
       });
+
+    // 优先使用服务端推送，连接失败时回退到轮询
+    const waitForParseDone = (jobId, fileIndex, fileCount) => {
+      if (typeof EventSource === 'undefined') {
+        return pollParseDone(jobId, fileIndex, fileCount);
+      }
+      return new Promise((resolve, reject) => {
+        const source = new EventSource(getParseProgressStreamUrl(jobId));
+        let finished = false;
+        const finish = (callback) => {
+          finished = true;
+          source.close();
+          callback();
+        };
+        source.onmessage = (event) => {
+          if (stopped) {
+            finish(resolve);
+            return;
+          }
+          const progress = JSON.parse(event.data);
+          applyProgress(progress, fileIndex, fileCount);
+          if (progress.status === 'done') {
+            finish(resolve);
+          } else if (progress.status === 'error' || progress.status === 'cancelled') {
+            finish(() => reject(new Error(progress.error || '未知解析错误')));
+          }
+        };
+        source.onerror = () => {
+          if (finished) return;
+          finish(() => pollParseDone(jobId, fileIndex, fileCount).then(resolve, reject));
+        };
+      });
     };
 
     const startAndWaitParse = async (targetFile, fileIndex, fileCount) => {
@@ -291,6 +346,9 @@ function FileDetail() {
         <div className="apple-glass-panel file-detail-progress">
           <div className="file-detail-progress-text">正在解析文件...{currentParsingFile ? ` (${currentParsingFile})` : ''}</div>
           <Progress percent={parsePercent} status="active" />
+          {parseDetail && parseDetail.status === 'running' ? (
+            <div className="file-detail-progress-text">{formatParseDetail(parseDetail)}</div>
+          ) : null}
         </div>
       ) : null}
 
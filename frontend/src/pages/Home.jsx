@@ -143,7 +143,7 @@ function Home() {
             navigate(`/file/${record.name}`, { state: { jobId } });
           }
 
-          if (status === 'error') {
+          if (status === 'error' || status === 'cancelled') {
             if (parseTimerRef.current) {
               clearInterval(parseTimerRef.current);
               parseTimerRef.current = null;
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { COLUMNAR_MEDIA_TYPE, decodeColumnar } from './columnar';
 
 const api = axios.create({
   baseURL: '/api/stdf',
@@ -6,7 +7,7 @@ const api = axios.create({
 });
 
 /** 获取 STDF 文件列表 */
-export const getFileList = () => api.get('/files');
+export const getFileList = (params = {}) => api.get('/files', { params });
 
 /** 上传 STDF 文件 */
 export const uploadFile = (file, onProgress) => {
@@ -30,17 +31,71 @@ export const getFileSummary = (filename) => api.get(`/summary/${filename}`);
 /** 启动解析任务 */
 export const startParse = (filename) => api.post(`/parse/${filename}`);
 
+/** 取消解析任务 */
+export const cancelParse = (jobId) => api.post(`/cancel/${jobId}`);
+
 /** 获取解析进度 */
 export const getParseProgress = (jobId) => api.get(`/progress/${jobId}`);
 
+/** 解析进度推送（Server-Sent Events）地址 */
+export const getParseProgressStreamUrl = (jobId) => `${api.defaults.baseURL}/progress/${jobId}/stream`;
+
 /** 获取测试结果 */
 export const getTestResults = (filename, params = {}) =>
   api.get(`/results/${filename}`, { params });
 
+/** 获取测试项统计（分布、百分位、Cp/Cpk、直方图） */
+export const getTestStats = (filename, params = {}) =>
+  api.get(`/stats/${filename}`, { params });
+
+/** 跨文件合并同一测试项（mode: rows 返回结果行，stats 返回统计） */
+export const getMergedResults = (filenames, params = {}) =>
+  api.get('/merge', {
+    params: { filenames, ...params },
+    paramsSerializer: { indexes: null },
+  });
+
+/** 以列式二进制格式获取数据并解码 */
+const getColumnar = (url, params = {}) =>
+  api
+    .get(url, { params, responseType: 'arraybuffer', headers: { Accept: COLUMNAR_MEDIA_TYPE } })
+    .then((res) => decodeColumnar(res.data));
+
+/** 获取测试结果（列式） */
+export const getTestResultsColumnar = (filename, params = {}) =>
+  getColumnar(`/results/${filename}`, params);
+
+/** 获取 Wafer Map 数据（列式） */
+export const getWaferMapColumnar = (filename) => getColumnar(`/wafermap/${filename}`);
+
 /** 获取 Wafer Map 数据 */
 export const getWaferMap = (filename) => api.get(`/wafermap/${filename}`);
 
+/** 获取游程编码的 Wafer bin 网格（binType: hard | soft） */
+export const getWaferGrid = (filename, binType = 'hard') =>
+  api.get(`/wafermap/${filename}/grid`, { params: { bin_type: binType } });
+
+/** Wafer Map PNG 瓦片地址，每个 die 占 2^zoom 像素 */
+export const getWaferTileUrl = (filename, zoom, tileX, tileY, binType = 'hard') =>
+  `${api.defaults.baseURL}/wafermap/${encodeURIComponent(filename)}/tiles/${zoom}/${tileX}/${tileY}.png?bin_type=${binType}`;
+
+/** 批次叠加 Wafer Map：params 为 { filenames: [...] } 或 { lot_id } */
+export const getLotMap = (params = {}) =>
+  api.get('/lot-map', { params, paramsSerializer: { indexes: null } });
+
 /** 获取测试项列表 */
 export const getTestList = (filename) => api.get(`/test-list/${filename}`);
 
+const partsApi = axios.create({
+  baseURL: '/api/parts',
+  timeout: 60000,
+});
+
+/** 某坐标在所有已入库文件中的测试记录（part 表） */
+export const getDieHistory = (x, y, params = {}) =>
+  partsApi.get('/die', { params: { x, y, ...params }, paramsSerializer: { indexes: null } });
+
+/** 按 bin、批次、时间范围跨文件查询 part：{ hard_bin, soft_bin, lot_id, start_from, start_to, page, page_size } */
+export const queryParts = (params = {}) => partsApi.get('', { params });
+
 export default api;
@@ -0,0 +1,41 @@
+/**
+ * 解码后端的二进制列式响应（application/vnd.stdf.columnar）
+ *
+ * 布局：8 字节魔数 "STDFCOL1" + uint32 头部长度 + JSON 头部，
+ * 之后是按 8 字节对齐的小端列数据，每列按头部中的 offset/length 读取。
+ */
+
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.stdf.columnar';
+
+const MAGIC = 'STDFCOL1';
+
+const TYPED_ARRAYS = {
+  uint8: Uint8Array,
+  uint16: Uint16Array,
+  uint32: Uint32Array,
+  int16: Int16Array,
+  int32: Int32Array,
+  float32: Float32Array,
+  float64: Float64Array,
+};
+
+/** 返回 { meta, rows, columns: { name: TypedArray } } */
+export const decodeColumnar = (buffer) => {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 8));
+  if (magic !== MAGIC) {
+    throw new Error('不是列式格式的响应');
+  }
+  const headerLength = view.getUint32(8, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+  const prefix = 12 + headerLength;
+  const dataStart = prefix + ((8 - (prefix % 8)) % 8);
+
+  const columns = {};
+  header.columns.forEach(({ name, dtype, offset, length }) => {
+    const TypedArray = TYPED_ARRAYS[dtype];
+    // 数据按小端存储，与浏览器平台字节序一致时可直接建立视图
+    columns[name] = new TypedArray(buffer, dataStart + offset, length / TypedArray.BYTES_PER_ELEMENT);
+  });
+  return { meta: header.meta, rows: header.rows, columns };
+};